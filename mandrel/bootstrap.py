@@ -1,7 +1,9 @@
-import logging.config
+import logging
+import marshal
 import os
 import sys
-from mandrel import config
+import threading
+import types
 from mandrel import exception
 from mandrel import util
 
@@ -14,6 +16,17 @@ DEFAULT_LOGGING_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
 __DEFAULT_SEARCH_PATHS = ['.']
 _LOGGING_CONFIGURED = False
 
+# Set this environment variable to a file path to persist bootstrap results
+# (the ROOT_PATH for each working directory, the compiled BOOTSTRAP_FILE,
+# and normalized search paths not involving symbolic links) across processes.
+BOOTSTRAP_CACHE_VARIABLE = 'MANDREL_BOOTSTRAP_CACHE'
+_BOOTSTRAP_CACHE_VERSION = 2
+_BOOTSTRAP_CACHE_MAX_ENTRIES = 256
+
+# Set this environment variable (to any non-empty value) to defer each part
+# of bootstrapping until something needs its results; see _LazyBootstrap.
+LAZY_BOOTSTRAP_VARIABLE = 'MANDREL_LAZY_BOOTSTRAP'
+
 def logging_is_configured():
     """Returns True if logging has been configured, False if not."""
     return _LOGGING_CONFIGURED
@@ -45,6 +58,8 @@ def find_logging_configuration():
 
     Raises an UnknownConfigurationException if no config file is found.
     """
+    _require('evaluated')
+    _require('search_paths')
     for path in util.find_files(LOGGING_CONFIG_BASENAME, SEARCH_PATHS, matches=1):
         return path
     raise exception.UnknownConfigurationException, "Cannot find logging configuration file(s) '%s'" % LOGGING_CONFIG_BASENAME
@@ -79,9 +94,10 @@ def configure_logging():
     Note that the `get_logger()` function calls `configure_logging()` as needed,
     and therefore ensures that logging configuration is applied.
     """
-
+    _require('evaluated')
     try:
         path = find_logging_configuration()
+        import logging.config
         logging.config.fileConfig(path, disable_existing_loggers=DISABLE_EXISTING_LOGGERS)
     except exception.UnknownConfigurationException:
         DEFAULT_LOGGING_CALLBACK()
@@ -104,7 +120,51 @@ def get_logger(name=None):
     return logging.getLogger(name)
 
 
+def _read_bootstrap_cache(path):
+    try:
+        with open(path, 'rb') as f:
+            cache = marshal.load(f)
+    except (IOError, OSError, EOFError, ValueError, TypeError):
+        cache = None
+    if not isinstance(cache, dict) or cache.get('version') != (_BOOTSTRAP_CACHE_VERSION, sys.version):
+        cache = {'version': (_BOOTSTRAP_CACHE_VERSION, sys.version), 'roots': {}, 'files': {}, 'paths': {}}
+    return cache
+
+def _write_bootstrap_cache(path, cache):
+    for key in ('roots', 'paths'):
+        if len(cache[key]) > _BOOTSTRAP_CACHE_MAX_ENTRIES:
+            cache[key].clear()
+    try:
+        util.write_atomically(path, marshal.dumps(cache))
+    except (IOError, OSError):
+        pass
+
+def _cached_bootstrap_base():
+    """Returns the cached (ROOT_PATH, BOOTSTRAP_FILE) for the working directory, or None.
+
+    The cached root is trusted if its bootstrap file is unchanged since it
+    was compiled, which costs a single stat.  Note that a bootstrap file
+    created between the working directory and a cached root goes unnoticed
+    until the cache file is removed.
+    """
+    global _validated_bootstrap_file
+    try:
+        root = _bootstrap_cache['roots'][os.getcwd()]
+        bootstrap_file = os.path.join(root, __BOOTSTRAP_BASENAME)
+        signature = _bootstrap_cache['files'][bootstrap_file][0]
+        if util.stat_signature(bootstrap_file) == signature:
+            # The compiled code needs no further validation.
+            _validated_bootstrap_file = bootstrap_file
+            return root, bootstrap_file
+    except (KeyError, OSError):
+        pass
+    return None
+
 def _find_bootstrap_base():
+    if _bootstrap_cache is not None:
+        cached = _cached_bootstrap_base()
+        if cached is not None:
+            return cached
     current = os.path.realpath('.')
     while not os.path.isfile(os.path.join(current, __BOOTSTRAP_BASENAME)):
         parent = os.path.dirname(current)
@@ -112,11 +172,79 @@ def _find_bootstrap_base():
             raise exception.MissingBootstrapException, 'Cannot find %s file in directory hierarchy' % __BOOTSTRAP_BASENAME
         current = parent
 
+    if _bootstrap_cache is not None:
+        _bootstrap_cache['roots'][os.getcwd()] = current
     return current, os.path.join(current, __BOOTSTRAP_BASENAME)
 
 def normalize_path(path):
-    """Returns path with '~' expanded and relative paths made absolute based on ROOT_PATH."""
-    return os.path.realpath(os.path.join(ROOT_PATH, os.path.expanduser(path)))
+    """Returns path with '~' expanded and relative paths made absolute based on ROOT_PATH.
+
+    Symbolic links are resolved as by os.path.realpath.  Results are
+    memoized, along with those for each parent directory, so a path is only
+    resolved against the file system once, and paths sharing a parent only
+    resolve that parent once.  Call clear_normalized_paths if symbolic links
+    change.
+
+    With a bootstrap cache (see BOOTSTRAP_CACHE_VARIABLE), paths found not
+    to involve any symbolic link are also remembered across processes, so
+    that a link retargeted between runs (such as a 'current' link to the
+    latest release) is resolved anew by each process.  A directory replaced
+    by a symbolic link goes unnoticed until the cache file is removed.
+    """
+    _require('root')
+    return _resolve_path(os.path.join(ROOT_PATH, os.path.expanduser(path)))
+
+def normalize_paths(paths):
+    """Returns a list of each of paths normalized as by normalize_path."""
+    _require('root')
+    return [_resolve_path(os.path.join(ROOT_PATH, os.path.expanduser(path))) for path in paths]
+
+def clear_normalized_paths():
+    """Forgets all memoized normalize_path results."""
+    _normalized_paths.clear()
+    if _persisted_paths is not None:
+        _persisted_paths.clear()
+
+def _resolve_path(path):
+    try:
+        return _normalized_paths[path]
+    except KeyError:
+        pass
+    if _persisted_paths is not None and path in _persisted_paths:
+        result = _normalized_paths[path] = _persisted_paths[path]
+        return result
+    directory, name = os.path.split(path)
+    if directory == path or name in ('', os.curdir, os.pardir):
+        result = os.path.realpath(path)
+    else:
+        # realpath(directory/name) is realpath(directory)/name unless that is a link.
+        result = os.path.join(_resolve_path(directory), name)
+        if os.path.islink(result):
+            result = os.path.realpath(result)
+    _normalized_paths[path] = result
+    if _persisted_paths is not None and result == os.path.normpath(path):
+        # Resolutions through symbolic links are not persisted, as the
+        # links may change before the next process runs.
+        _persisted_paths[path] = result
+    return result
+
+def _compile_bootstrap_file():
+    if _bootstrap_cache is None:
+        with open(BOOTSTRAP_FILE, 'rU') as source:
+            return compile(source.read(), BOOTSTRAP_FILE, 'exec')
+
+    global _validated_bootstrap_file
+    validated, _validated_bootstrap_file = _validated_bootstrap_file, None
+    cached = _bootstrap_cache['files'].get(BOOTSTRAP_FILE)
+    if cached is not None and validated == BOOTSTRAP_FILE:
+        return cached[1]
+    signature = util.stat_signature(BOOTSTRAP_FILE)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    with open(BOOTSTRAP_FILE, 'rU') as source:
+        code = compile(source.read(), BOOTSTRAP_FILE, 'exec')
+    _bootstrap_cache['files'][BOOTSTRAP_FILE] = (signature, code)
+    return code
 
 def parse_bootstrap_file():
     """Compiles and evals the BOOTSTRAP_FILE with controlled local scope.
@@ -128,13 +256,158 @@ def parse_bootstrap_file():
 
     This makes it easy for the BOOTSTRAP_FILE to configure mandrel settings
     without performing further imports.
+
+    If the MANDREL_BOOTSTRAP_CACHE environment variable names a cache file,
+    the compiled code is kept there, keyed on the file's mtime and size.
+
+    In lazy bootstrap mode, config is bound to a stand-in that imports
+    mandrel.config only when an attribute is read from it; attributes set
+    on it before mandrel.config is imported are applied upon import.
     """
-    with open(BOOTSTRAP_FILE, 'rU') as source:
-        code = compile(source.read(), BOOTSTRAP_FILE, 'exec')
-        eval(code, {'bootstrap': sys.modules[__name__], 'config': config})
+    _require('root')
+    # The default SEARCH_PATHS must be in place before the BOOTSTRAP_FILE
+    # can modify or replace it.
+    _require('search_paths')
+    code = _compile_bootstrap_file()
+    bootstrap = sys.modules[__name__]
+    if isinstance(bootstrap, _LazyBootstrap):
+        config = _LazyConfig()
+    else:
+        from mandrel import config
+    eval(code, {'bootstrap': bootstrap, 'config': config})
+
+_deferred_config_settings = []
+
+class _LazyConfig(object):
+    """Stands in for mandrel.config while evaluating the BOOTSTRAP_FILE lazily."""
+    def __getattr__(self, name):
+        from mandrel import config
+        return getattr(config, name)
+
+    def __setattr__(self, name, value):
+        config = sys.modules.get('mandrel.config')
+        if config is None:
+            _deferred_config_settings.append((name, value))
+        else:
+            setattr(config, name, value)
+
+def _apply_deferred_config(config):
+    """Applies the settings made on config by a lazily evaluated BOOTSTRAP_FILE.
+
+    Called by mandrel.config upon import.
+    """
+    while _deferred_config_settings:
+        name, value = _deferred_config_settings.pop(0)
+        setattr(config, name, value)
+
+def _resolve_root():
+    global ROOT_PATH, BOOTSTRAP_FILE
+    (ROOT_PATH, BOOTSTRAP_FILE) = _find_bootstrap_base()
+
+def _resolve_search_paths():
+    global SEARCH_PATHS
+    _require('root')
+    SEARCH_PATHS = util.TransformingList(normalize_path, normalize_paths)
+    SEARCH_PATHS.extend(__DEFAULT_SEARCH_PATHS)
+
+_STAGES = {'root': _resolve_root,
+           'search_paths': _resolve_search_paths,
+           'evaluated': parse_bootstrap_file}
+_resolved_stages = set()
+_resolving_stages = set()
+_stage_lock = threading.RLock()
+
+def _require(stage):
+    """Ensures that the bootstrap stage has been resolved.
+
+    Stages are 'root' (ROOT_PATH and BOOTSTRAP_FILE), 'search_paths' (the
+    default SEARCH_PATHS) and 'evaluated' (the BOOTSTRAP_FILE has been
+    evaluated, which first requires 'search_paths').  They are all resolved
+    on import unless in lazy bootstrap mode.  A stage required while it is
+    being resolved (such as by the BOOTSTRAP_FILE itself) is treated as
+    resolved.
+    """
+    if stage in _resolved_stages:
+        return
+    with _stage_lock:
+        if stage in _resolved_stages or stage in _resolving_stages:
+            return
+        _resolving_stages.add(stage)
+        try:
+            _STAGES[stage]()
+            _resolved_stages.add(stage)
+        finally:
+            _resolving_stages.discard(stage)
+        _save_bootstrap_cache()
+
+def _save_bootstrap_cache():
+    global _bootstrap_cache_state
+    if _bootstrap_cache is not None:
+        state = marshal.dumps(_bootstrap_cache)
+        if state != _bootstrap_cache_state:
+            _write_bootstrap_cache(_bootstrap_cache_path, _bootstrap_cache)
+            _bootstrap_cache_state = state
+
+# The stages needed for each module attribute that depends on bootstrapping.
+# Names not defined by this module are presumed to come from BOOTSTRAP_FILE.
+_ATTRIBUTE_STAGES = {'ROOT_PATH': ('root',),
+                     'BOOTSTRAP_FILE': ('root',),
+                     'SEARCH_PATHS': ('search_paths', 'evaluated'),
+                     'LOGGING_CONFIG_BASENAME': ('evaluated',),
+                     'DEFAULT_LOGGING_LEVEL': ('evaluated',),
+                     'DEFAULT_LOGGING_FORMAT': ('evaluated',),
+                     'DEFAULT_LOGGING_DATE_FORMAT': ('evaluated',),
+                     'DEFAULT_LOGGING_CALLBACK': ('evaluated',),
+                     'DISABLE_EXISTING_LOGGERS': ('evaluated',)}
+
+class _LazyBootstrap(types.ModuleType):
+    """Stands in for mandrel.bootstrap in sys.modules in lazy bootstrap mode.
+
+    Reading an attribute resolves just the stages it depends upon: ROOT_PATH
+    and BOOTSTRAP_FILE need only the search for the BOOTSTRAP_FILE, while
+    SEARCH_PATHS and the logging settings need it to have been evaluated.
+    Setting an attribute first evaluates the BOOTSTRAP_FILE, so that the
+    new value takes precedence over it, as it would have without laziness.
+
+    The module's functions require the stages they need themselves.
+    """
+    def __init__(self, module):
+        super(_LazyBootstrap, self).__init__(module.__name__, module.__doc__)
+        self.__dict__['_module'] = module
+
+    def _stages(self, name):
+        stages = _ATTRIBUTE_STAGES.get(name)
+        if stages is None and not name.startswith('__') and not hasattr(self._module, name):
+            stages = ('evaluated',)
+        return stages or ()
+
+    def __getattr__(self, name):
+        for stage in self._stages(name):
+            _require(stage)
+        return getattr(self._module, name)
+
+    def __setattr__(self, name, value):
+        _require('evaluated')
+        setattr(self._module, name, value)
+
+    def __delattr__(self, name):
+        _require('evaluated')
+        delattr(self._module, name)
+
+    def __dir__(self):
+        return dir(self._module)
+
+_bootstrap_cache_path = os.environ.get(BOOTSTRAP_CACHE_VARIABLE)
+_bootstrap_cache = _bootstrap_cache_path and _read_bootstrap_cache(_bootstrap_cache_path) or None
+_bootstrap_cache_state = _bootstrap_cache and marshal.dumps(_bootstrap_cache)
+_normalized_paths = {}
+_persisted_paths = _bootstrap_cache['paths'] if _bootstrap_cache is not None else None
+_validated_bootstrap_file = None
 
-(ROOT_PATH, BOOTSTRAP_FILE) = _find_bootstrap_base()
-SEARCH_PATHS = util.TransformingList(normalize_path)
-SEARCH_PATHS.extend(__DEFAULT_SEARCH_PATHS)
-parse_bootstrap_file()
+if os.environ.get(LAZY_BOOTSTRAP_VARIABLE):
+    sys.modules[__name__] = _LazyBootstrap(sys.modules[__name__])
+else:
+    _require('root')
+    _require('search_paths')
+    _require('evaluated')
 
@@ -5,9 +5,20 @@ __all__ = ['find_configuration_files',
            'find_configuration_file',
            'load_configuration_file',
            'get_configuration',
+           'get_merged_configuration',
+           'get_configurations',
+           'afind_configuration_files',
+           'aget_configuration',
            'Configuration',
+           'CompactConfiguration',
+           'ConcurrentConfiguration',
            'ForgivingConfiguration']
 
 for name in __all__:
     setattr(sys.modules[__name__], name, getattr(core, name))
 
+
+# Apply any settings made by a lazily evaluated bootstrap file before
+# this package was imported.
+if 'mandrel.bootstrap' in sys.modules:
+    sys.modules['mandrel.bootstrap']._apply_deferred_config(sys.modules[__name__])
@@ -0,0 +1,274 @@
+import collections
+import copy
+import os
+import threading
+import time
+from mandrel import util
+
+class _LinkedDict(dict):
+    """Stands in for collections.OrderedDict, which Python 2.6 lacks.
+
+    Keeps keys in insertion order for popitem, and supports only what the
+    caches here use: item access and assignment, del, get, pop, popitem,
+    and clear.
+    """
+
+    def __init__(self):
+        dict.__init__(self)
+        # Each link is [previous, next, key], in a ring through root.
+        self._root = root = []
+        root[:] = [root, root, None]
+        self._links = {}
+
+    def __setitem__(self, key, value):
+        if key not in self:
+            root = self._root
+            last = root[0]
+            last[1] = root[0] = self._links[key] = [last, root, key]
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        previous, next, key = self._links.pop(key)
+        previous[1] = next
+        next[0] = previous
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        if default:
+            return default[0]
+        raise KeyError(key)
+
+    def popitem(self, last=True):
+        if not self:
+            raise KeyError('dictionary is empty')
+        key = self._root[0 if last else 1][2]
+        return key, self.pop(key)
+
+    def clear(self):
+        dict.clear(self)
+        self._links.clear()
+        self._root[:] = [self._root, self._root, None]
+
+_OrderedDict = getattr(collections, 'OrderedDict', _LinkedDict)
+
+class ConfigurationCache(object):
+    """LRU cache of parsed configuration files.
+
+    Entries are keyed on the absolute path of the configuration file and
+    validated against its util.stat_signature (mtime, size, inode) on every
+    lookup, so a modified or replaced file is always re-read.  At most
+    max_entries parsed files are retained; the least recently used entry is
+    evicted first.
+
+    Because a cached structure is shared by all callers, it is never handed
+    out directly:
+    * by default, each caller receives a deep copy it is free to mutate.
+    * with read_only=True, the structure is frozen once (see util.freeze)
+      and every caller receives the same read-only view.  This is cheaper,
+      but Configuration instances built on it cannot be modified.
+
+    The hits, misses, and evictions attributes count cache activity.
+
+    The cache is safe to share between threads.
+    """
+
+    def __init__(self, max_entries=128, read_only=False):
+        self.max_entries = max_entries
+        self.read_only = read_only
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = _OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        """Drops all cached entries (the counters are left alone)."""
+        with self._lock:
+            self._entries.clear()
+
+    def invalidate(self, path):
+        """Drops the cached entry for path, if any."""
+        with self._lock:
+            self._entries.pop(os.path.abspath(path), None)
+
+    def load(self, path, loader):
+        """Returns the configuration at path, calling loader(path) on a cache miss.
+
+        Raises whatever util.stat_signature or the loader raise; failures
+        are not cached.
+        """
+        return self._load(os.path.abspath(path), util.stat_signature(path), loader, path)
+
+    def _load(self, key, signature, loader, argument):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                del self._entries[key]
+                self._entries[key] = entry
+                self.hits += 1
+                return self._export(entry[1])
+            self.misses += 1
+
+        value = loader(argument)
+        if self.read_only:
+            value = util.freeze(value)
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (signature, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return self._export(value)
+
+    def _export(self, value):
+        if self.read_only:
+            return value
+        return copy.deepcopy(value)
+
+def layer_fingerprint(paths):
+    """Returns a tuple of (path, util.stat_signature(path)) for each of paths.
+
+    Two fingerprints of the same paths compare equal only if none of the
+    files was modified between the two calls.
+    """
+    return tuple((path, util.stat_signature(path)) for path in paths)
+
+class MergedConfigurationCache(ConfigurationCache):
+    """LRU cache of configurations merged from several files.
+
+    Entries are keyed on whatever identifies the merge (core uses the
+    configuration name and merge strategies) and validated against the
+    layer_fingerprint of the files merged, so that a merge is only redone
+    when a file was added, removed, reordered, or modified.  Validating an
+    entry costs one stat per file.
+
+    Results are shared and exported, and activity counted, exactly as by
+    ConfigurationCache.
+    """
+
+    def invalidate(self, key):
+        """Drops the cached entry for key, if any."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def load(self, key, paths, merger):
+        """Returns the merge of paths cached for key, calling merger(paths) on a cache miss.
+
+        Raises whatever util.stat_signature or the merger raise; failures
+        are not cached.
+        """
+        paths = tuple(paths)
+        return self._load(key, layer_fingerprint(paths), merger, paths)
+
+class NegativeLookupCache(object):
+    """Remembers configuration lookups that found no file.
+
+    Each miss is recorded against a key identifying the lookup (the core
+    module uses the candidate basenames and the version of SEARCH_PATHS),
+    and is trusted until one of the following:
+    * ttl seconds have passed, unless ttl is None.
+    * with validate_directories=True, the util.stat_signature of any of the
+      directories searched changed (creating a file in a directory changes
+      its mtime).  This costs a stat per directory, rather than one per
+      candidate file per directory.
+    * the miss is discarded via invalidate or clear.
+
+    At most max_entries misses are retained; the oldest is discarded first.
+
+    The hits, misses, and expirations attributes count cache activity.
+
+    The cache is safe to share between threads.
+    """
+
+    def __init__(self, ttl=5.0, validate_directories=False, max_entries=1024):
+        self.ttl = ttl
+        self.validate_directories = validate_directories
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self._entries = _OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        """Forgets all recorded misses (the counters are left alone)."""
+        with self._lock:
+            self._entries.clear()
+
+    def invalidate(self, key):
+        """Forgets the recorded miss for key, if any."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def directory_signatures(self, directories):
+        """Returns the signatures of directories for record, or None without validate_directories.
+
+        Take them before searching the directories, so that a file created
+        during the search invalidates the miss recorded for it.
+        """
+        if self.validate_directories:
+            return self._signatures(directories)
+        return None
+
+    def _signatures(self, directories):
+        signatures = []
+        for directory in directories:
+            try:
+                signatures.append(util.stat_signature(directory))
+            except OSError:
+                signatures.append(None)
+        return tuple(signatures)
+
+    def is_missing(self, key, directories=()):
+        """Returns True if a miss was recorded for key and is still trusted.
+
+        directories should be those the lookup would search; they are only
+        consulted with validate_directories.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False
+        expires, signatures = entry
+        expired = (expires is not None and time.time() >= expires) or \
+            (signatures is not None and self._signatures(directories) != signatures)
+        with self._lock:
+            if not expired:
+                self.hits += 1
+                return True
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+            self.expirations += 1
+            return False
+
+    def record(self, key, directories=(), signatures=None):
+        """Records that a lookup for key found nothing in directories.
+
+        signatures should be the directory_signatures of directories taken
+        before the lookup; without them, the directories are stat'ed now,
+        and a file created since the lookup goes unnoticed.
+        """
+        if not self.validate_directories:
+            signatures = None
+        elif signatures is None:
+            signatures = self._signatures(directories)
+        expires = None
+        if self.ttl is not None:
+            expires = time.time() + self.ttl
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (expires, signatures)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
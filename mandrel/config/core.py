@@ -1,18 +1,152 @@
+import itertools
 import mandrel
+import os
+import threading
 from mandrel import exception
 from mandrel import util
-import yaml
+from mandrel.config import cache
+from mandrel.config import inflight
+from mandrel.config import layered
+from mandrel.config import registry
+from mandrel.config import snapshot
 
 def _get_bootstrapper():
     if not hasattr(mandrel, 'bootstrap'):
         __import__('mandrel.bootstrap')
     return mandrel.bootstrap
 
+# The yaml Loader class used by read_yaml_path.  If None, the libyaml-backed
+# CSafeLoader is used when PyYAML was built against libyaml, as it is much
+# faster than the pure-python SafeLoader used otherwise.
+YAML_LOADER = None
+
+def get_yaml_loader():
+    """Returns the yaml Loader class read_yaml_path uses; see YAML_LOADER."""
+    if YAML_LOADER is not None:
+        return YAML_LOADER
+    import yaml
+    return getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
 def read_yaml_path(path):
+    # yaml is only imported once a YAML file is actually read.
+    import yaml
     with open(path, 'r') as f:
-        return yaml.safe_load(f)
+        return yaml.load(f, Loader=get_yaml_loader())
+
+# The function read_json_path parses JSON text with.  If None, the fastest
+# installed of orjson, ujson, and the standard library's json is used.
+JSON_LOADS = None
+
+def get_json_loads():
+    """Returns the function read_json_path parses JSON text with; see JSON_LOADS."""
+    if JSON_LOADS is not None:
+        return JSON_LOADS
+    for module_name in ('orjson', 'ujson'):
+        try:
+            return __import__(module_name).loads
+        except ImportError:
+            pass
+    import json
+    return json.loads
+
+def read_json_path(path):
+    with open(path, 'rb') as f:
+        return get_json_loads()(f.read())
+
+def get_toml_module():
+    """Returns the first available of tomllib, tomli, and toml, or None if none is installed."""
+    for module_name in ('tomllib', 'tomli', 'toml'):
+        try:
+            return __import__(module_name)
+        except ImportError:
+            pass
+    return None
+
+def read_toml_path(path):
+    toml = get_toml_module()
+    if toml is None:
+        # Not an UnknownConfigurationException: the file exists, and must
+        # not be mistaken for a missing configuration.
+        raise ImportError, "No TOML parser available to load '%s'; install tomli or toml" % path
+    if toml.__name__ == 'toml':
+        with open(path, 'r') as f:
+            return toml.load(f)
+    with open(path, 'rb') as f:
+        return toml.load(f)
+
+def read_ini_path(path):
+    """Reads an INI file into a dictionary of sections, each a dictionary of (string) options.
+
+    Options are case-sensitive and not interpolated; options of the DEFAULT
+    section appear in every section.
+    """
+    try:
+        import ConfigParser as configparser
+    except ImportError:
+        import configparser
+    parser = configparser.RawConfigParser()
+    parser.optionxform = str
+    with open(path, 'r') as f:
+        (getattr(parser, 'read_file', None) or parser.readfp)(f, path)
+    return dict((section, dict(parser.items(section))) for section in parser.sections())
+
+LOADERS = registry.LoaderRegistry([('yaml', read_yaml_path)])
+
+# Loaders for formats other than YAML.  They are not in LOADERS by default,
+# since each extension in LOADERS is one more candidate file to look for in
+# every search path directory; see enable_formats.
+OPTIONAL_LOADERS = (('json', read_json_path),
+                    ('toml', read_toml_path),
+                    ('ini', read_ini_path))
+
+def enable_formats(*extensions):
+    """Adds the loaders of OPTIONAL_LOADERS for extensions (all of them by default) to LOADERS.
 
-LOADERS = [('yaml', read_yaml_path)]
+    Each loader is added at the lowest priority, unless LOADERS already has
+    a loader for its extension.  The TOML loader is only added if
+    get_toml_module() finds a TOML parser.
+
+    Raises a ValueError for an extension not in OPTIONAL_LOADERS.
+
+    Returns the list of extensions added.
+    """
+    optional = dict(OPTIONAL_LOADERS)
+    for extension in extensions:
+        if extension not in optional:
+            raise ValueError, "No optional loader for extension '%s'" % extension
+    added = []
+    for extension, loader in OPTIONAL_LOADERS:
+        if extensions and extension not in extensions:
+            continue
+        if [ext for ext, existing in LOADERS if ext == extension]:
+            continue
+        if loader is read_toml_path and get_toml_module() is None:
+            continue
+        LOADERS.append((extension, loader))
+        added.append(extension)
+    return added
+
+# Set to a util.DirectoryIndex to answer configuration file searches from
+# cached directory listings instead of stat'ing every candidate path.
+SEARCH_PATH_INDEX = None
+
+# Set to a cache.ConfigurationCache to reuse parsed configuration files
+# across load_configuration_file calls.
+CONFIGURATION_CACHE = None
+
+# Set to True to serve configuration files from compiled snapshot sidecars,
+# regenerating them whenever their source changes; see the snapshot module.
+USE_SNAPSHOTS = False
+
+# An interning.Canonicalizer that every configuration file loaded is passed
+# through (before CONFIGURATION_CACHE retains it), sharing repeated strings
+# and structures across configurations.  None disables it.
+CANONICALIZER = None
+
+# A cache.NegativeLookupCache remembering names for which no configuration
+# file exists, so that repeated lookups of them (as by ForgivingConfiguration)
+# don't search SEARCH_PATHS again.  None disables it.
+MISSING_CONFIGURATION_CACHE = None
 
 def get_possible_basenames(name):
     """Calculates possible configuration file basenames for a root name.
@@ -36,9 +170,16 @@ def get_possible_basenames(name):
     Returns an array of all variations of that file basename we would be able
     to load given the extension/loader map we have in LOADERS (with exception
     noted above in the case that the name already matches one of our extensions).
+
+    If LOADERS is a registry.LoaderRegistry (as it is by default), the
+    expansions are cached by it.
     """
+    loaders = LOADERS
+    if isinstance(loaders, registry.LoaderRegistry):
+        return loaders.get_possible_basenames(name)
+
     matches = []
-    for ext, reader in LOADERS:
+    for ext, reader in loaders:
         end = '.' + ext
         if name[-len(end):] == end:
             return [name]
@@ -58,10 +199,17 @@ def find_configuration_files(name):
         name: a string representing a configuration file basename, typically
             without an extension.
 
+    If SEARCH_PATH_INDEX is set, the search is answered from its cached
+    directory listings rather than by checking each candidate file.
+
     Yields each existing best match across directories in SEARCH_PATHS.  The yielded paths
     are full, absolute paths.
     """
-    return util.find_files(get_possible_basenames(name), _get_bootstrapper().SEARCH_PATHS)
+    basenames = get_possible_basenames(name)
+    paths = _get_bootstrapper().SEARCH_PATHS
+    if SEARCH_PATH_INDEX is not None:
+        return SEARCH_PATH_INDEX.find_files(basenames, paths)
+    return util.find_files(basenames, paths)
 
 def find_configuration_file(name):
     """Finds the highest-priority readable configuration file for name.
@@ -78,10 +226,51 @@ def find_configuration_file(name):
     SEARCH_PATHS, based on extension order in LOADERS.
 
     Throws an UnknownConfigurationException if no such file exists.
+
+    If MISSING_CONFIGURATION_CACHE is set, names found not to exist are
+    remembered there, and the search is skipped while it trusts the miss.
+    """
+    path = _find_configuration_file(name)
+    if path is None:
+        raise exception.UnknownConfigurationException, "No configuration file found for name '%s'" % name
+    return path
+
+def _missing_configuration_key(name, paths):
+    version = getattr(paths, 'version', None)
+    if version is None:
+        version = tuple(paths)
+    return (tuple(get_possible_basenames(name)), version)
+
+def is_known_missing(name):
+    """Returns True if MISSING_CONFIGURATION_CACHE says name has no configuration file.
+
+    Returns False if there is no MISSING_CONFIGURATION_CACHE, or it has no
+    trusted record of a miss for name.
     """
+    missing = MISSING_CONFIGURATION_CACHE
+    if missing is None:
+        return False
+    paths = _get_bootstrapper().SEARCH_PATHS
+    return missing.is_missing(_missing_configuration_key(name, paths), paths)
+
+def _find_configuration_file(name):
+    missing = MISSING_CONFIGURATION_CACHE
+    if missing is None:
+        for path in find_configuration_files(name):
+            return path
+        return None
+
+    paths = _get_bootstrapper().SEARCH_PATHS
+    key = _missing_configuration_key(name, paths)
+    if missing.is_missing(key, paths):
+        return None
+    signatures = missing.directory_signatures(paths)
     for path in find_configuration_files(name):
         return path
-    raise exception.UnknownConfigurationException, "No configuration file found for name '%s'" % name
+    missing.record(key, paths, signatures)
+    return None
+
+_SNAPSHOT_SUFFIX = '.' + snapshot.SNAPSHOT_EXTENSION
 
 def get_loader(path):
     """Gets the configuration loader for path according to file extension.
@@ -91,13 +280,24 @@ def get_loader(path):
             extension.
 
     Returns the loader associated with path's extension within LOADERS.
+    Snapshot sidecars (see the snapshot module) are loaded with
+    snapshot.read_snapshot_path, though they aren't in LOADERS, so that
+    they are never search candidates.
 
     Throws an UnknownConfigurationException if no such loader exists.
     """
-    for ext, loader in LOADERS:
-        fullext = '.' + ext
-        if path[-len(fullext):] == fullext:
+    if path.endswith(_SNAPSHOT_SUFFIX):
+        return snapshot.read_snapshot_path
+    loaders = LOADERS
+    if isinstance(loaders, registry.LoaderRegistry):
+        loader = loaders.get_loader(path)
+        if loader is not None:
             return loader
+    else:
+        for ext, loader in loaders:
+            fullext = '.' + ext
+            if path[-len(fullext):] == fullext:
+                return loader
     raise exception.UnknownConfigurationException, "No configuration loader found for path '%s'" % path
 
 def load_configuration_file(path):
@@ -106,10 +306,37 @@ def load_configuration_file(path):
     Parameters:
         path: the path to the configuration file to load.
 
+    If CONFIGURATION_CACHE is set, the file is only parsed if it changed since
+    the cache last saw it; see cache.ConfigurationCache for the sharing rules.
+
+    If USE_SNAPSHOTS is True, the file is read from its snapshot sidecar when
+    that is up to date, and the snapshot is regenerated when it is not.
+
+    If CANONICALIZER is set, the configuration is canonicalized by it, so
+    its nested structures are read-only.
+
     Returns the dictionary resulting from loading the specified configuration file.
     """
+    configuration_cache = CONFIGURATION_CACHE
+    if configuration_cache is not None:
+        return configuration_cache.load(path, _read_configuration_file)
+    return _read_configuration_file(path)
+
+def _read_configuration_file(path):
     loader = get_loader(path)
-    return loader(path)
+    if USE_SNAPSHOTS and loader is not snapshot.read_snapshot_path:
+        value = snapshot.load(path, loader)
+    else:
+        value = loader(path)
+    canonicalizer = CANONICALIZER
+    if canonicalizer is not None:
+        value = canonicalizer.canonicalize(value)
+    return value
+
+# A shared.SharedConfigurationStore; get_configuration returns the
+# configurations published there instead of searching for and loading
+# files.  None disables it.
+SHARED_STORE = None
 
 def get_configuration(name):
     """Finds and loads the best configuration for name.
@@ -129,9 +356,236 @@ def get_configuration(name):
     May throw an UnknownConfigurationException if no file can be found,
     or if the file has no loader.  May also throw other exceptions
     according to the loader used.
+
+    If SHARED_STORE is set and has a configuration published for name, a
+    view of that is returned instead.
     """
+    configuration = _get_shared_configuration(name)
+    if configuration is not None:
+        return configuration
     return load_configuration_file(find_configuration_file(name))
 
+def _get_shared_configuration(name):
+    shared_store = SHARED_STORE
+    if shared_store is None:
+        return None
+    return shared_store.get(name)
+
+def _get_configuration(name, missing):
+    # As get_configuration, but returns missing if there is no file for name.
+    configuration = _get_shared_configuration(name)
+    if configuration is not None:
+        return configuration
+    path = _find_configuration_file(name)
+    if path is None:
+        return missing
+    return load_configuration_file(path)
+
+# A cache.MergedConfigurationCache reusing the results of
+# get_merged_configuration for as long as none of the files merged changes.
+# None disables it.
+MERGED_CONFIGURATION_CACHE = cache.MergedConfigurationCache()
+
+def get_merged_configuration(name, list_strategy='replace', dict_strategy='merge'):
+    """Finds all configuration files for name and deep-merges them.
+
+    Each file yielded by find_configuration_files(name) is loaded with
+    load_configuration_file, and overrides the values of the files of lower
+    priority (those later in SEARCH_PATHS) as described in the layered module.
+
+    Parameters:
+        name: the name of the configuration files to look for and load,
+            typically without an extension.
+        list_strategy: how lists in two files are combined: 'replace',
+            'append', 'prepend', 'unique', or a function of (lower, higher).
+        dict_strategy: how dictionaries in two files are combined: 'merge',
+            'replace', or a function of (lower, higher).
+
+    If MERGED_CONFIGURATION_CACHE is set, the files are only loaded and
+    merged again if one of them changed since the last such call.
+
+    Returns the merged dictionary.
+
+    May throw an UnknownConfigurationException if no file can be found,
+    or if a file has no loader; a ValueError for an unknown strategy.  May
+    also throw other exceptions according to the loaders used.
+    """
+    merger = layered.Merger(list_strategy, dict_strategy)
+    paths = list(find_configuration_files(name))
+    if not paths:
+        raise exception.UnknownConfigurationException, "No configuration file found for name '%s'" % name
+
+    def merge(paths):
+        return merger.merge_layers([load_configuration_file(path) for path in paths])
+
+    merged_cache = MERGED_CONFIGURATION_CACHE
+    if merged_cache is None:
+        return merge(paths)
+    return merged_cache.load((name, list_strategy, dict_strategy), paths, merge)
+
+# The default size of the thread pool get_configurations parses files with.
+BATCH_WORKERS = 4
+
+class ConfigurationBatch(dict):
+    """The result of get_configurations.
+
+    Maps each successfully loaded name to its configuration dictionary.
+    Names that failed are instead keys of the errors attribute, mapped to
+    the exception that loading them raised.
+    """
+    def __init__(self, *args, **kw):
+        super(ConfigurationBatch, self).__init__(*args, **kw)
+        self.errors = {}
+
+def resolve_configuration_files(names):
+    """Finds the best configuration file for each of names in a single pass over SEARCH_PATHS.
+
+    Each directory in SEARCH_PATHS (or beneath it, for names that include a
+    directory) is listed at most once (via SEARCH_PATH_INDEX if set,
+    otherwise a fresh util.DirectoryIndex), regardless of the number of
+    names, unless it was modified too recently for its listing to be reused
+    (see util.DirectoryIndex).  The search stops early once every name has
+    been resolved.
+
+    Returns a dict mapping each name for which a file was found to the full
+    path of its highest-priority file, as find_configuration_file would.
+    """
+    index = SEARCH_PATH_INDEX
+    if index is None:
+        index = util.DirectoryIndex()
+    remaining = [(name, get_possible_basenames(name)) for name in set(names)]
+    found = {}
+    for path in _get_bootstrapper().SEARCH_PATHS:
+        if not remaining:
+            break
+        unresolved = []
+        for name, basenames in remaining:
+            for basename in basenames:
+                if index.isfile(path, basename):
+                    found[name] = os.path.join(path, basename)
+                    break
+            else:
+                unresolved.append((name, basenames))
+        remaining = unresolved
+    return found
+
+def get_configurations(names, pool=None, workers=None):
+    """Finds and loads the best configuration for each of names, parsing files in parallel.
+
+    Names are resolved with resolve_configuration_files, then the files are
+    loaded via load_configuration_file across a pool of workers.  A failure
+    for one name does not affect the others.
+
+    Parameters:
+        names: the configuration names to load (any iterable).
+        pool: an optional multiprocessing.Pool or multiprocessing.pool.ThreadPool
+            (or anything with a compatible apply_async) to load files with.
+        workers: the number of threads to use when pool is not given;
+            defaults to BATCH_WORKERS.
+
+    Returns a ConfigurationBatch mapping names to configuration dictionaries.
+    Each name that could not be loaded is instead in the batch's errors,
+    mapped to the exception get_configuration would have raised for it:
+    an UnknownConfigurationException if no file (or no loader) was found, or
+    whatever the loader raised.
+
+    As with get_configuration, names published in SHARED_STORE (if set)
+    are taken from it rather than loaded.
+    """
+    names = list(names)
+    batch = ConfigurationBatch()
+    shared_store = SHARED_STORE
+    if shared_store is not None:
+        unshared = []
+        for name in names:
+            configuration = shared_store.get(name)
+            if configuration is None:
+                unshared.append(name)
+            else:
+                batch[name] = configuration
+        names = unshared
+    paths = resolve_configuration_files(names)
+    pending = []
+    seen = set()
+    for name in names:
+        if name in seen:
+            continue
+        seen.add(name)
+        if name in paths:
+            pending.append((name, paths[name]))
+        else:
+            batch.errors[name] = exception.UnknownConfigurationException("No configuration file found for name '%s'" % name)
+
+    if pool is None and len(pending) < 2:
+        for name, path in pending:
+            try:
+                batch[name] = load_configuration_file(path)
+            except Exception, e:
+                batch.errors[name] = e
+        return batch
+
+    own_pool = None
+    if pool is None:
+        import multiprocessing.pool
+        pool = own_pool = multiprocessing.pool.ThreadPool(min(workers or BATCH_WORKERS, len(pending)))
+    try:
+        results = [(name, pool.apply_async(load_configuration_file, (path,))) for name, path in pending]
+        for name, result in results:
+            try:
+                batch[name] = result.get()
+            except Exception, e:
+                batch.errors[name] = e
+    finally:
+        if own_pool is not None:
+            own_pool.close()
+            own_pool.join()
+    return batch
+
+_IN_FLIGHT = inflight.InFlightLoads()
+
+def afind_configuration_files(name):
+    """Asynchronous find_configuration_files(name), run in a background thread.
+
+    Returns an inflight.Future for the list of matching paths.  Wait on it
+    with its result() method, or use its add_done_callback() method.
+
+    Concurrent requests for the same name share one search.
+    """
+    return _IN_FLIGHT.submit(('find_configuration_files', name),
+                             lambda: list(find_configuration_files(name)))
+
+def aget_configuration(name):
+    """Asynchronous get_configuration(name), run in a background thread.
+
+    Returns an inflight.Future for the configuration dictionary.  Wait on
+    it with its result() method, or use its add_done_callback() method;
+    failures raise the same exceptions get_configuration would.
+
+    Concurrent requests for the same name share one load; each caller
+    still receives its own dictionary.
+    """
+    return _IN_FLIGHT.submit(('get_configuration', name), get_configuration, name)
+
+# Replaced whenever Configuration state changes, which discards every
+# instance's cached attribute lookups (see Configuration.CACHE_LOOKUPS).
+# Each value is drawn from _lookup_generations, so concurrent changes
+# never store the same one: an instance that cached its lookups under
+# either sees them discarded by the other.
+_lookup_generations = itertools.count(1)
+_lookup_generation = 0
+
+def invalidate_lookup_caches():
+    """Discards the cached attribute lookups of all Configuration instances.
+
+    Changes made through configuration_set or instance_set do this
+    automatically; call it after modifying a configuration dictionary
+    directly.
+    """
+    global _lookup_generation
+    _lookup_generation = next(_lookup_generations)
+
+_MISSING = object()
+
 class Configuration(object):
     """Base class for managing component configuration.
 
@@ -161,8 +615,17 @@ class Configuration(object):
     When setting an attribute on an instance, the effect is to set
     that attribute on the underlying configuration dictionary (as
     a key/value pair), rather than on the instance itself.
+
+    Set CACHE_LOOKUPS to True in a subclass to memoize the results of
+    chained attribute lookups; see chained_get.
+
+    The configuration and chain are held in slots; an instance __dict__
+    is only allocated if something else is set with instance_set.
     """
+    __slots__ = ('configuration', 'chain', '_lookups', '__dict__', '__weakref__')
+
     NAME = None
+    CACHE_LOOKUPS = False
 
     @classmethod
     def load_configuration(cls):
@@ -171,9 +634,9 @@ class Configuration(object):
         Uses the class constant NAME as the name lookup for the configuration
         file.
 
-        Note that this *always* goes to the file system for configuration; no
-        caching takes place.  Manage your own state in the manner best suited
-        to your problem domain.
+        Note that this *always* goes to the file system for configuration; unless
+        a CONFIGURATION_CACHE is installed, no caching takes place.  Manage your
+        own state in the manner best suited to your problem domain.
 
         Raises an UnknownConfigurationException if no such configuration can
         be found.  Additionally, since configuration depends on bootstrapping,
@@ -194,6 +657,17 @@ class Configuration(object):
         """
         return cls(cls.load_configuration(), *chain)
 
+    @classmethod
+    def aget_configuration(cls, *chain):
+        """Asynchronous get_configuration, loading in a background thread.
+
+        Returns an inflight.Future for the instance; see the module-level
+        aget_configuration.  Concurrent requests for the same class share
+        one load_configuration call.
+        """
+        load = _IN_FLIGHT.submit((cls, 'load_configuration'), cls.load_configuration)
+        return load.then(lambda configuration: cls(configuration, *chain))
+
     @classmethod
     def get_logger_name(cls, name=None):
         """Returns a logger name according to the class' constant NAME.
@@ -241,6 +715,7 @@ class Configuration(object):
     def configuration_set(self, attribute, value):
         """Sets the attribute and value as a key,value pair on the configuration dictionary."""
         self.configuration[attribute] = value
+        invalidate_lookup_caches()
 
     def configuration_get(self, attribute):
         """Retrieves the requested attribute (as a key) from the configuration dictionary."""
@@ -248,14 +723,57 @@ class Configuration(object):
 
     def instance_set(self, attribute, value):
         """Sets the attribute and value on the instance directly."""
+        try:
+            # No other object can have looked anything up through an
+            # instance that is still being initialized.
+            object.__getattribute__(self, 'chain')
+        except AttributeError:
+            return super(Configuration, self).__setattr__(attribute, value)
         super(Configuration, self).__setattr__(attribute, value)
+        invalidate_lookup_caches()
 
     def instance_get(self, attribute):
         """Returns the attribute from the instance directly."""
         return getattr(self, attribute)
 
     def chained_get(self, attribute):
-        """Returns the 'best' value for the attribute, consulting the configuration then the chain in turn."""
+        """Returns the 'best' value for the attribute, consulting the configuration then the chain in turn.
+
+        If CACHE_LOOKUPS is set, each result (including a failure) is
+        remembered by the instance, so that repeated lookups cost a
+        single dictionary access regardless of chain depth.  The cache is
+        discarded whenever any Configuration is modified through
+        configuration_set or instance_set (or invalidate_lookup_caches is
+        called), so this is only appropriate when all changes go through
+        those methods and chain members don't compute values dynamically.
+        """
+        if self.CACHE_LOOKUPS:
+            return self._cached_chained_get(attribute)
+        return self._chained_get(attribute)
+
+    def _cached_chained_get(self, attribute):
+        generation = _lookup_generation
+        try:
+            cached_generation, lookups = object.__getattribute__(self, '_lookups')
+        except AttributeError:
+            cached_generation = None
+        if cached_generation != generation:
+            lookups = {}
+            object.__setattr__(self, '_lookups', (generation, lookups))
+
+        try:
+            value = lookups[attribute]
+        except KeyError:
+            try:
+                value = lookups[attribute] = self._chained_get(attribute)
+            except AttributeError:
+                lookups[attribute] = _MISSING
+                raise
+        if value is _MISSING:
+            raise AttributeError, 'No such attribute: %s' % attribute
+        return value
+
+    def _chained_get(self, attribute):
         try:
             return self.configuration_get(attribute)
         except KeyError:
@@ -273,11 +791,37 @@ class Configuration(object):
         return self.chained_get(attr)
 
     def __setattr__(self, attr, val):
-        if hasattr(getattr(self.__class__, attr, None), '__set__'):
+        if attr not in Configuration.__slots__ and hasattr(getattr(self.__class__, attr, None), '__set__'):
             # Descriptor support
             return object.__setattr__(self, attr, val)
         return self.configuration_set(attr, val)
 
+    def _state_slots(self):
+        for cls in type(self).__mro__:
+            for name in cls.__dict__.get('__slots__', ()):
+                if name not in ('__dict__', '__weakref__', '_lookups'):
+                    yield name
+
+    def __getstate__(self):
+        """Returns the instance state for copy and pickle: its slots and __dict__.
+
+        Cached lookups are not part of the state.
+        """
+        state = {}
+        for name in self._state_slots():
+            try:
+                state[name] = object.__getattribute__(self, name)
+            except AttributeError:
+                pass
+        state.update(object.__getattribute__(self, '__dict__'))
+        return state
+
+    def __setstate__(self, state):
+        # Restored directly, bypassing __setattr__ (which would treat the
+        # slots as configuration keys).
+        for name, value in state.iteritems():
+            object.__setattr__(self, name, value)
+
     def hot_copy(self):
         """Returns a new instance of the same class, using self as the first point in the chain.
 
@@ -286,9 +830,172 @@ class Configuration(object):
 
         However, because the original exposes its state through chaining, its possible to
         indirectly alter the state of the original configuration.
+
+        Each hot copy adds a level to the chain, making lookups through copies of
+        copies progressively slower; see cow_copy, snapshot, and freeze for
+        alternatives that don't.
         """
         return type(self)({}, self)
 
+    def cow_copy(self):
+        """Returns a new instance of the same class with a copy-on-write copy of the configuration.
+
+        The copy has the same chain as self (rather than self as its chain), and a
+        util.CopyOnWriteDict holding self's configuration dictionary as of now.
+        Mutations to either the copy or the original do not affect the other.
+
+        Unlike hot_copy, the cost of lookups through the copy doesn't grow with the
+        number of prior copies.  Copying an instance whose configuration is itself a
+        CopyOnWriteDict (such as another cow_copy) is O(1); otherwise the dictionary
+        is copied once.
+        """
+        configuration = self.configuration
+        if isinstance(configuration, util.CopyOnWriteDict):
+            configuration = configuration.copy()
+        else:
+            configuration = util.CopyOnWriteDict(configuration)
+        return type(self)(configuration, *self.chain)
+
+    def _flattenable(self, member):
+        if not isinstance(member, Configuration) or not isinstance(self, type(member)):
+            return False
+        extras = set(getattr(member, '__dict__', ())) - set(('configuration', 'chain', '_lookups'))
+        return not extras
+
+    def _flatten(self):
+        """Returns (values, residual) where self is equivalent to type(self)(values, *residual)."""
+        values = {}
+        residual = []
+        pending = [self]
+        while pending:
+            member = pending.pop()
+            if not residual and (member is self or self._flattenable(member)):
+                for key, value in member.configuration.iteritems():
+                    values.setdefault(key, value)
+                pending.extend(reversed(member.chain))
+            else:
+                residual.append(member)
+        return values, residual
+
+    def snapshot(self):
+        """Returns a new instance of the same class with the chain's values flattened into one dictionary.
+
+        Every key visible through self (its configuration, then its chain, in
+        order) is copied into a new configuration dictionary, so lookups on the
+        snapshot cost a single dictionary access.  Later changes to self or its
+        chain are not reflected in the snapshot, and vice versa.
+
+        Chain members that are not instances of self's class (or its bases), or
+        that carry instance attributes of their own, cannot be flattened without
+        changing lookup results; such a member and everything after it in lookup
+        order remain in the snapshot's chain.
+        """
+        values, residual = self._flatten()
+        return type(self)(values, *residual)
+
+    def freeze(self):
+        """Returns an immutable snapshot of self.
+
+        As snapshot(), except that the configuration is frozen with util.freeze,
+        so attempts to modify it raise a TypeError.
+        """
+        values, residual = self._flatten()
+        return type(self)(util.freeze(values), *residual)
+
+class CompactConfiguration(Configuration):
+    """Configuration class for large numbers of instances.
+
+    Behaves exactly as Configuration, but stores a configuration dictionary
+    given to the constructor as a util.SharedKeyDict: instances whose
+    configurations have the same keys share a single key table, holding
+    only a list of values apiece.  Set SHARE_KEY_TABLES to False in a
+    subclass to keep configuration dictionaries as given.
+
+    Only the top level of the configuration is converted; nested
+    dictionaries are left alone.  Subclasses should declare __slots__
+    (typically empty) to avoid per-instance state of their own.
+    """
+    __slots__ = ()
+
+    SHARE_KEY_TABLES = True
+
+    def __init__(self, configuration, *chain):
+        """Initialize the object with a configuration dictionary and any number of chain members."""
+        if self.SHARE_KEY_TABLES and type(configuration) is dict:
+            configuration = util.SharedKeyDict(configuration)
+        super(CompactConfiguration, self).__init__(configuration, *chain)
+
+class ConcurrentConfiguration(Configuration):
+    """Configuration class safe to read while other threads modify it.
+
+    The configuration dictionary is never modified in place.  It is held as
+    a read-only util.FrozenDict; each change builds a new one and publishes
+    it by replacing the configuration attribute, which is atomic.  Readers
+    therefore take no locks, and always see either all or none of a change,
+    while writers are serialized by a per-instance lock (RCU-style).
+
+    Use configuration_update to change several keys at once.  Each change
+    copies the top level of the configuration, so writes cost time in
+    proportion to its size.  Instances returned by freeze() refuse changes
+    with a TypeError, as other frozen configurations do.
+
+    Only the top level of the configuration is copied; nested values must
+    be replaced rather than modified.  A lookup falling through to the
+    chain is atomic with respect to each chain member, not to the chain as
+    a whole.
+    """
+    __slots__ = ('_write_lock', '_frozen')
+
+    def __init__(self, configuration, *chain):
+        """Initialize the object with a configuration dictionary and any number of chain members."""
+        object.__setattr__(self, '_write_lock', threading.Lock())
+        object.__setattr__(self, '_frozen', False)
+        super(ConcurrentConfiguration, self).__init__(configuration, *chain)
+
+    def __getstate__(self):
+        state = super(ConcurrentConfiguration, self).__getstate__()
+        del state['_write_lock']
+        return state
+
+    def __setstate__(self, state):
+        # Copies get a writer lock of their own.
+        object.__setattr__(self, '_write_lock', threading.Lock())
+        super(ConcurrentConfiguration, self).__setstate__(state)
+
+    def instance_set(self, attribute, value):
+        """Sets the attribute and value on the instance directly.
+
+        A new configuration dictionary is copied into a util.FrozenDict, unless
+        it already is one.
+        """
+        if attribute == 'configuration' and not isinstance(value, util.FrozenDict):
+            value = util.FrozenDict(value)
+        super(ConcurrentConfiguration, self).instance_set(attribute, value)
+
+    def configuration_set(self, attribute, value):
+        """Publishes a new configuration dictionary with attribute set to value."""
+        self.configuration_update(((attribute, value),))
+
+    def configuration_update(self, values=(), **kw):
+        """Publishes a new configuration dictionary updated (as by dict.update) with values and kw."""
+        if self._frozen:
+            raise TypeError, "Frozen '%s' object does not support modification" % type(self).__name__
+        with self._write_lock:
+            configuration = util.FrozenDict(self.configuration)
+            # Not yet visible to any other thread, so still safe to modify.
+            dict.update(configuration, values, **kw)
+            self.instance_set('configuration', configuration)
+
+    def freeze(self):
+        """Returns an immutable snapshot of self.
+
+        As Configuration.freeze(); configuration_set and configuration_update
+        on the result raise a TypeError.
+        """
+        frozen = super(ConcurrentConfiguration, self).freeze()
+        object.__setattr__(frozen, '_frozen', True)
+        return frozen
+
 class ForgivingConfiguration(Configuration):
     """Configuration class for defaults or empty configs.
 
@@ -309,9 +1016,16 @@ class ForgivingConfiguration(Configuration):
         """Return the best configuration dictionary available from files.
         
         If no configuration file can be found, an empty dictionary is returned.
+        With a MISSING_CONFIGURATION_CACHE, a name already known to be missing
+        returns the empty dictionary without searching.
         """
+        load = super(ForgivingConfiguration, cls).load_configuration
         try:
-            return super(ForgivingConfiguration, cls).load_configuration()
+            if MISSING_CONFIGURATION_CACHE is not None and \
+                    load.im_func is Configuration.load_configuration.im_func:
+                # Consult the cache once, without raising for a missing file.
+                return _get_configuration(cls.NAME, {})
+            return load()
         except exception.UnknownConfigurationException:
             return {}
 
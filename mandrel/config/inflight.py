@@ -0,0 +1,163 @@
+"""Background configuration loading with de-duplication of concurrent requests.
+
+Configuration loading is blocking file system work (stat calls, reads, and
+parsing).  The functions here run such work in background threads and
+return a Future for the result, so that event-driven callers can wait
+without blocking their loop: a done callback can hand the result over
+with the loop's thread-safe scheduling call.  These futures are plain
+thread-based ones; they cannot be awaited, as there is no asyncio on the
+Python 2 this package runs on.
+
+Concurrent requests for the same key share a single in-flight load.
+"""
+import copy
+import sys
+import threading
+from mandrel import exception
+
+class Future(object):
+    """The eventual result of a background load.
+
+    Use result() to block for the value (or the load's exception), or
+    add_done_callback() to be notified on completion.  Callbacks run in
+    the thread that completes the load.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._value = None
+        self._exc_info = None
+
+    def done(self):
+        """Returns True once the load has finished, successfully or not."""
+        return self._event.is_set()
+
+    def _wait(self, timeout):
+        if not self._event.wait(timeout) and not self._event.is_set():
+            raise exception.TimeoutException, 'Load did not complete within %s seconds' % timeout
+
+    def result(self, timeout=None):
+        """Returns the loaded value, waiting up to timeout seconds (forever if None).
+
+        Re-raises the exception the load failed with, if any.  Raises a
+        TimeoutException if the load is still running after timeout seconds.
+        """
+        self._wait(timeout)
+        if self._exc_info is not None:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._value
+
+    def exception(self, timeout=None):
+        """Returns the exception the load failed with, or None if it succeeded."""
+        self._wait(timeout)
+        if self._exc_info is not None:
+            return self._exc_info[1]
+        return None
+
+    def add_done_callback(self, callback):
+        """Arranges for callback(future) on completion; calls it immediately if already done."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def _finish(self, value, exc_info):
+        with self._lock:
+            self._value = value
+            self._exc_info = exc_info
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+    def set_result(self, value):
+        self._finish(value, None)
+
+    def set_exception(self, exc_info=None):
+        """Fails the future with exc_info (sys.exc_info() by default)."""
+        self._finish(None, exc_info or sys.exc_info())
+
+    def then(self, func):
+        """Returns a new Future resolving to func(result), or failing as this one does."""
+        derived = Future()
+        def chain(future):
+            if future._exc_info is not None:
+                return derived.set_exception(future._exc_info)
+            try:
+                derived.set_result(func(future._value))
+            except Exception:
+                derived.set_exception()
+        self.add_done_callback(chain)
+        return derived
+
+def run_in_background(func, *args):
+    """Returns a Future for func(*args), which runs in a new daemon thread."""
+    future = Future()
+    def run():
+        try:
+            value = func(*args)
+        except Exception:
+            return future.set_exception()
+        future.set_result(value)
+    thread = threading.Thread(target=run, name='mandrel-load')
+    thread.daemon = True
+    thread.start()
+    return future
+
+class InFlightLoads(object):
+    """Coalesces concurrent background loads that share a key.
+
+    While a load for a key is running, further submissions for that key
+    join it instead of starting another.  The first submitter receives the
+    loaded value itself; every joiner receives its own deep copy, made
+    before the first submitter's future completes, so callers never share
+    mutable state.  Once a load finishes, the next
+    submission for its key starts a fresh load.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def __len__(self):
+        return len(self._pending)
+
+    def submit(self, key, func, *args):
+        """Returns a Future for func(*args), joining any in-flight load for key."""
+        with self._lock:
+            joiners = self._pending.get(key)
+            if joiners is not None:
+                joiner = Future()
+                joiners.append(joiner)
+                return joiner
+            joiners = self._pending[key] = []
+        first = Future()
+
+        def finished(future):
+            with self._lock:
+                if self._pending.get(key) is joiners:
+                    del self._pending[key]
+            if future._exc_info is not None:
+                for joiner in joiners:
+                    joiner.set_exception(future._exc_info)
+                return first.set_exception(future._exc_info)
+            # Copy for the joiners before the first submitter can get at
+            # the value and modify it.
+            copies = []
+            for joiner in joiners:
+                try:
+                    copies.append((joiner, copy.deepcopy(future._value), None))
+                except Exception:
+                    copies.append((joiner, None, sys.exc_info()))
+            first.set_result(future._value)
+            for joiner, value, exc_info in copies:
+                if exc_info is None:
+                    joiner.set_result(value)
+                else:
+                    joiner.set_exception(exc_info)
+
+        run_in_background(func, *args).add_done_callback(finished)
+        return first
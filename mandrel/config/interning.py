@@ -0,0 +1,124 @@
+"""Sharing of repeated strings and structures across loaded configurations.
+
+Configuration files across a fleet tend to repeat the same key names and
+many of the same values (host names, log levels, class names), and often
+whole identical sections.  Parsed separately, each file holds its own copy
+of every one of them.  A Canonicalizer returns, for each value, one
+shared canonical instance of everything equal to it that it has seen:
+
+    canonicalizer = interning.Canonicalizer()
+    core.CANONICALIZER = canonicalizer
+    ...
+    print canonicalizer.report()
+
+core.load_configuration_file then canonicalizes every configuration it
+loads (before CONFIGURATION_CACHE sees it).
+
+Strings, keys and values alike, are interned.  Nested dictionaries, lists,
+and sets are made read-only (as by util.freeze: FrozenDicts, tuples, and
+frozensets) so that they can be shared, and each is replaced by the
+canonical instance of an equal structure if there is one.  The top-level
+dictionary of a configuration remains a new, modifiable dict.
+
+The canonicalizer retains every canonical instance it hands out; use
+clear() to release them.
+"""
+import sys
+import threading
+from mandrel import util
+
+_CONTAINERS = (dict, list, tuple, set, frozenset)
+
+class Canonicalizer(object):
+    """Interns strings and shares identical read-only subtrees across values.
+
+    The strings, shared_strings, subtrees, and shared_subtrees attributes
+    count the strings and nested structures canonicalized, and how many of
+    them were replaced by an existing equal instance.  bytes_saved
+    estimates (with sys.getsizeof) the memory those replacements freed.
+
+    A Canonicalizer is safe to share between threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Forgets all canonical instances and resets the counters."""
+        self._strings = {}
+        self._subtrees = {}
+        self.strings = 0
+        self.shared_strings = 0
+        self.subtrees = 0
+        self.shared_subtrees = 0
+        self.bytes_saved = 0
+
+    def canonicalize(self, value):
+        """Returns the canonical equivalent of value.
+
+        A dict value yields a new dict whose keys and values are canonical;
+        any other value is itself made canonical.
+        """
+        with self._lock:
+            if isinstance(value, dict) and not isinstance(value, util.FrozenDict):
+                return dict((self._string(k), self._value(v)) for k, v in value.iteritems())
+            return self._value(value)
+
+    def _string(self, value):
+        if not isinstance(value, basestring):
+            return value
+        self.strings += 1
+        table = self._strings.setdefault(type(value), {})
+        canonical = table.setdefault(value, value)
+        if canonical is not value:
+            self.shared_strings += 1
+            self.bytes_saved += sys.getsizeof(value)
+        return canonical
+
+    def _token(self, value):
+        # Identifies a canonical value within the key of its container:
+        # containers by identity, since equal canonical containers are the
+        # same object, and scalars by type and value, so that 1, 1.0, and
+        # True remain distinct.
+        if isinstance(value, _CONTAINERS):
+            return (None, id(value))
+        return (type(value), value)
+
+    def _value(self, value):
+        if isinstance(value, basestring):
+            return self._string(value)
+        if isinstance(value, dict):
+            frozen = util.FrozenDict((self._string(k), self._value(v)) for k, v in value.iteritems())
+            return self._share(value, frozen, lambda: frozenset((k, self._token(v)) for k, v in frozen.iteritems()))
+        if isinstance(value, (list, tuple)):
+            frozen = tuple(self._value(v) for v in value)
+            return self._share(value, frozen, lambda: tuple(self._token(v) for v in frozen))
+        if isinstance(value, (set, frozenset)):
+            frozen = frozenset(self._value(v) for v in value)
+            return self._share(value, frozen, lambda: frozenset(self._token(v) for v in frozen))
+        return value
+
+    def _share(self, value, frozen, key):
+        # Returns the canonical equivalent of frozen, the read-only copy
+        # of value, identified by key().  The memory saved is that of the
+        # original value, which the canonical instance replaces.
+        self.subtrees += 1
+        try:
+            key = (type(frozen), key())
+            canonical = self._subtrees.setdefault(key, frozen)
+        except TypeError:
+            # Contains an unhashable value; it can't be matched.
+            return frozen
+        if canonical is not frozen:
+            self.shared_subtrees += 1
+            self.bytes_saved += sys.getsizeof(value)
+        return canonical
+
+    def report(self):
+        """Returns a dictionary of the counters described in the class documentation."""
+        return {'strings': self.strings,
+                'shared_strings': self.shared_strings,
+                'subtrees': self.subtrees,
+                'shared_subtrees': self.shared_subtrees,
+                'bytes_saved': self.bytes_saved}
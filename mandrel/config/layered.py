@@ -0,0 +1,98 @@
+"""Deep merging of configuration layers.
+
+A configuration name may match a file in several directories of
+SEARCH_PATHS; core.get_merged_configuration combines all of them, with
+each file overriding those of lower priority.  A Merger defines how the
+values found at the same place in two layers are combined:
+* two dictionaries are combined according to the dict strategy,
+* two lists (or tuples) according to the list strategy,
+* anything else is taken from the higher-priority layer.
+
+Dict strategies:
+* 'merge' (the default): the union of both dictionaries, with the values
+  of keys present in both merged recursively.
+* 'replace': the higher-priority dictionary.
+
+List strategies:
+* 'replace' (the default): the higher-priority list.
+* 'append': the lower-priority items followed by the higher-priority ones.
+* 'prepend': the higher-priority items followed by the lower-priority ones.
+* 'unique': as 'append', skipping higher-priority items already present.
+
+Either strategy may also be a function of (lower, higher) returning the
+combined value.
+
+Merging never modifies the layers; merged dictionaries and lists are new
+objects, though values taken unchanged from a layer are shared with it.
+"""
+
+def _replace(lower, higher):
+    return higher
+
+def _append(lower, higher):
+    return list(lower) + list(higher)
+
+def _prepend(lower, higher):
+    return list(higher) + list(lower)
+
+def _unique(lower, higher):
+    result = list(lower)
+    for value in higher:
+        if value not in result:
+            result.append(value)
+    return result
+
+LIST_STRATEGIES = {'replace': _replace,
+                   'append': _append,
+                   'prepend': _prepend,
+                   'unique': _unique}
+
+DICT_STRATEGIES = ('merge', 'replace')
+
+class Merger(object):
+    """Merges configuration layers according to a list and a dict strategy."""
+
+    def __init__(self, list_strategy='replace', dict_strategy='merge'):
+        if callable(list_strategy):
+            self.merge_lists = list_strategy
+        elif list_strategy in LIST_STRATEGIES:
+            self.merge_lists = LIST_STRATEGIES[list_strategy]
+        else:
+            raise ValueError, "Unknown list merge strategy '%s'" % (list_strategy,)
+
+        if callable(dict_strategy):
+            self.merge_dicts = dict_strategy
+        elif dict_strategy == 'replace':
+            self.merge_dicts = _replace
+        elif dict_strategy != 'merge':
+            raise ValueError, "Unknown dict merge strategy '%s'" % (dict_strategy,)
+
+    def merge(self, lower, higher):
+        """Returns the combination of lower with the higher-priority value higher."""
+        if isinstance(lower, dict) and isinstance(higher, dict):
+            return self.merge_dicts(lower, higher)
+        if isinstance(lower, (list, tuple)) and isinstance(higher, (list, tuple)):
+            return self.merge_lists(lower, higher)
+        return higher
+
+    def merge_dicts(self, lower, higher):
+        result = dict(lower)
+        for key, value in higher.iteritems():
+            if key in result:
+                result[key] = self.merge(result[key], value)
+            else:
+                result[key] = value
+        return result
+
+    def merge_layers(self, layers):
+        """Merges layers, which are ordered from highest to lowest priority.
+
+        Returns None if there are no layers.
+        """
+        result = None
+        for i, layer in enumerate(reversed(layers)):
+            if i:
+                result = self.merge(result, layer)
+            else:
+                result = layer
+        return result
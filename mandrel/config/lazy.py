@@ -0,0 +1,267 @@
+"""Memory-mapped, lazily decoded configuration documents.
+
+Materializing a huge configuration document costs every process the time
+to decode all of it and the memory to hold all of it, even if it only
+ever reads a few keys.  This module instead compiles a document into an
+indexed sidecar file next to its source:
+
+    /etc/whizzies/catalog.yaml
+    /etc/whizzies/catalog.yaml.mlazy
+
+In that file, each sufficiently large mapping is stored as a marshaled
+index of key -> (offset, length, kind) entries, with each value encoded
+separately.  The file is memory-mapped read-only, and a LazyMapping
+decodes a value only when its key is first looked up.  Untouched parts of
+the document are never decoded, and the mapped pages live in the
+operating system's page cache, shared by every process (including forked
+workers) that maps the same file.
+
+Like snapshots (see the snapshot module), the sidecar records the
+util.stat_signature of its source and is rebuilt, atomically, when the
+source changes.  Documents that marshal cannot represent fall back to
+regular, eager loading.
+
+To use it, extend LazyConfiguration instead of Configuration:
+
+    class Catalog(lazy.LazyConfiguration):
+        NAME = 'catalog'
+"""
+import collections
+import copy
+import marshal
+import mmap
+import os
+import struct
+import sys
+from mandrel import util
+from mandrel.config import core
+
+LAZY_EXTENSION = 'mlazy'
+
+# Mappings whose encoding is smaller than this many bytes are decoded in
+# one piece rather than indexed key by key.
+INDEX_THRESHOLD = 512
+
+_MAGIC = 'mndrlazy'
+_FORMAT_VERSION = 1
+_PREFIX = struct.Struct('<8sI')
+
+_VALUE = 0
+_INDEX = 1
+
+def lazy_path(path):
+    """Returns the path of the lazy document sidecar for the configuration file at path."""
+    return '%s.%s' % (path, LAZY_EXTENSION)
+
+def _plain(value):
+    # marshal rejects dict subclasses, such as the util.FrozenDicts handed
+    # out by read-only caches and the Canonicalizer; they are encoded as the
+    # plain dicts they are equal to.
+    if isinstance(value, dict):
+        return dict((k, _plain(v)) for k, v in value.iteritems())
+    if type(value) in (list, tuple):
+        return type(value)(_plain(v) for v in value)
+    return value
+
+def _encode(value, chunks, position):
+    data = marshal.dumps(value)
+    kind = _VALUE
+    if isinstance(value, dict) and len(data) >= INDEX_THRESHOLD:
+        index = {}
+        for key, item in value.iteritems():
+            index[key] = _encode(item, chunks, position)
+        data = marshal.dumps(index)
+        kind = _INDEX
+    offset = position[0]
+    chunks.append(data)
+    position[0] += len(data)
+    return (offset, len(data), kind)
+
+def dumps(value, signature=None):
+    """Returns the indexed encoding of value, recording source signature.
+
+    Dictionaries of any dict type (util.FrozenDict in particular) are
+    encoded as plain dicts.  Raises a ValueError if value contains other
+    types marshal cannot represent.
+    """
+    chunks = []
+    root = _encode(_plain(value), chunks, [0])
+    header = marshal.dumps((_FORMAT_VERSION, tuple(sys.version_info[:2]), signature, root))
+    return _PREFIX.pack(_MAGIC, len(header)) + header + ''.join(chunks)
+
+class LazyMapping(collections.MutableMapping):
+    """Read-through mapping over an indexed region of a memory-mapped document.
+
+    Values are decoded on first access and memoized; nested indexed
+    mappings are themselves LazyMappings.  Assignments and deletions are
+    kept in the instance, leaving the underlying document untouched, so a
+    LazyMapping can serve as a Configuration's configuration dictionary.
+
+    Copying a LazyMapping (copy.copy or copy.deepcopy) yields plain dicts.
+    """
+
+    def __init__(self, buffer, base, offset, length):
+        self._buffer = buffer
+        self._base = base
+        self._index = marshal.loads(buffer[base + offset:base + offset + length])
+        self._values = {}
+        self._deleted = set()
+
+    def _decode(self, entry):
+        offset, length, kind = entry
+        if kind == _INDEX:
+            return LazyMapping(self._buffer, self._base, offset, length)
+        start = self._base + offset
+        return marshal.loads(self._buffer[start:start + length])
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        if key in self._deleted:
+            raise KeyError(key)
+        value = self._values[key] = self._decode(self._index[key])
+        return value
+
+    def __setitem__(self, key, value):
+        self._values[key] = value
+        self._deleted.discard(key)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._values.pop(key, None)
+        if key in self._index:
+            self._deleted.add(key)
+
+    def __contains__(self, key):
+        return key in self._values or (key in self._index and key not in self._deleted)
+
+    def __iter__(self):
+        for key in self._index:
+            if key not in self._deleted:
+                yield key
+        for key in self._values:
+            if key not in self._index:
+                yield key
+
+    def __len__(self):
+        return len(self._index) - len(self._deleted) + sum(1 for key in self._values if key not in self._index)
+
+    def decoded_keys(self):
+        """Returns the keys whose values have been decoded (or assigned) so far."""
+        return set(self._values)
+
+    def materialize(self):
+        """Returns a plain dict copy of the full mapping, decoding everything."""
+        return dict((key, _materialize(value)) for key, value in self.iteritems())
+
+    def __copy__(self):
+        return dict(self.iteritems())
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(self.materialize(), memo)
+
+    def __repr__(self):
+        return '<%s of %d keys>' % (type(self).__name__, len(self))
+
+def _materialize(value):
+    if isinstance(value, LazyMapping):
+        return value.materialize()
+    return value
+
+def map_document(path):
+    """Memory-maps the lazy document at path.
+
+    Returns a (buffer, base, signature, root) tuple, where signature is the
+    source signature recorded by dumps and base and root locate the
+    document's value within buffer (see view), or None if the file is not
+    a lazy document this interpreter can read.  Raises an IOError, OSError,
+    or mmap.error if it cannot be mapped.
+    """
+    with open(path, 'rb') as f:
+        # An empty file cannot be mapped, and one shorter than the prefix
+        # (as left by an interrupted write) is no document either.
+        if os.fstat(f.fileno()).st_size < _PREFIX.size:
+            return None
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        magic, header_length = _PREFIX.unpack(buffer[:_PREFIX.size])
+        if magic != _MAGIC:
+            raise ValueError, 'Not a lazy document: %s' % path
+        base = _PREFIX.size + header_length
+        version, python, recorded, root = marshal.loads(buffer[_PREFIX.size:base])
+        if (version, python) != (_FORMAT_VERSION, tuple(sys.version_info[:2])):
+            buffer.close()
+            return None
+        return (buffer, base, recorded, root)
+    except (struct.error, EOFError, ValueError, TypeError):
+        buffer.close()
+        return None
+
+def view(buffer, base, root):
+    """Returns the document mapped by map_document: a fresh LazyMapping if it is indexed."""
+    if root[2] == _INDEX:
+        return LazyMapping(buffer, base, root[0], root[1])
+    return marshal.loads(buffer[base + root[0]:base + root[0] + root[1]])
+
+def _open(path, signature):
+    document = map_document(path)
+    if document is None:
+        return None
+    buffer, base, recorded, root = document
+    try:
+        if recorded == signature:
+            return view(buffer, base, root)
+    except (EOFError, ValueError, TypeError):
+        pass
+    buffer.close()
+    return None
+
+def load(path, loader):
+    """Returns the configuration at path as a lazily decoded, memory-mapped view.
+
+    Uses the sidecar at lazy_path(path) if it was built from the current
+    version of path; otherwise builds it from loader(path) first.  Returns
+    loader's eager result if the sidecar cannot be built or mapped.
+    """
+    signature = util.stat_signature(path)
+    target = lazy_path(path)
+    try:
+        document = _open(target, signature)
+        if document is not None:
+            return document
+    except (IOError, OSError, mmap.error):
+        pass
+
+    value = loader(path)
+    try:
+        util.write_atomically(target, dumps(value, signature))
+        document = _open(target, signature)
+    except (IOError, OSError, ValueError, mmap.error):
+        document = None
+    if document is None:
+        return value
+    return document
+
+def load_configuration_file(path):
+    """Lazy counterpart to core.load_configuration_file."""
+    return load(path, core.load_configuration_file)
+
+def get_configuration(name):
+    """Lazy counterpart to core.get_configuration."""
+    return load_configuration_file(core.find_configuration_file(name))
+
+class LazyConfiguration(core.Configuration):
+    """Configuration whose dictionary is a memory-mapped, lazily decoded document.
+
+    Behaves like Configuration, except that load_configuration() returns a
+    LazyMapping (when the document can be indexed), so attribute lookups
+    only decode the parts of the document they touch.
+    """
+
+    @classmethod
+    def load_configuration(cls):
+        """Returns the best configuration available for the class, as a lazy view."""
+        return get_configuration(cls.NAME)
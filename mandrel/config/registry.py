@@ -0,0 +1,182 @@
+"""Ordered registry of configuration loaders with precomputed lookups.
+
+core.LOADERS is a LoaderRegistry: a list of (extension, loader) pairs in
+priority order, which additionally maintains
+* a dictionary from extension to loader, so that finding the loader for a
+  path costs a few dictionary lookups rather than a scan of every loader,
+* the candidate basenames computed for each configuration name.
+
+Both are discarded whenever the registry is modified.  It supports the
+list operations core and its users apply to LOADERS, and compares equal
+to a list of the same pairs.
+"""
+import threading
+
+# Cached basename expansions are discarded once there are this many names.
+MAX_CACHED_NAMES = 1024
+
+class LoaderRegistry(object):
+    """A list of (extension, loader) pairs, in priority order."""
+
+    def __init__(self, loaders=()):
+        self._loaders = [tuple(pair) for pair in loaders]
+        self._lock = threading.Lock()
+        self._invalidate()
+
+    def _invalidate(self):
+        self._table = None
+        self._basenames = {}
+
+    def _get_table(self):
+        table = self._table
+        if table is None:
+            # Built under the lock, so that a concurrent modification can't
+            # discard the table before a stale one is stored.
+            with self._lock:
+                table = self._table
+                if table is None:
+                    extensions = {}
+                    for i, (extension, loader) in enumerate(self._loaders):
+                        if extension not in extensions:
+                            extensions[extension] = (i, loader)
+                    depth = max([extension.count('.') + 1 for extension in extensions] or [0])
+                    table = self._table = (extensions, depth)
+        return table
+
+    def register(self, extension, loader, priority=None):
+        """Adds a loader for files with extension (without its leading '.').
+
+        The loader is given the lowest priority unless priority, an index
+        into the registry, is given.
+        """
+        with self._lock:
+            if priority is None:
+                self._loaders.append((extension, loader))
+            else:
+                self._loaders.insert(priority, (extension, loader))
+            self._invalidate()
+
+    def unregister(self, extension):
+        """Removes all loaders for extension."""
+        with self._lock:
+            self._loaders = [pair for pair in self._loaders if pair[0] != extension]
+            self._invalidate()
+
+    def _match(self, path):
+        # The highest-priority (extension, loader) such that path ends with
+        # '.' + extension, found by looking up each dotted suffix of path.
+        extensions, depth = self._get_table()
+        best = None
+        start = len(path)
+        for i in xrange(depth):
+            start = path.rfind('.', 0, start)
+            if start < 0:
+                break
+            entry = extensions.get(path[start + 1:])
+            if entry is not None and (best is None or entry[0] < best[0]):
+                best = entry
+        return best
+
+    def get_loader(self, path):
+        """Returns the highest-priority loader whose extension path ends with, or None."""
+        entry = self._match(path)
+        if entry is None:
+            return None
+        return entry[1]
+
+    def get_possible_basenames(self, name):
+        """Returns the candidate basenames for name, as core.get_possible_basenames."""
+        basenames = self._basenames
+        try:
+            return list(basenames[name])
+        except KeyError:
+            pass
+        if self._match(name) is not None:
+            result = (name,)
+        else:
+            result = tuple('%s.%s' % (name, extension) for extension, loader in self._loaders)
+        if len(basenames) >= MAX_CACHED_NAMES:
+            basenames.clear()
+        basenames[name] = result
+        return list(result)
+
+    def __iter__(self):
+        return iter(list(self._loaders))
+
+    def __len__(self):
+        return len(self._loaders)
+
+    def __getitem__(self, i):
+        return self._loaders[i]
+
+    def __contains__(self, pair):
+        return pair in self._loaders
+
+    def __setitem__(self, i, value):
+        with self._lock:
+            if isinstance(i, slice):
+                self._loaders[i] = [tuple(pair) for pair in value]
+            else:
+                self._loaders[i] = tuple(value)
+            self._invalidate()
+
+    def __setslice__(self, i, j, value):
+        self.__setitem__(slice(i, j), value)
+
+    def __delitem__(self, i):
+        with self._lock:
+            del self._loaders[i]
+            self._invalidate()
+
+    def __delslice__(self, i, j):
+        self.__delitem__(slice(i, j))
+
+    def append(self, pair):
+        self.insert(len(self._loaders), pair)
+
+    def insert(self, i, pair):
+        with self._lock:
+            self._loaders.insert(i, tuple(pair))
+            self._invalidate()
+
+    def extend(self, pairs):
+        with self._lock:
+            self._loaders.extend(tuple(pair) for pair in pairs)
+            self._invalidate()
+
+    def pop(self, i=-1):
+        with self._lock:
+            pair = self._loaders.pop(i)
+            self._invalidate()
+            return pair
+
+    def remove(self, pair):
+        with self._lock:
+            self._loaders.remove(tuple(pair))
+            self._invalidate()
+
+    def reverse(self):
+        with self._lock:
+            self._loaders.reverse()
+            self._invalidate()
+
+    def index(self, pair, *bounds):
+        return self._loaders.index(tuple(pair), *bounds)
+
+    def __eq__(self, other):
+        if isinstance(other, LoaderRegistry):
+            other = other._loaders
+        elif not isinstance(other, (list, tuple)):
+            return NotImplemented
+        return self._loaders == [tuple(pair) for pair in other]
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self._loaders)
@@ -0,0 +1,171 @@
+"""Configuration shared by a master process with its forked workers.
+
+In a pre-fork server, every worker loading its own configuration parses
+the same files once per worker.  A SharedConfigurationStore lets the
+master parse them once instead:
+
+    store = shared.SharedConfigurationStore()
+    store.publish_configuration('storage')
+    core.SHARED_STORE = store
+    ... fork workers ...
+
+    # in the master, on reload:
+    store.reload()
+
+Each published configuration is encoded as a lazy document (see the lazy
+module) in a file of a private directory, under /dev/shm where available.
+Processes map that file read-only, so its pages are shared by all of
+them, and decode only the keys they look up.  With core.SHARED_STORE set,
+core.get_configuration (and so Configuration.load_configuration) and
+core.get_configurations return such a view for every published name,
+without searching for or parsing any file.
+
+Publishing replaces a document's file atomically, and increments a
+generation counter kept in memory shared with the forked workers.  On
+their next lookup, workers notice the new generation and map the new
+files; views obtained earlier keep reading the documents they were
+created from.
+
+The store must be created before forking, since the generation counter is
+inherited rather than shared by other means.
+
+The store's directory is removed by close(), or else when the process that
+created the store exits (unless it is killed by a signal).
+"""
+import atexit
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import urllib
+from mandrel import util
+from mandrel.config import core
+from mandrel.config import lazy
+
+# Preferred parent directory of store directories, being memory-backed.
+SHARED_MEMORY_DIRECTORY = '/dev/shm'
+
+_GENERATION = struct.Struct('<Q')
+
+def _remove_directory(path, owner):
+    if os.getpid() == owner:
+        shutil.rmtree(path, ignore_errors=True)
+
+def _default_directory():
+    if os.path.isdir(SHARED_MEMORY_DIRECTORY) and os.access(SHARED_MEMORY_DIRECTORY, os.W_OK):
+        return SHARED_MEMORY_DIRECTORY
+    return None
+
+class SharedConfigurationStore(object):
+    """Configurations published by one process for itself and its forked children.
+
+    Parameters:
+        directory: where to create the store's private directory; defaults
+            to SHARED_MEMORY_DIRECTORY if writable, or else the system's
+            temporary directory.
+    """
+
+    def __init__(self, directory=None):
+        if directory is None:
+            directory = _default_directory()
+        self.path = tempfile.mkdtemp(prefix='mandrel-shared-', dir=directory)
+        self._owner = os.getpid()
+        atexit.register(_remove_directory, self.path, self._owner)
+        self._counter = mmap.mmap(-1, _GENERATION.size)
+        self._lock = threading.Lock()
+        self._loaded = set()
+        self._mapped_generation = None
+        self._documents = {}
+
+    @property
+    def generation(self):
+        """The number of times the published configurations have changed."""
+        return _GENERATION.unpack(self._counter[:_GENERATION.size])[0]
+
+    def _bump(self):
+        self._counter[:_GENERATION.size] = _GENERATION.pack(self.generation + 1)
+
+    def document_path(self, name):
+        """Returns the path of the file holding the published configuration for name."""
+        return os.path.join(self.path, '%s.%s' % (urllib.quote(name, safe=''), lazy.LAZY_EXTENSION))
+
+    def publish(self, name, configuration):
+        """Publishes configuration (a dictionary) for name, replacing any previous one.
+
+        Frozen structures (see util.freeze) are published as their plain
+        equivalents.  Raises a ValueError if configuration contains other
+        types that marshal cannot represent.
+        """
+        data = lazy.dumps(configuration)
+        with self._lock:
+            util.write_atomically(self.document_path(name), data)
+            self._bump()
+
+    def publish_configuration(self, name):
+        """Loads the best configuration file for name and publishes it.
+
+        The file is found and loaded as by core.get_configuration (but never
+        taken from SHARED_STORE), and reloaded by reload().  Returns the
+        configuration loaded.
+        """
+        configuration = core.load_configuration_file(core.find_configuration_file(name))
+        self.publish(name, configuration)
+        self._loaded.add(name)
+        return configuration
+
+    def unpublish(self, name):
+        """Withdraws the published configuration for name, if any."""
+        with self._lock:
+            try:
+                os.remove(self.document_path(name))
+            except OSError:
+                pass
+            self._loaded.discard(name)
+            self._bump()
+
+    def reload(self):
+        """Republishes every configuration this process published via publish_configuration.
+
+        Returns the names republished.
+        """
+        names = sorted(self._loaded)
+        for name in names:
+            self.publish_configuration(name)
+        return names
+
+    def get(self, name):
+        """Returns a view of the published configuration for name, or None if there is none.
+
+        The view is a fresh lazy.LazyMapping (if the configuration is large
+        enough to be indexed), so changes made to it stay private to the
+        caller.
+        """
+        generation = self.generation
+        with self._lock:
+            if generation != self._mapped_generation:
+                self._documents = {}
+                self._mapped_generation = generation
+            try:
+                document = self._documents[name]
+            except KeyError:
+                try:
+                    document = lazy.map_document(self.document_path(name))
+                except (IOError, OSError, mmap.error):
+                    document = None
+                self._documents[name] = document
+        if document is None:
+            return None
+        buffer, base, signature, root = document
+        return lazy.view(buffer, base, root)
+
+    def close(self):
+        """Removes the store's files, if called by the process that created the store.
+
+        Views already obtained remain readable.
+        """
+        if os.getpid() == self._owner:
+            _remove_directory(self.path, self._owner)
+            self._loaded.clear()
+            self._bump()
@@ -0,0 +1,96 @@
+"""Compiled binary snapshots of configuration files.
+
+Parsing a large YAML document is slow even with libyaml.  A snapshot
+stores the parsed structure in python's marshal format, which loads many
+times faster, in a sidecar file next to its source:
+
+    /etc/whizzies/storage.yaml
+    /etc/whizzies/storage.yaml.mcache
+
+Each snapshot records the util.stat_signature of the source it was
+compiled from, and is only served while the source still has that
+signature.  Otherwise the source is re-parsed and the snapshot rewritten.
+
+Snapshots are written atomically, so concurrent processes regenerating
+the same snapshot never observe a partial file.  Structures that marshal
+cannot represent (such as dates parsed from YAML) are never snapshotted,
+and unwritable directories simply go without snapshots.  In both cases
+the source is parsed as usual.
+
+Because marshal's format is specific to the python version, so are
+snapshots; a snapshot written by another python version is regenerated.
+"""
+import marshal
+import sys
+from mandrel import exception
+from mandrel import util
+
+SNAPSHOT_EXTENSION = 'mcache'
+
+_MAGIC = 'mandrel-snapshot'
+_FORMAT_VERSION = 1
+
+def snapshot_path(path):
+    """Returns the path of the snapshot sidecar for the configuration file at path."""
+    return '%s.%s' % (path, SNAPSHOT_EXTENSION)
+
+def _header(signature):
+    return (_MAGIC, _FORMAT_VERSION, tuple(sys.version_info[:2]), signature)
+
+def dumps(value, signature=None):
+    """Returns the snapshot encoding of value, recording source signature.
+
+    Raises a ValueError if value contains types marshal cannot represent.
+    """
+    return marshal.dumps(_header(signature)) + marshal.dumps(value)
+
+def _read(path):
+    with open(path, 'rb') as f:
+        header = marshal.load(f)
+        if not isinstance(header, tuple) or header[:3] != _header(None)[:3]:
+            raise ValueError, 'Not a compatible snapshot: %s' % path
+        return header[3], marshal.load(f)
+
+def read_snapshot_path(path):
+    """Configuration loader for snapshot files, regardless of source freshness.
+
+    Raises an UnknownConfigurationException if path is not a snapshot
+    compatible with the running python.
+    """
+    try:
+        return _read(path)[1]
+    except (EOFError, ValueError, TypeError):
+        raise exception.UnknownConfigurationException, "Invalid configuration snapshot '%s'" % path
+
+def write_snapshot(path, value, signature):
+    """Atomically writes the snapshot of value for source path; returns True on success."""
+    try:
+        data = dumps(value, signature)
+    except ValueError:
+        return False
+
+    try:
+        util.write_atomically(snapshot_path(path), data)
+    except (IOError, OSError):
+        return False
+    return True
+
+def load(path, loader):
+    """Returns the configuration at path, served from its snapshot when fresh.
+
+    If the snapshot sidecar exists and was compiled from the current
+    version of path, its contents are returned without calling loader.
+    Otherwise, returns loader(path), writing a new snapshot of the result
+    on a best-effort basis.
+    """
+    signature = util.stat_signature(path)
+    try:
+        snapshot_signature, value = _read(snapshot_path(path))
+        if snapshot_signature == signature:
+            return value
+    except (IOError, OSError, EOFError, ValueError, TypeError):
+        pass
+
+    value = loader(path)
+    write_snapshot(path, value, signature)
+    return value
@@ -0,0 +1,207 @@
+"""Incrementally maintained merges of configuration layers.
+
+A LayerStack holds the merge of every configuration file for a name, as
+core.get_merged_configuration computes it, and keeps it up to date:
+
+    stack = LayerStack('storage', list_strategy='append')
+    stack.subscribe(lambda stack, changes: log.info('%d keys changed', len(changes)))
+    ...
+    stack.refresh()
+
+The parsed tree of each layer is retained.  On refresh, only layers whose
+util.stat_signature changed are loaded again, and (with the default 'merge'
+dict strategy) only the parts of the merged tree beneath the keys those
+layers changed are merged again; everything else is shared with the
+previous merged tree.  When files are added, removed, or reordered, or
+with other dict strategies, the layers are merged in full (still without
+reloading the unchanged ones).
+
+Each refresh produces the list of changes to the merged tree, as
+(path, old, new) tuples: path is the tuple of keys leading to the value,
+and old or new is MISSING where the key did not or no longer exists.
+Changes are reported for the deepest keys at which the trees differ.
+
+The merged tree is never modified in place; each change produces a new
+tree, so a configuration obtained from a stack is a consistent snapshot.
+It must not be modified by its users.
+"""
+import threading
+from mandrel import util
+from mandrel.config import core
+from mandrel.config import layered
+
+# Stands for the absence of a value in changes.
+MISSING = object()
+
+def diff(old, new, path=()):
+    """Yields a (path, old, new) tuple for each difference between old and new.
+
+    Dictionaries on both sides are compared key by key; anything else is
+    compared as a whole.  Identical objects are assumed equal without
+    further inspection, so comparing trees that share most of their
+    structure is cheap.
+    """
+    if old is new:
+        return
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key, value in old.iteritems():
+            if key not in new:
+                yield (path + (key,), value, MISSING)
+                continue
+            other = new[key]
+            # Leaves and equal subtrees are compared without recursing,
+            # which is far cheaper for the bulk of a large tree.
+            if value is other or value == other:
+                continue
+            if isinstance(value, dict) and isinstance(other, dict):
+                for change in diff(value, other, path + (key,)):
+                    yield change
+            else:
+                yield (path + (key,), value, other)
+        for key, value in new.iteritems():
+            if key not in old:
+                yield (path + (key,), MISSING, value)
+    elif old is MISSING or new is MISSING or old != new:
+        yield (path, old, new)
+
+def _value_at(tree, path):
+    # Returns (the value of tree at path or MISSING, the depth at which a
+    # non-dictionary blocked the descent or None).
+    for depth, key in enumerate(path):
+        if not isinstance(tree, dict):
+            return (MISSING, depth)
+        tree = tree.get(key, MISSING)
+        if tree is MISSING:
+            return (MISSING, None)
+    return (tree, None)
+
+class LayerStack(object):
+    """The merge of all configuration files for name, updated by refresh().
+
+    Parameters:
+        name: the configuration name, as for core.find_configuration_files.
+        list_strategy, dict_strategy: as for core.get_merged_configuration.
+
+    The files are loaded and merged on construction.  The configuration
+    attribute holds the merged tree, or None if no file was found.
+    """
+
+    def __init__(self, name, list_strategy='replace', dict_strategy='merge'):
+        self.name = name
+        self.merger = layered.Merger(list_strategy, dict_strategy)
+        self.incremental = dict_strategy == 'merge'
+        self.configuration = None
+        self._layers = []
+        self._subscribers = []
+        self._lock = threading.RLock()
+        self.refresh()
+
+    @property
+    def paths(self):
+        """The files currently merged, from highest to lowest priority."""
+        return [path for path, signature, tree in self._layers]
+
+    def subscribe(self, callback):
+        """Arranges for callback(stack, changes) whenever refresh changes the merged tree."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers = [c for c in self._subscribers if c is not callback]
+
+    def refresh(self):
+        """Reloads changed layers and updates the merged tree.
+
+        Returns the list of (path, old, new) changes, which subscribers
+        receive as well if it is not empty.  If loading a layer fails, the
+        exception propagates and the stack is left as it was.
+        """
+        with self._lock:
+            previous = dict((path, (signature, tree)) for path, signature, tree in self._layers)
+            layers = []
+            changed = []
+            for path in core.find_configuration_files(self.name):
+                signature = util.stat_signature(path)
+                entry = previous.get(path)
+                if entry is not None and entry[0] == signature:
+                    layers.append((path, signature, entry[1]))
+                else:
+                    tree = core.load_configuration_file(path)
+                    layers.append((path, signature, tree))
+                    if entry is not None:
+                        changed.append((entry[1], tree))
+
+            old = self.configuration
+            if not self._layers:
+                old = MISSING
+            if [layer[0] for layer in layers] != self.paths:
+                new = self._merge_all(layers)
+            elif not changed:
+                return []
+            else:
+                new = self._merge_changes(layers, changed)
+            self._layers = layers
+            self.configuration = new
+            if not layers:
+                new = MISSING
+            changes = list(diff(old, new))
+            subscribers = list(self._subscribers)
+
+        if changes:
+            for callback in subscribers:
+                self._notify(callback, changes)
+        return changes
+
+    def _merge_all(self, layers):
+        return self.merger.merge_layers([tree for path, signature, tree in layers])
+
+    def _merge_changes(self, layers, changed):
+        trees = [tree for path, signature, tree in layers]
+        if not self.incremental or not isinstance(self.configuration, dict) or \
+                [tree for tree in trees if not isinstance(tree, dict)]:
+            return self._merge_all(layers)
+
+        # Find where the changed layers differ, moving up past any key
+        # at which some layer holds a non-dictionary, since the merge
+        # above such a key is not a plain dictionary merge.
+        points = set()
+        for old_tree, new_tree in changed:
+            for path, old_value, new_value in diff(old_tree, new_tree):
+                depth = len(path)
+                for tree in trees:
+                    blocked = _value_at(tree, path[:depth])[1]
+                    if blocked is not None:
+                        depth = blocked
+                if not depth:
+                    return self._merge_all(layers)
+                points.add(path[:depth])
+
+        merged = dict(self.configuration)
+        owned = set([id(merged)])
+        done = set()
+        for point in sorted(points, key=len):
+            if [1 for i in xrange(1, len(point)) if point[:i] in done]:
+                continue
+            done.add(point)
+            values = [value for value, blocked in (_value_at(tree, point) for tree in trees) if value is not MISSING]
+            parent = merged
+            for key in point[:-1]:
+                child = parent[key]
+                if id(child) not in owned:
+                    child = dict(child)
+                    owned.add(id(child))
+                    parent[key] = child
+                parent = child
+            if values:
+                parent[point[-1]] = self.merger.merge_layers(values)
+            else:
+                parent.pop(point[-1], None)
+        return merged
+
+    def _notify(self, callback, changes):
+        try:
+            callback(self, changes)
+        except Exception:
+            core._get_bootstrapper().get_logger(__name__).exception(
+                    'Layer stack subscriber failed for %s', self.name)
@@ -0,0 +1,273 @@
+"""Hot reloading of configuration files.
+
+A ConfigurationWatcher keeps registered Configuration instances up to date
+with the files they were loaded from, so that long-running processes pick
+up configuration changes without restarting and without going to the file
+system on every access.
+
+    watcher = ConfigurationWatcher()
+    storage = StorageConfig.get_configuration()
+    watcher.register(storage)
+    watcher.subscribe(lambda name, path: log.info('%s reloaded from %s', name, path))
+    watcher.start()
+
+For every watched name, the watcher tracks which file wins the search
+across mandrel.bootstrap.SEARCH_PATHS, along with that file's
+util.stat_signature.  Whenever either changes -- the file is modified,
+removed, or a file appears in a higher-priority search path -- each
+registered instance gets a freshly loaded configuration dictionary, and
+subscribers are notified.
+
+On Linux, the background thread sleeps on inotify events for the search
+path directories; elsewhere, it polls every `interval` seconds.  Either
+way, check() can also be called directly to process changes synchronously.
+"""
+import copy
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import sys
+import threading
+import weakref
+from mandrel import exception
+from mandrel import util
+from mandrel.config import core
+
+class _Inotify(object):
+    """Minimal ctypes binding of Linux inotify, watching directories for any change."""
+
+    IN_NONBLOCK = os.O_NONBLOCK
+    IN_CLOEXEC = 02000000
+    MASK = (0x002 | 0x004 | 0x008 | 0x040 | 0x080 | 0x100 | 0x200 | 0x400 | 0x800)
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._watches = {}
+
+    @classmethod
+    def available(cls):
+        if not sys.platform.startswith('linux'):
+            return False
+        try:
+            cls().close()
+        except (OSError, AttributeError):
+            return False
+        return True
+
+    def sync(self, paths):
+        """Watches each existing directory in paths and stops watching others.
+
+        Returns True if a watch was added, meaning the directory may have
+        changed unobserved.
+        """
+        added = False
+        paths = set(paths)
+        for path in list(self._watches):
+            if path not in paths:
+                self._libc.inotify_rm_watch(self._fd, self._watches.pop(path))
+        for path in paths:
+            if path not in self._watches:
+                wd = self._libc.inotify_add_watch(self._fd, path, self.MASK)
+                if wd >= 0:
+                    self._watches[path] = wd
+                    added = True
+        return added
+
+    def wait(self, timeout):
+        """Waits up to timeout seconds for events; returns True if any arrived."""
+        try:
+            readable = select.select([self._fd], [], [], timeout)[0]
+        except select.error, e:
+            if e.args[0] == errno.EINTR:
+                return False
+            raise
+        if not readable:
+            return False
+        while True:
+            try:
+                if not os.read(self._fd, 65536):
+                    break
+            except OSError, e:
+                if e.errno in (errno.EAGAIN, errno.EINTR):
+                    break
+                raise
+        # Events for a removed directory's watch invalidate it.
+        for path, wd in self._watches.items():
+            if not os.path.isdir(path):
+                del self._watches[path]
+        return True
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+        self._watches.clear()
+
+class ConfigurationWatcher(object):
+    """Watches configuration files and reloads registered Configuration instances on change.
+
+    Parameters:
+        interval: the polling period, in seconds.  With inotify, this is
+            only how often newly created search path directories are
+            picked up.
+        use_inotify: True or False to force or disable inotify; by default,
+            it is used where available.
+    """
+
+    def __init__(self, interval=1.0, use_inotify=None):
+        self.interval = interval
+        if use_inotify is None:
+            use_inotify = _Inotify.available()
+        self.use_inotify = use_inotify
+        self._lock = threading.RLock()
+        self._instances = {}
+        self._subscribers = []
+        self._states = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _resolve(self, name):
+        for path in core.find_configuration_files(name):
+            try:
+                return (path, util.stat_signature(path))
+            except OSError:
+                return (path, None)
+        return None
+
+    def watch(self, name):
+        """Starts tracking the configuration file for name, if not already tracked."""
+        with self._lock:
+            if name not in self._states:
+                self._states[name] = self._resolve(name)
+
+    def register(self, configuration):
+        """Keeps configuration (a Configuration instance) up to date with its class' NAME.
+
+        Only a weak reference to configuration is held.
+        """
+        name = type(configuration).NAME
+        with self._lock:
+            self.watch(name)
+            refs = self._instances.setdefault(name, [])
+            refs[:] = [ref for ref in refs if ref() is not None and ref() is not configuration]
+            refs.append(weakref.ref(configuration))
+
+    def unregister(self, configuration):
+        """Stops updating configuration."""
+        with self._lock:
+            refs = self._instances.get(type(configuration).NAME, [])
+            refs[:] = [ref for ref in refs if ref() is not None and ref() is not configuration]
+
+    def subscribe(self, callback, name=None):
+        """Arranges for callback(name, path) whenever a watched configuration changes.
+
+        path is the configuration's new file, or None if no file is found
+        any longer.  If name is given, callback only hears about that name
+        (which is then watched); otherwise, it hears about every name.
+        """
+        with self._lock:
+            if name is not None:
+                self.watch(name)
+            self._subscribers.append((name, callback))
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers = [(n, c) for n, c in self._subscribers if c is not callback]
+
+    def check(self):
+        """Reloads and notifies for every watched name whose configuration file changed.
+
+        Returns the list of names that changed.
+        """
+        changed = []
+        with self._lock:
+            for name, state in self._states.items():
+                current = self._resolve(name)
+                if current != state:
+                    self._states[name] = current
+                    changed.append(name)
+            for name in changed:
+                self._reload(name)
+            subscribers = list(self._subscribers)
+
+        for name in changed:
+            path = self._states.get(name) and self._states[name][0]
+            for wanted, callback in subscribers:
+                if wanted is None or wanted == name:
+                    self._notify(callback, name, path)
+        return changed
+
+    def _reload(self, name):
+        loaded = {}
+        for ref in self._instances.get(name, []):
+            instance = ref()
+            if instance is None:
+                continue
+            cls = type(instance)
+            try:
+                if cls in loaded:
+                    configuration = copy.deepcopy(loaded[cls])
+                else:
+                    configuration = loaded[cls] = cls.load_configuration()
+            except exception.UnknownConfigurationException:
+                continue
+            except Exception:
+                core._get_bootstrapper().get_logger(__name__).exception(
+                        'Failed to reload configuration %s', name)
+                continue
+            instance.instance_set('configuration', configuration)
+
+    def _notify(self, callback, name, path):
+        try:
+            callback(name, path)
+        except Exception:
+            core._get_bootstrapper().get_logger(__name__).exception(
+                    'Configuration change subscriber failed for %s', name)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Starts watching in a background (daemon) thread."""
+        with self._lock:
+            if self.running:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='mandrel-watcher')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stops the background thread, waiting up to timeout seconds for it to exit."""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        inotify = None
+        if self.use_inotify:
+            inotify = _Inotify()
+        try:
+            while not self._stop.is_set():
+                if inotify is None:
+                    self._stop.wait(self.interval)
+                    changed = True
+                else:
+                    changed = inotify.sync(core._get_bootstrapper().SEARCH_PATHS)
+                    changed = inotify.wait(self.interval) or changed
+                if changed and not self._stop.is_set():
+                    try:
+                        self.check()
+                    except Exception:
+                        core._get_bootstrapper().get_logger(__name__).exception('Configuration check failed')
+        finally:
+            if inotify is not None:
+                inotify.close()
@@ -6,3 +6,6 @@ class MissingBootstrapException(MandrelException):
 
 class UnknownConfigurationException(MandrelException):
     pass
+
+class TimeoutException(MandrelException):
+    pass
@@ -0,0 +1,19 @@
+"""Micro-benchmarks for mandrel.
+
+These are not unit tests and are not collected by the test suite.  Run a
+benchmark module directly to print its measurements, e.g.:
+
+    python -m mandrel.test.benchmark.yaml_loader_benchmark
+"""
+import timeit
+
+def measure(func, number=1, repeat=3):
+    """Returns the best per-call time of func, in seconds, over repeat runs of number calls."""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+def report(label, seconds, baseline=None):
+    """Prints a labeled timing line, with speedup relative to baseline seconds if given."""
+    line = '%-48s %12.3f ms' % (label, seconds * 1000)
+    if baseline is not None and seconds:
+        line += '  (%.1fx)' % (baseline / seconds)
+    print line
@@ -0,0 +1,36 @@
+"""Measures Configuration attribute lookups across hot_copy chains of varying depth."""
+from mandrel.config import core
+from mandrel.test import benchmark
+
+class CachingConfiguration(core.Configuration):
+    CACHE_LOOKUPS = True
+
+LOOKUPS = 10000
+
+def chain(cls, depth):
+    c = cls(dict(('key%d' % i, i) for i in xrange(20)))
+    for i in xrange(depth - 1):
+        c = c.hot_copy()
+    return c
+
+def lookups(c):
+    for i in xrange(LOOKUPS):
+        c.key7
+
+def misses(c):
+    for i in xrange(LOOKUPS):
+        getattr(c, 'missing', None)
+
+def main():
+    print 'Time per %d lookups' % LOOKUPS
+    for depth in (1, 2, 5, 10, 20, 50):
+        for label, func in (('hit', lookups), ('miss', misses)):
+            plain = chain(core.Configuration, depth)
+            cached = chain(CachingConfiguration, depth)
+            baseline = benchmark.measure(lambda: func(plain))
+            benchmark.report('depth %2d %-4s uncached' % (depth, label), baseline)
+            benchmark.report('depth %2d %-4s cached' % (depth, label),
+                             benchmark.measure(lambda: func(cached)), baseline)
+
+if __name__ == '__main__':
+    main()
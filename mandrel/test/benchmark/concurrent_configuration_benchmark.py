@@ -0,0 +1,75 @@
+"""Measures attribute read throughput while a writer thread updates the configuration.
+
+Compares ConcurrentConfiguration, whose readers take no locks, with a
+Configuration guarded by a lock around every read and write.
+"""
+import threading
+import time
+from mandrel.config import core
+
+READERS = 4
+DURATION = 1.0
+KEYS = 100
+
+class LockedConfiguration(core.Configuration):
+    """Stand-in making Configuration thread-safe the straightforward way."""
+    __slots__ = ()
+    LOCK = threading.Lock()
+
+    def configuration_get(self, attribute):
+        with self.LOCK:
+            return self.configuration[attribute]
+
+    def configuration_update(self, values):
+        with self.LOCK:
+            self.configuration.update(values)
+        core.invalidate_lookup_caches()
+
+def throughput(cls, writing):
+    c = cls(dict(('key%d' % k, 0) for k in xrange(KEYS)))
+    stop = threading.Event()
+    counts = []
+    writes = [0]
+
+    def read():
+        count = 0
+        while not stop.is_set():
+            for i in xrange(100):
+                c.key7
+            count += 100
+        counts.append(count)
+
+    def write():
+        while not stop.is_set():
+            writes[0] += 1
+            c.configuration_update({'key7': writes[0], 'key8': writes[0]})
+            time.sleep(0.001)
+
+    threads = [threading.Thread(target=read) for i in xrange(READERS)]
+    if writing:
+        threads.append(threading.Thread(target=write))
+    for thread in threads:
+        thread.start()
+    time.sleep(DURATION)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / DURATION, writes[0] / DURATION
+
+def main():
+    print 'Attribute reads per second across %d reader threads, %d keys' % (READERS, KEYS)
+    for writing in (False, True):
+        baseline = None
+        for cls in (LockedConfiguration, core.ConcurrentConfiguration):
+            reads, writes = throughput(cls, writing)
+            line = '%-48s %12.0f' % ('%s, %s' % (cls.__name__, writing and 'with writer' or 'no writer'), reads)
+            if baseline is None:
+                baseline = reads
+            else:
+                line += '  (%.1fx)' % (reads / baseline)
+            if writing:
+                line += '  %.0f writes/s' % writes
+            print line
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""Compares lookups after repeated hot_copy, cow_copy, and snapshot/freeze copies."""
+from mandrel.config import core
+from mandrel.test import benchmark
+
+LOOKUPS = 10000
+
+def base():
+    return core.Configuration(dict(('key%d' % i, i) for i in xrange(20)))
+
+def copies(c, method, count):
+    for i in xrange(count):
+        c = getattr(c, method)()
+    return c
+
+def lookups(c):
+    for i in xrange(LOOKUPS):
+        c.key7
+
+def main():
+    print 'Time per %d lookups after N successive copies' % LOOKUPS
+    for count in (1, 10, 100):
+        hot = copies(base(), 'hot_copy', count)
+        baseline = benchmark.measure(lambda: lookups(hot))
+        benchmark.report('%3d hot_copy' % count, baseline)
+        for method in ('cow_copy', 'snapshot', 'freeze'):
+            c = copies(base(), method, count)
+            benchmark.report('%3d %s' % (count, method), benchmark.measure(lambda: lookups(c)), baseline)
+        benchmark.report('%3d hot_copy + freeze' % count,
+                         benchmark.measure(lambda: lookups(hot.freeze())), baseline)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Compares load_configuration_file for the same document in each built-in format."""
+import os
+from mandrel.config import core
+from mandrel.test import benchmark
+from mandrel.test import utils
+
+SECTIONS = 50
+KEYS = 20
+NUMBER = 20
+
+def write_documents(dirpath):
+    sections = [('section%d' % i, [('key%d' % j, 'value %d.%d' % (i, j)) for j in xrange(KEYS)])
+                for i in xrange(SECTIONS)]
+    documents = {
+        'yaml': ''.join('%s:\n%s' % (name, ''.join('  %s: %s\n' % pair for pair in pairs))
+                        for name, pairs in sections),
+        'json': '{%s}' % ', '.join('"%s": {%s}' % (name, ', '.join('"%s": "%s"' % pair for pair in pairs))
+                                   for name, pairs in sections),
+        'toml': ''.join('[%s]\n%s\n' % (name, ''.join('%s = "%s"\n' % pair for pair in pairs))
+                        for name, pairs in sections),
+        'ini': ''.join('[%s]\n%s\n' % (name, ''.join('%s = %s\n' % pair for pair in pairs))
+                       for name, pairs in sections),
+    }
+    paths = {}
+    for extension, contents in documents.iteritems():
+        path = paths[extension] = os.path.join(dirpath, 'doc.%s' % extension)
+        with open(path, 'w') as f:
+            f.write(contents)
+    return paths
+
+def main():
+    core.enable_formats()
+    with utils.tempdir() as dirpath:
+        paths = write_documents(dirpath)
+        print 'Time per load_configuration_file, %d sections of %d keys' % (SECTIONS, KEYS)
+        baseline = benchmark.measure(lambda: core.load_configuration_file(paths['yaml']), number=NUMBER)
+        benchmark.report('yaml (%s)' % core.get_yaml_loader().__name__, baseline)
+        json_loads = core.get_json_loads()
+        benchmark.report('json (%s)' % json_loads.__module__,
+                         benchmark.measure(lambda: core.load_configuration_file(paths['json']), number=NUMBER),
+                         baseline)
+        toml = core.get_toml_module()
+        if toml is None:
+            print 'toml: no parser installed, skipped'
+        else:
+            benchmark.report('toml (%s)' % toml.__name__,
+                             benchmark.measure(lambda: core.load_configuration_file(paths['toml']), number=NUMBER),
+                             baseline)
+        benchmark.report('ini',
+                         benchmark.measure(lambda: core.load_configuration_file(paths['ini']), number=NUMBER),
+                         baseline)
+
+if __name__ == '__main__':
+    main()
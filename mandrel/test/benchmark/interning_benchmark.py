@@ -0,0 +1,67 @@
+"""Measures the memory held by many similar configurations, with and without a Canonicalizer.
+
+Sizes are sums of sys.getsizeof over the distinct objects reachable from
+the loaded configurations, including the Canonicalizer's own tables.
+"""
+import json
+import os
+import sys
+import mock
+from mandrel.config import core
+from mandrel.config import interning
+from mandrel.test import benchmark
+from mandrel.test import utils
+
+FILES = 500
+
+def service_document(i):
+    return {'name': 'service-%d' % i,
+            'logging': {'level': ('DEBUG', 'INFO', 'WARNING')[i % 3],
+                        'handlers': ['console', 'syslog'],
+                        'format': '%(asctime)s %(levelname)s %(name)s %(message)s'},
+            'database': {'host': 'db-%d.example.com' % (i % 4), 'port': 5432,
+                         'driver': 'mandrel.drivers.postgresql.Driver'},
+            'workers': [{'class': 'mandrel.workers.Worker', 'queue': 'queue-%d' % q} for q in xrange(5)]}
+
+def deep_size(value, seen):
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for k, v in value.iteritems():
+            size += deep_size(k, seen) + deep_size(v, seen)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for v in value:
+            size += deep_size(v, seen)
+    return size
+
+def load_all(paths):
+    return [core.load_configuration_file(path) for path in paths]
+
+def main():
+    core.enable_formats('json')
+    with utils.tempdir() as dirpath:
+        paths = []
+        for i in xrange(FILES):
+            paths.append(os.path.join(dirpath, 'service%d.json' % i))
+            with open(paths[-1], 'w') as f:
+                json.dump(service_document(i), f)
+
+        print 'Loading %d similar configuration files' % FILES
+        baseline_time = benchmark.measure(lambda: load_all(paths))
+        baseline_size = deep_size(load_all(paths), set())
+        canonicalizer = interning.Canonicalizer()
+        with mock.patch.object(core, 'CANONICALIZER', canonicalizer):
+            canonical_time = benchmark.measure(lambda: load_all(paths))
+            canonicalizer.clear()
+            canonical_size = deep_size([load_all(paths), canonicalizer._strings, canonicalizer._subtrees], set())
+        benchmark.report('load time, plain', baseline_time)
+        benchmark.report('load time, canonicalized', canonical_time, baseline_time)
+        print '%-48s %12d bytes' % ('retained, plain', baseline_size)
+        print '%-48s %12d bytes  (%.0f%%)' % ('retained, canonicalized', canonical_size,
+                                              100.0 * canonical_size / baseline_size)
+        print 'Canonicalizer report: %r' % (canonicalizer.report(),)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Compares refreshing a LayerStack after one key of one layer changed with a full reload and merge."""
+import json
+import os
+import time
+import mock
+from mandrel.config import core
+from mandrel.config import stack
+from mandrel.test import benchmark
+from mandrel.test import utils
+
+LAYERS = 3
+SECTIONS = 100
+KEYS = 400
+
+def document(layer):
+    return dict(('section_%d' % s, dict(('key_%d' % k, 'value %d.%d.%d' % (layer, s, k)) for k in xrange(KEYS)))
+                for s in xrange(SECTIONS))
+
+def measure_after(prepare, func, repeat=3):
+    """Returns the best time of func() over repeat runs, each following an untimed prepare()."""
+    times = []
+    for i in xrange(repeat):
+        prepare()
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+    return min(times)
+
+def main():
+    core.enable_formats('json')
+    with utils.tempdir() as dirpath:
+        paths = []
+        docs = []
+        for i in xrange(LAYERS):
+            path = os.path.join(dirpath, 'layer%d' % i)
+            os.mkdir(path)
+            docs.append(document(i))
+            with open(os.path.join(path, 'service.json'), 'w') as f:
+                json.dump(docs[-1], f)
+            paths.append(path)
+        changed = os.path.join(paths[0], 'service.json')
+        counter = [0]
+
+        def change():
+            counter[0] += 1
+            docs[0]['section_7']['key_7'] = 'changed %d' % counter[0]
+            with open(changed, 'w') as f:
+                json.dump(docs[0], f)
+            st = os.stat(changed)
+            os.utime(changed, (st.st_atime, st.st_mtime + counter[0]))
+
+        with mock.patch.object(core, '_get_bootstrapper', lambda: mock.Mock(SEARCH_PATHS=paths)):
+            with mock.patch.object(core, 'MERGED_CONFIGURATION_CACHE', None):
+                print 'Time to pick up one changed key, %d layers of %d keys' % (LAYERS, SECTIONS * KEYS)
+                baseline = measure_after(change, lambda: core.get_merged_configuration('service'))
+                benchmark.report('get_merged_configuration (reload and merge all)', baseline)
+                layers = stack.LayerStack('service')
+                benchmark.report('LayerStack.refresh', measure_after(change, layers.refresh), baseline)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Measures the startup cost of typical bootstrap consumers, eager versus MANDREL_LAZY_BOOTSTRAP.
+
+Each run starts a new interpreter and times importing mandrel.bootstrap
+followed by the consumer's first use of it; the best of several runs is
+reported.  The Mandrel.py used sets logging and search path options, as
+is typical.
+"""
+import os
+import subprocess
+import sys
+import mandrel
+from mandrel.test import benchmark
+from mandrel.test import utils
+
+RUNS = 10
+PYTHONPATH = os.path.dirname(os.path.dirname(os.path.abspath(mandrel.__file__)))
+
+BOOTSTRAP_FILE = """
+bootstrap.DISABLE_EXISTING_LOGGERS = False
+bootstrap.SEARCH_PATHS.extend(['conf', '~/conf'])
+config.SEARCH_PATH_INDEX = None
+"""
+
+CONSUMERS = (
+    ('root path', 'bootstrap.ROOT_PATH'),
+    ('logger', 'bootstrap.get_logger("consumer")'),
+    ('configuration', 'import mandrel.config; list(mandrel.config.find_configuration_files("consumer"))'),
+)
+
+TIMED = """
+import timeit
+start = timeit.default_timer()
+from mandrel import bootstrap
+%s
+print timeit.default_timer() - start
+"""
+
+def best_time(statement, cwd, lazy):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = PYTHONPATH
+    env.pop('MANDREL_BOOTSTRAP_CACHE', None)
+    env.pop('MANDREL_LAZY_BOOTSTRAP', None)
+    if lazy:
+        env['MANDREL_LAZY_BOOTSTRAP'] = '1'
+    return min(float(subprocess.check_output([sys.executable, '-c', TIMED % statement], cwd=cwd, env=env))
+               for i in xrange(RUNS))
+
+def main():
+    with utils.bootstrap_scenario(text=BOOTSTRAP_FILE) as spec:
+        print 'Import of mandrel.bootstrap plus first use, by consumer'
+        for label, statement in CONSUMERS:
+            baseline = best_time(statement, spec[0], False)
+            benchmark.report('%s eager' % label, baseline)
+            benchmark.report('%s lazy' % label, best_time(statement, spec[0], True), baseline)
+
+if __name__ == '__main__':
+    main()
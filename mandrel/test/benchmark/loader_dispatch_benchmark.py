@@ -0,0 +1,29 @@
+"""Compares get_loader/get_possible_basenames with a plain LOADERS list and a LoaderRegistry."""
+from mandrel.config import core
+from mandrel.config import registry
+from mandrel.test import benchmark
+
+CALLS = 10000
+EXTENSIONS = ('yaml', 'yml', 'json', 'toml', 'ini', 'cfg', 'conf', 'env',
+              'json.gz', 'yaml.enc', 'json.enc', 'mcache')
+
+def dispatch():
+    for i in xrange(CALLS):
+        core.get_possible_basenames('service')
+        core.get_loader('/etc/service/service.mcache')
+
+def main():
+    loaders = [(extension, lambda path: {}) for extension in EXTENSIONS]
+    original = core.LOADERS
+    try:
+        print 'Time per %d get_possible_basenames + get_loader calls, %d loaders' % (CALLS, len(loaders))
+        core.LOADERS = loaders
+        baseline = benchmark.measure(dispatch)
+        benchmark.report('plain list', baseline)
+        core.LOADERS = registry.LoaderRegistry(loaders)
+        benchmark.report('LoaderRegistry', benchmark.measure(dispatch), baseline)
+    finally:
+        core.LOADERS = original
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Measures per-instance memory of Configuration variants with many same-schema instances.
+
+Uses tracemalloc where available (Python 3.4+); otherwise estimates sizes
+by summing sys.getsizeof over each instance's own objects.
+"""
+import sys
+from mandrel.config import core
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+INSTANCES = 10000
+KEYS = 20
+
+class UnslottedConfiguration(object):
+    """Stand-in with the layout of Configuration before it used __slots__."""
+    def __init__(self, configuration, *chain):
+        self.configuration = configuration
+        self.chain = chain
+
+def tenant_configuration(i):
+    return dict(('key%d' % k, i) for k in xrange(KEYS))
+
+def build(cls):
+    return [cls(tenant_configuration(i)) for i in xrange(INSTANCES)]
+
+def estimate(instances):
+    total = 0
+    for c in instances:
+        total += sys.getsizeof(c) + sys.getsizeof(c.configuration) + sys.getsizeof(c.chain)
+        inner = getattr(c.configuration, '_values', None)
+        if inner is not None:
+            total += sys.getsizeof(inner)
+        state = vars(c) if type(c) is UnslottedConfiguration else None
+        if state is not None:
+            total += sys.getsizeof(state)
+    return total
+
+def measure(cls):
+    if tracemalloc is None:
+        return estimate(build(cls))
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        instances = build(cls)
+        return tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+def main():
+    print 'Bytes per instance, %d instances with %d keys each (%s)' % (
+        INSTANCES, KEYS, tracemalloc and 'tracemalloc' or 'sys.getsizeof estimate')
+    baseline = None
+    for cls in (UnslottedConfiguration, core.Configuration, core.CompactConfiguration):
+        size = measure(cls) / float(INSTANCES)
+        line = '%-48s %12.1f' % (cls.__name__, size)
+        if baseline is None:
+            baseline = size
+        else:
+            line += '  (%.0f%%)' % (100 * size / baseline)
+        print line
+
+if __name__ == '__main__':
+    main()
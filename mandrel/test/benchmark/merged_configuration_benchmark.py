@@ -0,0 +1,45 @@
+"""Compares get_merged_configuration for an unchanged stack of layers with and without MERGED_CONFIGURATION_CACHE."""
+import os
+import mock
+import yaml
+from mandrel.config import cache
+from mandrel.config import core
+from mandrel.test import benchmark
+from mandrel.test import utils
+from mandrel.test.benchmark import yaml_loader_benchmark
+
+LAYERS = 3
+SECTIONS = 20
+KEYS = 20
+NUMBER = 10
+
+def write_layers(dirpath):
+    paths = []
+    for i in xrange(LAYERS):
+        path = os.path.join(dirpath, 'layer%d' % i)
+        os.mkdir(path)
+        doc = yaml_loader_benchmark.synthetic_document(SECTIONS, KEYS)
+        with open(os.path.join(path, 'service.yaml'), 'w') as f:
+            yaml.safe_dump(doc, f)
+        paths.append(path)
+    return paths
+
+def main():
+    with utils.tempdir() as dirpath:
+        paths = write_layers(dirpath)
+        load = lambda: core.get_merged_configuration('service', list_strategy='append')
+        print 'Time per get_merged_configuration, %d layers of %d sections of %d keys' % (LAYERS, SECTIONS, KEYS)
+        with mock.patch.object(core, '_get_bootstrapper', lambda: mock.Mock(SEARCH_PATHS=paths)):
+            with mock.patch.object(core, 'MERGED_CONFIGURATION_CACHE', None):
+                baseline = benchmark.measure(load, number=NUMBER)
+                benchmark.report('no cache', baseline)
+            with mock.patch.object(core, 'MERGED_CONFIGURATION_CACHE', cache.MergedConfigurationCache()):
+                load()
+                benchmark.report('MergedConfigurationCache', benchmark.measure(load, number=NUMBER), baseline)
+            with mock.patch.object(core, 'MERGED_CONFIGURATION_CACHE', cache.MergedConfigurationCache(read_only=True)):
+                load()
+                benchmark.report('MergedConfigurationCache(read_only=True)',
+                                 benchmark.measure(load, number=NUMBER), baseline)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+"""Compares a worker's get_configuration from its own YAML parse with a SharedConfigurationStore view."""
+import os
+import mock
+import yaml
+from mandrel.config import core
+from mandrel.config import shared
+from mandrel.test import benchmark
+from mandrel.test import utils
+from mandrel.test.benchmark import yaml_loader_benchmark
+
+SECTIONS = 50
+KEYS = 50
+
+def main():
+    doc = yaml_loader_benchmark.synthetic_document(SECTIONS, KEYS)
+    with utils.tempdir() as dirpath:
+        with open(os.path.join(dirpath, 'service.yaml'), 'w') as f:
+            yaml.safe_dump(doc, f)
+        load = lambda: core.get_configuration('service')['section_7']['key_7']['host']
+        with mock.patch.object(core, '_get_bootstrapper', lambda: mock.Mock(SEARCH_PATHS=[dirpath])):
+            print 'Time per get_configuration plus one lookup, %d sections of %d keys' % (SECTIONS, KEYS)
+            baseline = benchmark.measure(load)
+            benchmark.report('parse YAML', baseline)
+            store = shared.SharedConfigurationStore()
+            try:
+                store.publish_configuration('service')
+                with mock.patch.object(core, 'SHARED_STORE', store):
+                    benchmark.report('SharedConfigurationStore', benchmark.measure(load, number=100), baseline)
+            finally:
+                store.close()
+
+if __name__ == '__main__':
+    main()
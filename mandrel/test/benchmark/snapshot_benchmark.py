@@ -0,0 +1,26 @@
+"""Compares parsing YAML sources against serving their compiled snapshots."""
+import os
+import yaml
+from mandrel.config import core
+from mandrel.config import snapshot
+from mandrel.test import benchmark
+from mandrel.test import utils
+from mandrel.test.benchmark.yaml_loader_benchmark import synthetic_document
+
+def main():
+    with utils.tempdir() as path:
+        for sections, keys in ((10, 50), (20, 100), (40, 100)):
+            target = os.path.join(path, 'synthetic_%d_%d.yaml' % (sections, keys))
+            with open(target, 'w') as f:
+                yaml.dump(synthetic_document(sections, keys), f, default_flow_style=False,
+                          Dumper=getattr(yaml, 'CSafeDumper', yaml.SafeDumper))
+            snapshot.load(target, core.read_yaml_path)
+            size = os.path.getsize(target)
+            parsed = benchmark.measure(lambda: core.read_yaml_path(target))
+            benchmark.report('%s %7.1f KB' % (core.get_yaml_loader().__name__, size / 1024.0), parsed)
+            served = benchmark.measure(lambda: snapshot.load(target, core.read_yaml_path), number=10)
+            benchmark.report('snapshot %7.1f KB' % (os.path.getsize(snapshot.snapshot_path(target)) / 1024.0),
+                             served, parsed)
+
+if __name__ == '__main__':
+    main()
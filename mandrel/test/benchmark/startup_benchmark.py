@@ -0,0 +1,50 @@
+"""Measures the time to import mandrel.bootstrap in a fresh process, from a deep working directory.
+
+Each run starts a new interpreter, which imports mandrel.config (which does
+not itself bootstrap) and the standard library modules mandrel.bootstrap
+depends upon, then times the import of mandrel.bootstrap; the best of
+several runs is reported.
+"""
+import os
+import subprocess
+import sys
+import mandrel
+from mandrel.test import benchmark
+from mandrel.test import utils
+
+DEPTH = 40
+RUNS = 20
+PYTHONPATH = os.path.dirname(os.path.dirname(os.path.abspath(mandrel.__file__)))
+
+TIMED_IMPORT = """
+import timeit, logging.config, marshal, mandrel.config
+start = timeit.default_timer()
+import mandrel.bootstrap
+print timeit.default_timer() - start
+"""
+
+def environment(**variables):
+    env = dict(os.environ)
+    env.pop('MANDREL_BOOTSTRAP_CACHE', None)
+    env['PYTHONPATH'] = PYTHONPATH
+    env.update(variables)
+    return env
+
+def best_import_time(cwd, env):
+    return min(float(subprocess.check_output([sys.executable, '-c', TIMED_IMPORT], cwd=cwd, env=env))
+               for i in xrange(RUNS))
+
+def main():
+    with utils.bootstrap_scenario(text='bootstrap.SEARCH_PATHS.extend(["a", "b", "c"])') as spec:
+        deep = os.path.join(spec[0], *('level%d' % i for i in xrange(DEPTH)))
+        os.makedirs(deep)
+        cache = os.path.join(spec[0], 'bootstrap.cache')
+        print 'Import of mandrel.bootstrap from %d levels below Mandrel.py' % DEPTH
+        baseline = best_import_time(deep, environment())
+        benchmark.report('uncached', baseline)
+        env = environment(MANDREL_BOOTSTRAP_CACHE=cache)
+        best_import_time(deep, env)
+        benchmark.report('MANDREL_BOOTSTRAP_CACHE', best_import_time(deep, env), baseline)
+
+if __name__ == '__main__':
+    main()
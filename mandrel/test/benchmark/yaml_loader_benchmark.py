@@ -0,0 +1,58 @@
+"""Compares read_yaml_path under the libyaml and pure-python safe loaders."""
+import os
+import yaml
+from mandrel.config import core
+from mandrel.test import benchmark
+from mandrel.test import utils
+
+def synthetic_document(sections, keys):
+    """Returns a nested dict of roughly sections * keys scalar values."""
+    doc = {}
+    for s in xrange(sections):
+        doc['section_%d' % s] = dict(
+                ('key_%d' % k, {'host': 'host-%d.example.com' % k,
+                                'port': 8000 + k,
+                                'weight': k / 7.0,
+                                'tags': ['a', 'b', 'c%d' % k],
+                                'enabled': bool(k % 2)})
+                for k in xrange(keys))
+    return doc
+
+def run(path, loader):
+    with benchmark_loader(loader):
+        core.read_yaml_path(path)
+
+class benchmark_loader(object):
+    def __init__(self, loader):
+        self.loader = loader
+
+    def __enter__(self):
+        self.original = core.YAML_LOADER
+        core.YAML_LOADER = self.loader
+
+    def __exit__(self, *exc):
+        core.YAML_LOADER = self.original
+
+def main():
+    loaders = [('SafeLoader', yaml.SafeLoader)]
+    if hasattr(yaml, 'CSafeLoader'):
+        loaders.append(('CSafeLoader', yaml.CSafeLoader))
+    else:
+        print 'CSafeLoader unavailable; PyYAML was built without libyaml.'
+
+    with utils.tempdir() as path:
+        for sections, keys in ((10, 50), (20, 100), (40, 100)):
+            target = os.path.join(path, 'synthetic_%d_%d.yaml' % (sections, keys))
+            with open(target, 'w') as f:
+                yaml.dump(synthetic_document(sections, keys), f, default_flow_style=False,
+                          Dumper=getattr(yaml, 'CSafeDumper', yaml.SafeDumper))
+            size = os.path.getsize(target)
+            baseline = None
+            for name, loader in loaders:
+                seconds = benchmark.measure(lambda: run(target, loader), repeat=2)
+                benchmark.report('%s %7.1f KB' % (name, size / 1024.0), seconds, baseline)
+                if baseline is None:
+                    baseline = seconds
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import marshal
+import os
+import mock
+import mandrel
+from mandrel.test import utils
+
+class TestBootstrapCache(utils.TestCase):
+    def scenario(self, cache_path):
+        return mock.patch.dict(os.environ, {'MANDREL_BOOTSTRAP_CACHE': cache_path})
+
+    def testNoCacheByDefault(self):
+        with utils.bootstrap_scenario(text='bootstrap.SEARCH_PATHS.append("foo")') as spec:
+            with mock.patch.dict(os.environ, clear=True):
+                utils.refresh_bootstrapper()
+            self.assertEqual(None, mandrel.bootstrap._bootstrap_cache)
+            self.assertEqual([spec[0], os.path.join(spec[0], 'foo')], list(mandrel.bootstrap.SEARCH_PATHS))
+
+    def testCacheContents(self):
+        with utils.tempdir() as cache_dir:
+            cache_path = os.path.join(cache_dir, 'bootstrap.cache')
+            with utils.bootstrap_scenario(text='bootstrap.SEARCH_PATHS.append("foo")') as spec:
+                with utils.workdir(dir=spec[0]) as nested:
+                    with self.scenario(cache_path):
+                        utils.refresh_bootstrapper()
+                    with open(cache_path, 'rb') as f:
+                        cache = marshal.load(f)
+                    self.assertEqual(spec[0], cache['roots'][nested])
+                    signature, code = cache['files'][spec[1]]
+                    self.assertEqual(mandrel.util.stat_signature(spec[1]), signature)
+                    self.assertEqual(spec[1], code.co_filename)
+                    self.assertEqual(os.path.join(spec[0], 'foo'), cache['paths'][os.path.join(spec[0], 'foo')])
+
+    def testCacheUsed(self):
+        with utils.tempdir() as cache_dir:
+            cache_path = os.path.join(cache_dir, 'bootstrap.cache')
+            with utils.bootstrap_scenario(text='bootstrap.SEARCH_PATHS.append("foo")') as spec:
+                with utils.workdir(dir=spec[0]) as nested:
+                    with self.scenario(cache_path):
+                        utils.refresh_bootstrapper()
+                        with mock.patch('os.path.isfile', side_effect=AssertionError('walked')):
+                            with mock.patch('os.path.realpath', side_effect=AssertionError('resolved')):
+                                with mock.patch('__builtin__.compile', side_effect=AssertionError('compiled')):
+                                    with mock.patch('mandrel.util.write_atomically') as write:
+                                        utils.refresh_bootstrapper()
+                    self.assertEqual(spec[0], mandrel.bootstrap.ROOT_PATH)
+                    self.assertEqual(spec[1], mandrel.bootstrap.BOOTSTRAP_FILE)
+                    self.assertEqual([spec[0], os.path.join(spec[0], 'foo')], list(mandrel.bootstrap.SEARCH_PATHS))
+                    self.assertFalse(write.called)
+
+    def testSymlinksResolvedByEachProcess(self):
+        with utils.tempdir() as cache_dir:
+            cache_path = os.path.join(cache_dir, 'bootstrap.cache')
+            with utils.bootstrap_scenario(text='bootstrap.SEARCH_PATHS.append("current")') as spec:
+                for release in ('release-1', 'release-2'):
+                    os.mkdir(os.path.join(spec[0], release))
+                os.symlink('release-1', os.path.join(spec[0], 'current'))
+                with self.scenario(cache_path):
+                    utils.refresh_bootstrapper()
+                    self.assertEqual([spec[0], os.path.join(spec[0], 'release-1')], list(mandrel.bootstrap.SEARCH_PATHS))
+                    os.remove(os.path.join(spec[0], 'current'))
+                    os.symlink('release-2', os.path.join(spec[0], 'current'))
+                    utils.refresh_bootstrapper()
+                    self.assertEqual([spec[0], os.path.join(spec[0], 'release-2')], list(mandrel.bootstrap.SEARCH_PATHS))
+                with open(cache_path, 'rb') as f:
+                    cache = marshal.load(f)
+                self.assertEqual(spec[0], cache['paths'][spec[0]])
+                self.assertFalse(os.path.join(spec[0], 'current') in cache['paths'])
+
+    def testChangedBootstrapFileRecompiled(self):
+        with utils.tempdir() as cache_dir:
+            cache_path = os.path.join(cache_dir, 'bootstrap.cache')
+            with utils.bootstrap_scenario(text='bootstrap.CACHE_CHECK = 1') as spec:
+                with self.scenario(cache_path):
+                    utils.refresh_bootstrapper()
+                    self.assertEqual(1, mandrel.bootstrap.CACHE_CHECK)
+                    with open(spec[1], 'w') as f:
+                        f.write('bootstrap.CACHE_CHECK = 200')
+                    utils.refresh_bootstrapper()
+                    self.assertEqual(200, mandrel.bootstrap.CACHE_CHECK)
+                    del mandrel.bootstrap.CACHE_CHECK
+                    utils.refresh_bootstrapper()
+                    self.assertEqual(200, mandrel.bootstrap.CACHE_CHECK)
+
+    def testInvalidCacheIgnored(self):
+        with utils.tempdir() as cache_dir:
+            cache_path = os.path.join(cache_dir, 'bootstrap.cache')
+            for content in ('garbage', marshal.dumps({'version': None})):
+                with open(cache_path, 'wb') as f:
+                    f.write(content)
+                with utils.bootstrap_scenario() as spec:
+                    with self.scenario(cache_path):
+                        utils.refresh_bootstrapper()
+                    self.assertEqual(spec[0], mandrel.bootstrap.ROOT_PATH)
+                    with open(cache_path, 'rb') as f:
+                        self.assertEqual(spec[0], marshal.load(f)['roots'][spec[0]])
@@ -0,0 +1,108 @@
+import contextlib
+import os
+import sys
+import mock
+import mandrel
+from mandrel import exception
+from mandrel.test import utils
+
+@contextlib.contextmanager
+def lazy_bootstrapper():
+    previous = sys.modules.pop('mandrel.bootstrap', None)
+    if hasattr(mandrel, 'bootstrap'):
+        del mandrel.bootstrap
+    try:
+        with mock.patch.dict(os.environ, {'MANDREL_LAZY_BOOTSTRAP': '1'}):
+            __import__('mandrel.bootstrap')
+        yield sys.modules['mandrel.bootstrap']
+    finally:
+        if previous is None:
+            sys.modules.pop('mandrel.bootstrap', None)
+            del mandrel.bootstrap
+        else:
+            sys.modules['mandrel.bootstrap'] = mandrel.bootstrap = previous
+
+def stages(bootstrapper):
+    return bootstrapper._module._resolved_stages
+
+class TestLazyBootstrap(utils.TestCase):
+    def testNothingResolvedOnImport(self):
+        with utils.bootstrap_scenario(text='bootstrap.EVALUATED = True') as spec:
+            with lazy_bootstrapper() as bootstrapper:
+                self.assertIs(bootstrapper, mandrel.bootstrap)
+                from mandrel import bootstrap
+                self.assertIs(bootstrapper, bootstrap)
+                self.assertEqual(set(), stages(bootstrapper))
+                self.assertIs(bootstrapper._module.get_logger, bootstrapper.get_logger)
+                self.assertEqual(set(), stages(bootstrapper))
+
+    def testRootOnly(self):
+        with utils.bootstrap_scenario(text='bootstrap.EVALUATED = True') as spec:
+            with utils.workdir(dir=spec[0]):
+                with lazy_bootstrapper() as bootstrapper:
+                    self.assertEqual(spec[0], bootstrapper.ROOT_PATH)
+                    self.assertEqual(spec[1], bootstrapper.BOOTSTRAP_FILE)
+                    self.assertEqual(set(['root']), stages(bootstrapper))
+                    self.assertFalse(hasattr(bootstrapper._module, 'EVALUATED'))
+
+    def testSearchPaths(self):
+        with utils.bootstrap_scenario(text='bootstrap.SEARCH_PATHS.append("foo")') as spec:
+            with lazy_bootstrapper() as bootstrapper:
+                self.assertEqual([spec[0], os.path.join(spec[0], 'foo')], list(bootstrapper.SEARCH_PATHS))
+                self.assertEqual(set(['root', 'search_paths', 'evaluated']), stages(bootstrapper))
+
+    def testLoggingSettings(self):
+        with utils.bootstrap_scenario(text='bootstrap.LOGGING_CONFIG_BASENAME = "foo.cfg"') as spec:
+            with lazy_bootstrapper() as bootstrapper:
+                self.assertEqual('foo.cfg', bootstrapper.LOGGING_CONFIG_BASENAME)
+                self.assertEqual(set(['root', 'search_paths', 'evaluated']), stages(bootstrapper))
+                self.assertRaises(exception.UnknownConfigurationException, bootstrapper.find_logging_configuration)
+
+    def testSearchPathsAssignedBeforeDefault(self):
+        text = 'bootstrap.DEFAULT_LOGGING_CALLBACK = lambda: None\nbootstrap.SEARCH_PATHS = ["foo"]'
+        with utils.bootstrap_scenario(text=text) as spec:
+            with lazy_bootstrapper() as bootstrapper:
+                bootstrapper.get_logger('foo')
+                self.assertEqual(set(['root', 'search_paths', 'evaluated']), stages(bootstrapper))
+                self.assertEqual(['foo'], bootstrapper.SEARCH_PATHS)
+
+    def testBootstrapFileNames(self):
+        with utils.bootstrap_scenario(text='bootstrap.EVALUATED = True') as spec:
+            with lazy_bootstrapper() as bootstrapper:
+                self.assertEqual(True, bootstrapper.EVALUATED)
+                self.assertRaises(AttributeError, lambda: bootstrapper.NOT_DEFINED)
+
+    def testSettingsOverrideBootstrapFile(self):
+        with utils.bootstrap_scenario(text='bootstrap.LOGGING_CONFIG_BASENAME = "foo.cfg"') as spec:
+            with lazy_bootstrapper() as bootstrapper:
+                bootstrapper.LOGGING_CONFIG_BASENAME = 'bar.cfg'
+                self.assertEqual('bar.cfg', bootstrapper.LOGGING_CONFIG_BASENAME)
+                self.assertEqual('bar.cfg', bootstrapper._module.LOGGING_CONFIG_BASENAME)
+
+    def testLazyConfig(self):
+        text = 'bootstrap.CONFIG_ATTRIBUTE = config.core\nconfig.LAZY_CHECK = "set"'
+        with utils.bootstrap_scenario(text=text) as spec:
+            with lazy_bootstrapper() as bootstrapper:
+                self.assertIs(mandrel.config.core, bootstrapper.CONFIG_ATTRIBUTE)
+                self.assertEqual('set', mandrel.config.LAZY_CHECK)
+                del mandrel.config.LAZY_CHECK
+
+    def testDeferredConfigSettings(self):
+        with utils.bootstrap_scenario(text='config.LAZY_CHECK = "deferred"') as spec:
+            with lazy_bootstrapper() as bootstrapper:
+                with mock.patch.dict(sys.modules):
+                    del sys.modules['mandrel.config']
+                    bootstrapper.EVALUATED = True
+                config = mock.Mock(name='Config')
+                bootstrapper._apply_deferred_config(config)
+                self.assertEqual('deferred', config.LAZY_CHECK)
+                self.assertEqual([], bootstrapper._module._deferred_config_settings)
+                self.assertFalse(hasattr(mandrel.config, 'LAZY_CHECK'))
+
+    def testFailedStageRetried(self):
+        with utils.workdir(dir='~') as path:
+            with lazy_bootstrapper() as bootstrapper:
+                self.assertRaises(exception.MissingBootstrapException, lambda: bootstrapper.ROOT_PATH)
+                with open(os.path.join(path, 'Mandrel.py'), 'w') as f:
+                    f.write('')
+                self.assertEqual(path, bootstrapper.ROOT_PATH)
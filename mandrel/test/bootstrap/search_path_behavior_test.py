@@ -12,7 +12,7 @@ class TestSearchPathBehavior(utils.TestCase):
             mock_list.return_value.__iter__.return_value = iter(['foo'])
             utils.refresh_bootstrapper()
             # Verify that we're using the normalize_path as a transform function on a transforming list
-            mock_list.assert_called_once_with(mandrel.bootstrap.normalize_path)
+            mock_list.assert_called_once_with(mandrel.bootstrap.normalize_path, mandrel.bootstrap.normalize_paths)
             self.assertIs(mock_list.return_value, mandrel.bootstrap.SEARCH_PATHS)
 
     def testNormalizeRelativePath(self):
@@ -39,3 +39,49 @@ class TestSearchPathBehavior(utils.TestCase):
             expect = [os.path.realpath(os.path.expanduser(p)) for p in paths]
             self.assertEqual(expect, [mandrel.bootstrap.normalize_path(p) for p in paths])
 
+
+    def testNormalizeSymlinks(self):
+        with utils.bootstrap_scenario() as spec:
+            utils.refresh_bootstrapper()
+            os.makedirs(os.path.join('real', 'inner'))
+            os.symlink('real', 'link')
+            os.symlink(os.path.join('..', 'real', 'inner'), os.path.join('real', 'innerlink'))
+            paths = ['link', os.path.join('link', 'inner'), os.path.join('link', 'innerlink', 'x'),
+                     os.path.join('link', 'innerlink', '..'), os.path.join('real', 'missing', 'y'),
+                     os.path.join('link', '.'), '/']
+            expect = [os.path.realpath(os.path.join(spec[0], p)) for p in paths]
+            self.assertEqual(expect, [mandrel.bootstrap.normalize_path(p) for p in paths])
+            mandrel.bootstrap.clear_normalized_paths()
+            self.assertEqual(expect, mandrel.bootstrap.normalize_paths(paths))
+
+    def testNormalizationMemoized(self):
+        with utils.bootstrap_scenario() as spec:
+            utils.refresh_bootstrapper()
+            os.makedirs(os.path.join('a', 'b'))
+            paths = [os.path.join('a', 'b', name) for name in ('c', 'd', 'e')]
+            expect = [os.path.join(spec[0], p) for p in paths]
+            with mock.patch('os.path.islink', wraps=os.path.islink) as islink:
+                self.assertEqual(expect, mandrel.bootstrap.normalize_paths(paths))
+                # Each shared parent is checked once.
+                checked = [call[0][0] for call in islink.call_args_list]
+                self.assertEqual(len(set(checked)), len(checked))
+                islink.reset_mock()
+                self.assertEqual(expect, [mandrel.bootstrap.normalize_path(p) for p in paths])
+                self.assertFalse(islink.called)
+
+            os.rename('a', 'elsewhere')
+            os.symlink('elsewhere', 'a')
+            self.assertEqual(expect, mandrel.bootstrap.normalize_paths(paths))
+            mandrel.bootstrap.clear_normalized_paths()
+            self.assertEqual([os.path.join(spec[0], 'elsewhere', 'b', name) for name in ('c', 'd', 'e')],
+                             mandrel.bootstrap.normalize_paths(paths))
+
+    def testBulkNormalization(self):
+        with utils.bootstrap_scenario() as spec:
+            utils.refresh_bootstrapper()
+            with mock.patch('mandrel.bootstrap.normalize_paths', wraps=mandrel.bootstrap.normalize_paths) as bulk:
+                mandrel.bootstrap.SEARCH_PATHS._batch_transformer = bulk
+                mandrel.bootstrap.SEARCH_PATHS[:] = ['a', 'b', 'c']
+                mandrel.bootstrap.SEARCH_PATHS.extend(['d', 'e'])
+                self.assertEqual([mock.call(['a', 'b', 'c']), mock.call(['d', 'e'])], bulk.call_args_list)
+            self.assertEqual([os.path.join(spec[0], p) for p in 'abcde'], list(mandrel.bootstrap.SEARCH_PATHS))
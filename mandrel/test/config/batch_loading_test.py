@@ -0,0 +1,114 @@
+import mock
+import multiprocessing
+import multiprocessing.pool
+import os
+import unittest
+import yaml
+import mandrel.config
+from mandrel import exception
+from mandrel import util
+from mandrel.test import utils
+
+def write_yaml(path, value):
+    with open(path, 'w') as f:
+        yaml.safe_dump(value, f)
+
+def scenario(func):
+    def wrapper(self):
+        with utils.bootstrap_scenario() as spec:
+            utils.refresh_bootstrapper()
+            root = spec[0]
+            levels = [os.path.join(root, level) for level in ('a', 'b')]
+            for level in levels:
+                os.mkdir(level)
+            mandrel.bootstrap.SEARCH_PATHS[:] = levels
+            write_yaml(os.path.join(levels[0], 'one.yaml'), {'level': 'a', 'name': 'one'})
+            write_yaml(os.path.join(levels[1], 'one.yaml'), {'level': 'b', 'name': 'one'})
+            write_yaml(os.path.join(levels[1], 'two.yaml'), {'level': 'b', 'name': 'two'})
+            with open(os.path.join(levels[0], 'broken.yaml'), 'w') as f:
+                f.write('foo: [unclosed\n')
+            return func(self, levels)
+    return wrapper
+
+class TestBatchLoading(unittest.TestCase):
+    @scenario
+    def testResolveConfigurationFiles(self, levels):
+        self.assertEqual({'one': os.path.join(levels[0], 'one.yaml'),
+                          'two': os.path.join(levels[1], 'two.yaml'),
+                          'broken': os.path.join(levels[0], 'broken.yaml')},
+                         mandrel.config.core.resolve_configuration_files(['one', 'two', 'broken', 'missing']))
+        for name in ('one', 'two'):
+            self.assertEqual(mandrel.config.find_configuration_file(name),
+                             mandrel.config.core.resolve_configuration_files([name])[name])
+
+    @scenario
+    def testSingleDirectoryPass(self, levels):
+        # Listings of directories modified within the last second are not
+        # reused; see util.DirectoryIndex.
+        for level in levels:
+            st = os.stat(level)
+            os.utime(level, (st.st_atime, st.st_mtime - 10))
+        with mock.patch.object(util.DirectoryIndex, '_scan', autospec=True, side_effect=util.DirectoryIndex._scan) as scan:
+            mandrel.config.core.resolve_configuration_files(['one', 'two', 'missing'])
+            self.assertEqual(levels, [c[0][1] for c in scan.call_args_list])
+
+    @scenario
+    def testGetConfigurations(self, levels):
+        batch = mandrel.config.get_configurations(['one', 'two', 'missing', 'broken', 'one'])
+        self.assertTrue(isinstance(batch, mandrel.config.core.ConfigurationBatch))
+        self.assertEqual({'one': {'level': 'a', 'name': 'one'}, 'two': {'level': 'b', 'name': 'two'}}, batch)
+        self.assertEqual(set(['missing', 'broken']), set(batch.errors))
+        self.assertTrue(isinstance(batch.errors['missing'], exception.UnknownConfigurationException))
+        self.assertEqual("No configuration file found for name 'missing'", str(batch.errors['missing']))
+        self.assertTrue(isinstance(batch.errors['broken'], yaml.YAMLError))
+
+    @scenario
+    def testGetConfigurationsFromGenerator(self, levels):
+        batch = mandrel.config.get_configurations(name for name in ('one', 'two', 'missing'))
+        self.assertEqual({'one': {'level': 'a', 'name': 'one'}, 'two': {'level': 'b', 'name': 'two'}}, batch)
+        self.assertEqual(['missing'], batch.errors.keys())
+
+    @scenario
+    def testMatchesGetConfiguration(self, levels):
+        os.mkdir(os.path.join(levels[1], 'sub'))
+        write_yaml(os.path.join(levels[1], 'sub', 'three.yaml'), {'level': 'b', 'name': 'three'})
+        names = ['one', os.path.join('sub', 'three'), os.path.join('sub', 'missing'), 'broken', 'missing']
+        for index in (None, util.DirectoryIndex()):
+            with mock.patch('mandrel.config.core.SEARCH_PATH_INDEX', index):
+                batch = mandrel.config.get_configurations(names)
+                for name in names:
+                    try:
+                        expected = mandrel.config.get_configuration(name)
+                    except Exception, e:
+                        self.assertEqual(type(e), type(batch.errors[name]))
+                        self.assertEqual(str(e), str(batch.errors[name]))
+                    else:
+                        self.assertEqual(expected, batch[name])
+                self.assertEqual({'level': 'b', 'name': 'three'}, batch[os.path.join('sub', 'three')])
+
+    @scenario
+    def testSingleName(self, levels):
+        with mock.patch('multiprocessing.pool.ThreadPool') as pool:
+            self.assertEqual({'two': {'level': 'b', 'name': 'two'}}, mandrel.config.get_configurations(['two']))
+            self.assertEqual(0, pool.call_count)
+            batch = mandrel.config.get_configurations(['broken'])
+            self.assertEqual({}, batch)
+            self.assertTrue(isinstance(batch.errors['broken'], yaml.YAMLError))
+
+    @scenario
+    def testWorkers(self, levels):
+        with mock.patch('multiprocessing.pool.ThreadPool', wraps=multiprocessing.pool.ThreadPool) as pool:
+            batch = mandrel.config.get_configurations(['one', 'two', 'broken'], workers=2)
+            pool.assert_called_once_with(2)
+            self.assertEqual(set(['one', 'two']), set(batch))
+
+    @scenario
+    def testProvidedPools(self, levels):
+        for pool in (multiprocessing.pool.ThreadPool(2), multiprocessing.Pool(2)):
+            try:
+                batch = mandrel.config.get_configurations(['one', 'two', 'missing', 'broken'], pool=pool)
+                self.assertEqual({'one': {'level': 'a', 'name': 'one'}, 'two': {'level': 'b', 'name': 'two'}}, batch)
+                self.assertEqual(set(['missing', 'broken']), set(batch.errors))
+            finally:
+                pool.terminate()
+                pool.join()
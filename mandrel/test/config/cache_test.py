@@ -0,0 +1,318 @@
+import mock
+import os
+import threading
+import unittest
+import mandrel.config
+from mandrel import util
+from mandrel.config import cache
+from mandrel.test import utils
+
+def write(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+def bump(path, offset=10):
+    st = os.stat(path)
+    os.utime(path, (st.st_atime, st.st_mtime + offset))
+
+def reader():
+    return mock.Mock(side_effect=lambda p: {'text': open(p).read(), 'nested': {'list': [1, 2]}})
+
+class TestConfigurationCache(unittest.TestCase):
+    def testHitsAndMisses(self):
+        with utils.tempdir() as path:
+            target = os.path.join(path, 'a.yaml')
+            write(target, 'a')
+            loader = reader()
+            c = cache.ConfigurationCache()
+            first = c.load(target, loader)
+            second = c.load(target, loader)
+            loader.assert_called_once_with(target)
+            self.assertEqual({'text': 'a', 'nested': {'list': [1, 2]}}, second)
+            self.assertEqual((1, 1), (c.hits, c.misses))
+            self.assertEqual(1, len(c))
+
+    def testCopiesAreIndependent(self):
+        with utils.tempdir() as path:
+            target = os.path.join(path, 'a.yaml')
+            write(target, 'a')
+            c = cache.ConfigurationCache()
+            first = c.load(target, reader())
+            first['nested']['list'].append(3)
+            first['text'] = 'poisoned'
+            self.assertEqual({'text': 'a', 'nested': {'list': [1, 2]}}, c.load(target, reader()))
+
+    def testReadOnlyViews(self):
+        with utils.tempdir() as path:
+            target = os.path.join(path, 'a.yaml')
+            write(target, 'a')
+            c = cache.ConfigurationCache(read_only=True)
+            first = c.load(target, reader())
+            second = c.load(target, reader())
+            self.assertTrue(first is second)
+            self.assertTrue(isinstance(first, util.FrozenDict))
+            self.assertEqual((1, 2), first['nested']['list'])
+            self.assertRaises(TypeError, lambda: first.__setitem__('text', 'b'))
+
+    def testInvalidatedByChange(self):
+        with utils.tempdir() as path:
+            target = os.path.join(path, 'a.yaml')
+            write(target, 'a')
+            loader = reader()
+            c = cache.ConfigurationCache()
+            c.load(target, loader)
+            write(target, 'b')
+            bump(target)
+            self.assertEqual('b', c.load(target, loader)['text'])
+            self.assertEqual(2, loader.call_count)
+            self.assertEqual((0, 2), (c.hits, c.misses))
+
+            c.invalidate(target)
+            c.load(target, loader)
+            self.assertEqual(3, loader.call_count)
+
+    def testMissingFileNotCached(self):
+        with utils.tempdir() as path:
+            c = cache.ConfigurationCache()
+            loader = reader()
+            self.assertRaises(OSError, lambda: c.load(os.path.join(path, 'nope.yaml'), loader))
+            self.assertEqual(0, loader.call_count)
+            self.assertEqual(0, len(c))
+
+    def testLoaderFailureNotCached(self):
+        with utils.tempdir() as path:
+            target = os.path.join(path, 'a.yaml')
+            write(target, 'a')
+            c = cache.ConfigurationCache()
+            self.assertRaises(ValueError, lambda: c.load(target, mock.Mock(side_effect=ValueError)))
+            self.assertEqual(0, len(c))
+            self.assertEqual('a', c.load(target, reader())['text'])
+
+    def testLRUEviction(self):
+        with utils.tempdir() as path:
+            targets = [os.path.join(path, '%d.yaml' % i) for i in xrange(3)]
+            for target in targets:
+                write(target, target)
+            loader = reader()
+            c = cache.ConfigurationCache(max_entries=2)
+            c.load(targets[0], loader)
+            c.load(targets[1], loader)
+            c.load(targets[0], loader)
+            c.load(targets[2], loader)
+            self.assertEqual(2, len(c))
+            self.assertEqual(1, c.evictions)
+            loader.reset_mock()
+            c.load(targets[0], loader)
+            c.load(targets[2], loader)
+            self.assertEqual(0, loader.call_count)
+            c.load(targets[1], loader)
+            loader.assert_called_once_with(targets[1])
+
+            c.clear()
+            self.assertEqual(0, len(c))
+
+    def testLRUEvictionWithoutOrderedDict(self):
+        with mock.patch('mandrel.config.cache._OrderedDict', cache._LinkedDict):
+            self.testLRUEviction()
+            d = cache._LinkedDict()
+            for key in 'abcd':
+                d[key] = key.upper()
+            del d['b']
+            d['a'] = 'A2'
+            self.assertEqual('A2', d.pop('a'))
+            d['a'] = 'A3'
+            self.assertEqual(None, d.pop('x', None))
+            self.assertRaises(KeyError, lambda: d.pop('x'))
+            self.assertEqual(('c', 'C'), d.popitem(last=False))
+            self.assertEqual(('a', 'A3'), d.popitem())
+            self.assertEqual(('d', 'D'), d.popitem())
+            self.assertRaises(KeyError, d.popitem)
+            d['e'] = 'E'
+            d.clear()
+            d['f'] = 'F'
+            self.assertEqual([('f', 'F')], [d.popitem(last=False)])
+            self.assertEqual(0, len(d._links))
+
+    def testThreadedAccess(self):
+        with utils.tempdir() as path:
+            targets = [os.path.join(path, '%d.yaml' % i) for i in xrange(5)]
+            for target in targets:
+                write(target, target)
+            c = cache.ConfigurationCache(max_entries=3)
+            failures = []
+            def work():
+                try:
+                    for i in xrange(200):
+                        target = targets[i % len(targets)]
+                        if c.load(target, reader())['text'] != target:
+                            failures.append(target)
+                except Exception, e:
+                    failures.append(e)
+            threads = [threading.Thread(target=work) for i in xrange(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual([], failures)
+            self.assertEqual(800, c.hits + c.misses)
+
+    @mock.patch('mandrel.config.core.CONFIGURATION_CACHE')
+    @mock.patch('mandrel.config.core.get_loader')
+    def testLoadConfigurationFileUsesCache(self, get_loader, configuration_cache):
+        path = mock.Mock(name='SomeConfigurationPath')
+        result = mandrel.config.core.load_configuration_file(path)
+        self.assertEqual(configuration_cache.load.return_value, result)
+        self.assertEqual(path, configuration_cache.load.call_args[0][0])
+        self.assertEqual(0, get_loader.call_count)
+        configuration_cache.load.call_args[0][1](path)
+        get_loader.assert_called_once_with(path)
+        get_loader.return_value.assert_called_once_with(path)
+
+
+class TestNegativeLookupCache(unittest.TestCase):
+    def testRecordAndExpire(self):
+        c = cache.NegativeLookupCache(ttl=10)
+        self.assertFalse(c.is_missing('a'))
+        with mock.patch('time.time', return_value=100.0):
+            c.record('a')
+        with mock.patch('time.time', return_value=109.0):
+            self.assertTrue(c.is_missing('a'))
+            self.assertFalse(c.is_missing('b'))
+        with mock.patch('time.time', return_value=110.0):
+            self.assertFalse(c.is_missing('a'))
+        self.assertEqual(0, len(c))
+        self.assertEqual((1, 2, 1), (c.hits, c.misses, c.expirations))
+
+    def testInvalidation(self):
+        c = cache.NegativeLookupCache(ttl=None, max_entries=2)
+        for key in 'abc':
+            c.record(key)
+        self.assertEqual([False, True, True], [c.is_missing(key) for key in 'abc'])
+        c.invalidate('b')
+        self.assertFalse(c.is_missing('b'))
+        c.clear()
+        self.assertFalse(c.is_missing('c'))
+
+    def testDirectoryValidation(self):
+        with utils.tempdir() as path:
+            directories = [path, os.path.join(path, 'later')]
+            c = cache.NegativeLookupCache(ttl=None, validate_directories=True)
+            c.record('a', directories)
+            c.record('b', directories)
+            self.assertTrue(c.is_missing('a', directories))
+            os.mkdir(directories[1])
+            self.assertFalse(c.is_missing('a', directories))
+            self.assertFalse(c.is_missing('b', directories))
+            c.record('a', directories)
+            write(os.path.join(directories[1], 'a.yaml'), 'a')
+            bump(directories[1])
+            self.assertFalse(c.is_missing('a', directories))
+
+    def testSignaturesTakenBeforeLookup(self):
+        with utils.tempdir() as path:
+            self.assertEqual(None, cache.NegativeLookupCache().directory_signatures([path]))
+            c = cache.NegativeLookupCache(ttl=None, validate_directories=True)
+            signatures = c.directory_signatures([path])
+            write(os.path.join(path, 'a.yaml'), 'a')
+            bump(path)
+            c.record('a', [path], signatures)
+            self.assertFalse(c.is_missing('a', [path]))
+
+
+class TestMissingConfigurationCache(utils.TestCase):
+    def scenario(self, missing):
+        return mock.patch.multiple('mandrel.config.core', MISSING_CONFIGURATION_CACHE=missing)
+
+    def testFindConfigurationFile(self):
+        missing = cache.NegativeLookupCache(ttl=None)
+        paths = util.TransformingList(os.path.realpath)
+        with utils.bootstrap_scenario() as (path, bootstrap_file):
+            paths.append(path)
+            with self.scenario(missing):
+                with mock.patch('mandrel.bootstrap.SEARCH_PATHS', paths):
+                    with mock.patch('mandrel.config.core.find_configuration_files', wraps=mandrel.config.core.find_configuration_files) as find:
+                        for i in xrange(3):
+                            self.assertRaises(mandrel.exception.UnknownConfigurationException,
+                                              lambda: mandrel.config.core.find_configuration_file('foo'))
+                        self.assertEqual(1, find.call_count)
+                        self.assertTrue(mandrel.config.core.is_known_missing('foo'))
+                        self.assertFalse(mandrel.config.core.is_known_missing('bar'))
+
+                        # Changing SEARCH_PATHS invalidates the miss.
+                        write(os.path.join(path, 'foo.yaml'), 'a: b')
+                        paths.append(path)
+                        self.assertFalse(mandrel.config.core.is_known_missing('foo'))
+                        self.assertEqual(os.path.join(path, 'foo.yaml'), mandrel.config.core.find_configuration_file('foo'))
+                        self.assertEqual(2, find.call_count)
+
+    def testFileCreatedDuringSearch(self):
+        missing = cache.NegativeLookupCache(ttl=None, validate_directories=True)
+        with utils.bootstrap_scenario() as (path, bootstrap_file):
+            def search(name):
+                write(os.path.join(path, 'foo.yaml'), 'a: b')
+                bump(path)
+                return iter([])
+            with self.scenario(missing):
+                with mock.patch('mandrel.bootstrap.SEARCH_PATHS', [path]):
+                    with mock.patch('mandrel.config.core.find_configuration_files', side_effect=search):
+                        self.assertRaises(mandrel.exception.UnknownConfigurationException,
+                                          lambda: mandrel.config.core.find_configuration_file('foo'))
+                    self.assertFalse(mandrel.config.core.is_known_missing('foo'))
+                    self.assertEqual(os.path.join(path, 'foo.yaml'), mandrel.config.core.find_configuration_file('foo'))
+
+    def testPlainListSearchPaths(self):
+        missing = cache.NegativeLookupCache(ttl=None)
+        with utils.bootstrap_scenario() as (path, bootstrap_file):
+            with self.scenario(missing):
+                with mock.patch('mandrel.bootstrap.SEARCH_PATHS', [path]):
+                    self.assertRaises(mandrel.exception.UnknownConfigurationException,
+                                      lambda: mandrel.config.core.find_configuration_file('foo'))
+                    self.assertTrue(mandrel.config.core.is_known_missing('foo'))
+                with mock.patch('mandrel.bootstrap.SEARCH_PATHS', [path, path]):
+                    self.assertFalse(mandrel.config.core.is_known_missing('foo'))
+
+    def testForgivingConfiguration(self):
+        class Forgiving(mandrel.config.core.ForgivingConfiguration):
+            NAME = 'forgiven'
+
+        missing = cache.NegativeLookupCache(ttl=None)
+        with utils.bootstrap_scenario() as (path, bootstrap_file):
+            with self.scenario(missing):
+                with mock.patch('mandrel.bootstrap.SEARCH_PATHS', [path]):
+                    with mock.patch('mandrel.exception.UnknownConfigurationException', side_effect=AssertionError('raised')):
+                        self.assertEqual({}, Forgiving.load_configuration())
+                    self.assertEqual((0, 1), (missing.hits, missing.misses))
+                    with mock.patch('mandrel.config.core.get_configuration') as get_configuration:
+                        self.assertEqual({}, Forgiving.load_configuration())
+                        self.assertEqual({}, Forgiving.get_configuration().configuration)
+                        self.assertFalse(get_configuration.called)
+
+class TestMergedConfigurationCache(unittest.TestCase):
+    def testFingerprint(self):
+        with utils.tempdir() as path:
+            a, b = os.path.join(path, 'a.yaml'), os.path.join(path, 'b.yaml')
+            write(a, 'a')
+            write(b, 'b')
+            fingerprint = cache.layer_fingerprint([a, b])
+            self.assertEqual(((a, util.stat_signature(a)), (b, util.stat_signature(b))), fingerprint)
+            self.assertNotEqual(fingerprint, cache.layer_fingerprint([b, a]))
+            bump(b)
+            self.assertNotEqual(fingerprint, cache.layer_fingerprint([a, b]))
+
+    def testLoad(self):
+        with utils.tempdir() as path:
+            a, b = os.path.join(path, 'a.yaml'), os.path.join(path, 'b.yaml')
+            write(a, 'a')
+            write(b, 'b')
+            merger = mock.Mock(side_effect=lambda paths: {'paths': list(paths)})
+            c = cache.MergedConfigurationCache()
+            self.assertEqual({'paths': [a, b]}, c.load('key', [a, b], merger))
+            self.assertEqual({'paths': [a, b]}, c.load('key', iter([a, b]), merger))
+            merger.assert_called_once_with((a, b))
+            self.assertEqual({'paths': [a]}, c.load('key', [a], merger))
+            self.assertEqual({'paths': [b]}, c.load('other', [b], merger))
+            self.assertEqual(3, merger.call_count)
+            c.invalidate('other')
+            self.assertEqual(1, len(c))
+            os.remove(b)
+            self.assertRaises(OSError, lambda: c.load('key', [a, b], merger))
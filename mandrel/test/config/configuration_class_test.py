@@ -1,3 +1,6 @@
+import copy
+import pickle
+import threading
 import unittest
 import mock
 import mandrel.config
@@ -175,3 +178,342 @@ class TestConfigurationClass(utils.TestCase):
         self.assertEqual((('b_foo',), {}), get_configuration.call_args_list[-1])
         self.assertEqual({}, b)
 
+
+
+class CachingConfiguration(mandrel.config.core.Configuration):
+    CACHE_LOOKUPS = True
+
+class TestCachedLookups(utils.TestCase):
+    def deepChain(self, depth):
+        c = CachingConfiguration({'bottom': 'b', 'shadowed': 'bottom'})
+        for i in xrange(depth):
+            c = c.hot_copy()
+        return c
+
+    def testCachedValues(self):
+        c = self.deepChain(10)
+        self.assertEqual('b', c.bottom)
+        with mock.patch.object(CachingConfiguration, '_chained_get') as chained:
+            self.assertEqual('b', c.bottom)
+            self.assertEqual('b', c.chained_get('bottom'))
+            self.assertEqual(0, chained.call_count)
+
+    def testCachedMisses(self):
+        c = self.deepChain(10)
+        self.assertRaises(AttributeError, lambda: c.missing)
+        with mock.patch.object(CachingConfiguration, '_chained_get') as chained:
+            self.assertRaises(AttributeError, lambda: c.missing)
+            self.assertEqual(0, chained.call_count)
+
+    def testInvalidatedByConfigurationSet(self):
+        bottom = CachingConfiguration({'shadowed': 'bottom'})
+        middle = bottom.hot_copy()
+        top = middle.hot_copy()
+        self.assertEqual('bottom', top.shadowed)
+        self.assertRaises(AttributeError, lambda: top.added)
+        middle.shadowed = 'middle'
+        bottom.added = 'added'
+        self.assertEqual('middle', top.shadowed)
+        self.assertEqual('added', top.added)
+        bottom.configuration_set('shadowed', 'ignored')
+        self.assertEqual('middle', top.shadowed)
+
+    def testInvalidatedByInstanceSet(self):
+        a = CachingConfiguration({'foo': 'a'})
+        b = CachingConfiguration({'foo': 'b'})
+        top = CachingConfiguration({}, a)
+        self.assertEqual('a', top.foo)
+        top.instance_set('chain', (b,))
+        self.assertEqual('b', top.foo)
+        b.instance_set('configuration', {'foo': 'replaced'})
+        self.assertEqual('replaced', top.foo)
+
+    def testExplicitInvalidation(self):
+        bottom = CachingConfiguration({'foo': 'a'})
+        top = bottom.hot_copy()
+        self.assertEqual('a', top.foo)
+        bottom.configuration['foo'] = 'direct'
+        self.assertEqual('a', top.foo)
+        mandrel.config.core.invalidate_lookup_caches()
+        self.assertEqual('direct', top.foo)
+
+    def testConcurrentInvalidation(self):
+        # However invalidations from several threads interleave, each stores
+        # a generation never stored before.
+        seen = []
+        lock = threading.Lock()
+        def invalidate():
+            for i in xrange(200):
+                mandrel.config.core.invalidate_lookup_caches()
+                with lock:
+                    seen.append(mandrel.config.core._lookup_generation)
+        threads = [threading.Thread(target=invalidate) for i in xrange(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        generations = []
+        for generation in seen:
+            if not generations or generations[-1] != generation:
+                generations.append(generation)
+        self.assertEqual(len(set(generations)), len(generations))
+
+    def testConstructionKeepsCaches(self):
+        c = self.deepChain(5)
+        self.assertEqual('b', c.bottom)
+        c.hot_copy()
+        CachingConfiguration({})
+        with mock.patch.object(CachingConfiguration, '_chained_get') as chained:
+            self.assertEqual('b', c.bottom)
+            self.assertEqual(0, chained.call_count)
+
+    def testUncachedByDefault(self):
+        c = mandrel.config.core.Configuration({'foo': 'a'})
+        c.foo
+        with mock.patch.object(mandrel.config.core.Configuration, '_chained_get') as chained:
+            c.foo
+            chained.assert_called_once_with('foo')
+
+
+class TestCopies(utils.TestCase):
+    def testCowCopy(self):
+        a = mandrel.config.core.Configuration({'foo': 'bar', 'x': 1}, mock.Mock(name='Chain', baz='bah'))
+        b = a.cow_copy()
+        self.assertIs(type(a), type(b))
+        self.assertEqual(a.chain, b.chain)
+        self.assertEqual('bar', b.foo)
+        self.assertEqual('bah', b.baz)
+        b.foo = 'changed'
+        a.x = 2
+        self.assertEqual('bar', a.foo)
+        self.assertEqual('changed', b.foo)
+        self.assertEqual(1, b.x)
+
+    def testCowCopiesDoNotDeepen(self):
+        c = mandrel.config.core.Configuration({'foo': 'bar'})
+        for i in xrange(50):
+            c = c.cow_copy()
+        self.assertEqual((), c.chain)
+        self.assertEqual('bar', c.foo)
+
+        copies = [c.cow_copy() for i in xrange(3)]
+        self.assertTrue(all(copy.configuration._data is c.configuration._data for copy in copies))
+        copies[0].foo = 'mine'
+        self.assertEqual(['mine', 'bar', 'bar'], [copy.foo for copy in copies])
+        self.assertEqual('bar', c.foo)
+
+    def testCopyModule(self):
+        class Custom(mandrel.config.core.Configuration):
+            pass
+        for cls in (mandrel.config.core.Configuration, mandrel.config.core.CompactConfiguration,
+                    mandrel.config.core.ConcurrentConfiguration, Custom):
+            chain = mandrel.config.core.Configuration({'b': 2})
+            a = cls({'a': [1]}, chain)
+            if cls is Custom:
+                a.instance_set('extra', 'value')
+            shallow = copy.copy(a)
+            self.assertIs(cls, type(shallow))
+            self.assertIs(a.configuration, shallow.configuration)
+            self.assertEqual((chain,), shallow.chain)
+            self.assertEqual(2, shallow.b)
+
+            deep = copy.deepcopy(a)
+            self.assertIs(cls, type(deep))
+            self.assertEqual(a.configuration, deep.configuration)
+            self.assertFalse(a.configuration['a'] is deep.configuration['a'])
+            self.assertEqual(2, deep.b)
+            self.assertFalse(deep.chain[0] is chain)
+            deep.c = 3
+            self.assertRaises(AttributeError, lambda: a.c)
+            if cls is Custom:
+                self.assertEqual('value', deep.extra)
+            if cls is mandrel.config.core.ConcurrentConfiguration:
+                self.assertFalse(deep._write_lock is a._write_lock)
+
+    def testPickle(self):
+        a = mandrel.config.core.Configuration({'a': 1}, mandrel.config.core.Configuration({'b': 2}))
+        b = pickle.loads(pickle.dumps(a, 2))
+        self.assertEqual((1, 2), (b.a, b.b))
+
+    def testSnapshot(self):
+        bottom = mandrel.config.core.Configuration({'a': 'bottom', 'b': 'bottom', 'c': 'bottom'})
+        middle = mandrel.config.core.Configuration({'b': 'middle'}, bottom)
+        top = mandrel.config.core.Configuration({'c': 'top'}, middle)
+        for i in xrange(20):
+            top = top.hot_copy()
+        snap = top.snapshot()
+        self.assertEqual((), snap.chain)
+        self.assertEqual({'a': 'bottom', 'b': 'middle', 'c': 'top'}, snap.configuration)
+        snap.a = 'snap'
+        bottom.b = 'ignored'
+        self.assertEqual('bottom', bottom.a)
+        self.assertEqual('middle', snap.b)
+
+    def testSnapshotStopsAtOpaqueMembers(self):
+        opaque = mock.Mock(name='Opaque')
+        opaque.a = 'opaque'
+        opaque.b = 'opaque'
+        other_class = type('OtherConfiguration', (mandrel.config.core.Configuration,), {})
+        later = mandrel.config.core.Configuration({'b': 'later', 'c': 'later'})
+        first = mandrel.config.core.Configuration({'d': 'first'})
+        inner = mandrel.config.core.Configuration({'e': 'inner'}, opaque, later)
+        top = mandrel.config.core.Configuration({}, first, inner, other_class({'b': 'other'}))
+        snap = top.snapshot()
+        self.assertEqual({'d': 'first', 'e': 'inner'}, snap.configuration)
+        self.assertEqual((opaque, later, top.chain[2]), snap.chain)
+        for key in 'abcde':
+            self.assertEqual(getattr(top, key), getattr(snap, key))
+
+        instance_attributes = mandrel.config.core.Configuration({'a': 'config'})
+        instance_attributes.instance_set('a', 'instance')
+        snap = mandrel.config.core.Configuration({}, instance_attributes).snapshot()
+        self.assertEqual('instance', snap.a)
+
+    def testFreeze(self):
+        bottom = mandrel.config.core.Configuration({'a': [1, 2], 'b': {'c': 'd'}})
+        frozen = bottom.hot_copy().freeze()
+        self.assertIs(type(bottom), type(frozen))
+        self.assertEqual((1, 2), frozen.a)
+        self.assertEqual({'c': 'd'}, frozen.b)
+        self.assertRaises(TypeError, lambda: setattr(frozen, 'a', 3))
+        self.assertRaises(TypeError, lambda: frozen.b.__setitem__('c', 'e'))
+        self.assertEqual([1, 2], bottom.a)
+
+
+class TestCompactConfiguration(utils.TestCase):
+    def testBasics(self):
+        c = mandrel.config.core.CompactConfiguration({'foo': 'bar'})
+        self.assertTrue(isinstance(c, mandrel.config.core.Configuration))
+        self.assertEqual('bar', c.foo)
+        c.foo = 'baz'
+        self.assertEqual('baz', c.configuration['foo'])
+        self.assertEqual(('foo',), tuple(c.configuration))
+
+    def testSharedKeyTables(self):
+        a = mandrel.config.core.CompactConfiguration({'foo': 'a', 'bar': 'a'})
+        b = mandrel.config.core.CompactConfiguration({'foo': 'b', 'bar': 'b'}, a)
+        self.assertIs(mandrel.util.SharedKeyDict, type(a.configuration))
+        self.assertIs(a.configuration._table, b.configuration._table)
+        self.assertEqual('b', b.foo)
+        self.assertEqual((a,), b.chain)
+
+        b.baz = 'b'
+        self.assertEqual('b', b.baz)
+        self.assertRaises(AttributeError, lambda: a.baz)
+
+    def testSharingOptional(self):
+        cls = type('Plain', (mandrel.config.core.CompactConfiguration,), {'__slots__': (), 'SHARE_KEY_TABLES': False})
+        config = {'foo': 'bar'}
+        self.assertIs(config, cls(config).configuration)
+
+        config = mock.Mock()
+        self.assertIs(config, mandrel.config.core.CompactConfiguration(config).configuration)
+
+    def testSlotAttributes(self):
+        c = mandrel.config.core.Configuration({})
+        c.configuration = 'value'
+        c.chain = 'value'
+        self.assertEqual({'configuration': 'value', 'chain': 'value'}, c.configuration)
+        self.assertEqual((), c.chain)
+
+
+class TestConcurrentConfiguration(utils.TestCase):
+    def testBasics(self):
+        original = {'foo': 'bar'}
+        c = mandrel.config.core.ConcurrentConfiguration(original, 'chained')
+        self.assertTrue(isinstance(c.configuration, mandrel.util.FrozenDict))
+        self.assertEqual('bar', c.foo)
+        self.assertEqual(('chained',), c.chain)
+        original['foo'] = 'changed'
+        self.assertEqual('bar', c.foo)
+        self.assertRaises(TypeError, lambda: c.configuration.__setitem__('foo', 'baz'))
+
+        published = c.configuration
+        c.foo = 'baz'
+        self.assertEqual('baz', c.foo)
+        self.assertEqual({'foo': 'bar'}, published)
+        self.assertFalse(published is c.configuration)
+
+        c.configuration_update({'a': 1}, b=2)
+        self.assertEqual({'foo': 'baz', 'a': 1, 'b': 2}, c.configuration)
+        self.assertEqual([], vars(c).keys())
+
+        frozen = mandrel.util.FrozenDict({'x': 1})
+        c.instance_set('configuration', frozen)
+        self.assertIs(frozen, c.configuration)
+
+    def testCopies(self):
+        base = mandrel.config.core.ConcurrentConfiguration({'a': 1, 'b': 1})
+        top = base.hot_copy()
+        top.b = 2
+        self.assertEqual((1, 2), (top.a, top.b))
+        snapshot = top.snapshot()
+        self.assertEqual({'a': 1, 'b': 2}, snapshot.configuration)
+        self.assertEqual((), snapshot.chain)
+        snapshot.a = 3
+        self.assertEqual(1, base.a)
+
+    def testFreeze(self):
+        c = mandrel.config.core.ConcurrentConfiguration({'a': 1})
+        frozen = c.freeze()
+        self.assertEqual(1, frozen.a)
+        self.assertRaises(TypeError, lambda: setattr(frozen, 'q', 1))
+        self.assertRaises(TypeError, lambda: frozen.configuration_update(a=2))
+        self.assertEqual({'a': 1}, frozen.configuration)
+        for duplicate in (copy.copy(frozen), copy.deepcopy(frozen), pickle.loads(pickle.dumps(frozen))):
+            self.assertRaises(TypeError, lambda: setattr(duplicate, 'q', 1))
+        thawed = frozen.snapshot()
+        thawed.q = 1
+        self.assertEqual(1, thawed.q)
+        c.q = 1
+        self.assertEqual(1, c.q)
+
+    def testLookupCacheInvalidation(self):
+        cls = type('Cached', (mandrel.config.core.ConcurrentConfiguration,), {'__slots__': (), 'CACHE_LOOKUPS': True})
+        base = cls({'a': 1})
+        top = cls({}, base)
+        self.assertEqual(1, top.a)
+        base.a = 2
+        self.assertEqual(2, top.a)
+
+    def testReadersNeverSeeTornUpdates(self):
+        c = mandrel.config.core.ConcurrentConfiguration({'first': 0, 'second': 0})
+        stop = threading.Event()
+        failures = []
+        reads = []
+
+        def read():
+            count = 0
+            try:
+                while not stop.is_set():
+                    configuration = c.configuration
+                    if configuration['first'] != configuration['second']:
+                        failures.append(dict(configuration))
+                    c.first
+                    count += 1
+            except Exception, e:
+                failures.append(e)
+            reads.append(count)
+
+        def write(offset):
+            try:
+                for i in xrange(2000):
+                    c.configuration_update(first=i + offset, second=i + offset)
+                    c.other = i
+            except Exception, e:
+                failures.append(e)
+
+        readers = [threading.Thread(target=read) for i in xrange(8)]
+        writers = [threading.Thread(target=write, args=(offset,)) for offset in (0, 10000)]
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        stop.set()
+        for thread in readers:
+            thread.join()
+        self.assertEqual([], failures)
+        self.assertEqual(8, len(reads))
+        self.assertTrue(min(reads) > 0)
+        self.assertEqual(c.configuration['first'], c.configuration['second'])
+        self.assertEqual(1999, c.other)
@@ -0,0 +1,114 @@
+import json
+import mock
+import os
+import sys
+from mandrel.test import utils
+from mandrel import config
+from mandrel.config import registry
+
+def write(dirpath, name, contents):
+    path = os.path.join(dirpath, name)
+    with open(path, 'w') as f:
+        f.write(contents)
+    return path
+
+def own_loaders():
+    return mock.patch('mandrel.config.core.LOADERS', registry.LoaderRegistry(config.core.LOADERS))
+
+def fake_module(name):
+    module = mock.Mock(name=name)
+    module.__name__ = name
+    return module
+
+class TestJsonLoader(utils.TestCase):
+    def testLoad(self):
+        with utils.tempdir() as dirpath:
+            path = write(dirpath, 'a.json', '{"foo": "bar", "blee": [1, 2.5, true, null]}')
+            self.assertEqual({'foo': 'bar', 'blee': [1, 2.5, True, None]}, config.core.read_json_path(path))
+
+    def testBackendSelection(self):
+        with mock.patch.dict(sys.modules, {'orjson': None, 'ujson': None}):
+            self.assertIs(json.loads, config.core.get_json_loads())
+            ujson = sys.modules['ujson'] = fake_module('ujson')
+            self.assertIs(ujson.loads, config.core.get_json_loads())
+            orjson = sys.modules['orjson'] = fake_module('orjson')
+            self.assertIs(orjson.loads, config.core.get_json_loads())
+            with mock.patch('mandrel.config.core.JSON_LOADS') as loads:
+                self.assertIs(loads, config.core.get_json_loads())
+                with utils.tempdir() as dirpath:
+                    path = write(dirpath, 'a.json', '{}')
+                    self.assertIs(loads.return_value, config.core.read_json_path(path))
+                    loads.assert_called_once_with('{}')
+
+class TestTomlLoader(utils.TestCase):
+    def testBackendSelection(self):
+        with mock.patch.dict(sys.modules, {'tomllib': None, 'tomli': None, 'toml': None}):
+            self.assertEqual(None, config.core.get_toml_module())
+            with utils.tempdir() as dirpath:
+                path = write(dirpath, 'a.toml', 'foo = "bar"\n')
+                self.assertRaises(ImportError, lambda: config.core.read_toml_path(path))
+                for name in ('toml', 'tomli', 'tomllib'):
+                    module = sys.modules[name] = fake_module(name)
+                    self.assertIs(module, config.core.get_toml_module())
+                    self.assertIs(module.load.return_value, config.core.read_toml_path(path))
+                    self.assertEqual(name == 'toml' and 'r' or 'rb', module.load.call_args[0][0].mode)
+
+    def testLoad(self):
+        toml = config.core.get_toml_module()
+        if toml is None:
+            return
+        with utils.tempdir() as dirpath:
+            path = write(dirpath, 'a.toml', 'foo = "bar"\n[blee]\nblah = [1, 2]\n')
+            self.assertEqual({'foo': 'bar', 'blee': {'blah': [1, 2]}}, config.core.read_toml_path(path))
+
+class TestIniLoader(utils.TestCase):
+    def testLoad(self):
+        with utils.tempdir() as dirpath:
+            path = write(dirpath, 'a.ini', '[DEFAULT]\nshared = yes\n\n[first]\nCamelCase = %(shared)s\n\n[second]\nfoo = bar\n')
+            self.assertEqual({'first': {'CamelCase': '%(shared)s', 'shared': 'yes'},
+                              'second': {'foo': 'bar', 'shared': 'yes'}},
+                             config.core.read_ini_path(path))
+
+    def testInvalid(self):
+        with utils.tempdir() as dirpath:
+            path = write(dirpath, 'a.ini', 'no section header\n')
+            self.assertRaises(Exception, lambda: config.core.read_ini_path(path))
+
+class TestEnableFormats(utils.TestCase):
+    def testDefaultIsYamlOnly(self):
+        self.assertEqual(['foo.yaml'], config.core.get_possible_basenames('foo'))
+
+    def testEnableAll(self):
+        with mock.patch.dict(sys.modules, {'tomllib': fake_module('tomllib')}):
+            with own_loaders():
+                self.assertEqual(['json', 'toml', 'ini'], config.core.enable_formats())
+                self.assertEqual([], config.core.enable_formats())
+                self.assertEqual(['foo.yaml', 'foo.json', 'foo.toml', 'foo.ini'],
+                                 config.core.get_possible_basenames('foo'))
+                for extension, loader in config.core.OPTIONAL_LOADERS:
+                    self.assertIs(loader, config.core.get_loader('a.%s' % extension))
+
+    def testEnableSome(self):
+        with own_loaders():
+            self.assertEqual(['ini'], config.core.enable_formats('ini'))
+            self.assertEqual(['foo.yaml', 'foo.ini'], config.core.get_possible_basenames('foo'))
+            self.assertRaises(ValueError, lambda: config.core.enable_formats('xml'))
+
+    def testTomlRequiresParser(self):
+        with mock.patch.dict(sys.modules, {'tomllib': None, 'tomli': None, 'toml': None}):
+            with own_loaders():
+                self.assertEqual(['json', 'ini'], config.core.enable_formats())
+
+    def testMissingParserIsNotMissingConfiguration(self):
+        class Forgiving(config.core.ForgivingConfiguration):
+            NAME = 'foo'
+        with mock.patch.dict(sys.modules, {'tomllib': None, 'tomli': None, 'toml': None}):
+            with utils.bootstrap_scenario() as (path, bootstrap_file):
+                high = os.path.join(path, 'high')
+                os.mkdir(high)
+                write(high, 'foo.toml', 'a = 1\n')
+                write(path, 'foo.yaml', 'a: 2\n')
+                with mock.patch('mandrel.bootstrap.SEARCH_PATHS', [high, path]):
+                    with own_loaders():
+                        config.core.LOADERS.append(('toml', config.core.read_toml_path))
+                        self.assertRaises(ImportError, Forgiving.load_configuration)
@@ -0,0 +1,174 @@
+import mock
+import threading
+import unittest
+import mandrel.config
+from mandrel import exception
+from mandrel.config import inflight
+
+class Blocker(object):
+    """A load function that blocks until released, counting its calls."""
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, *args):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        if isinstance(self.value, Exception):
+            raise self.value
+        return self.value
+
+class TestFuture(unittest.TestCase):
+    def testResult(self):
+        f = inflight.Future()
+        self.assertFalse(f.done())
+        self.assertRaises(exception.TimeoutException, lambda: f.result(0.01))
+        f.set_result('foo')
+        self.assertTrue(f.done())
+        self.assertEqual('foo', f.result())
+        self.assertEqual(None, f.exception())
+
+    def testException(self):
+        f = inflight.Future()
+        try:
+            raise KeyError('foo')
+        except KeyError:
+            f.set_exception()
+        self.assertRaises(KeyError, f.result)
+        self.assertTrue(isinstance(f.exception(), KeyError))
+
+    def testCallbacks(self):
+        f = inflight.Future()
+        seen = []
+        f.add_done_callback(seen.append)
+        self.assertEqual([], seen)
+        f.set_result(1)
+        self.assertEqual([f], seen)
+        f.add_done_callback(seen.append)
+        self.assertEqual([f, f], seen)
+
+    def testThen(self):
+        f = inflight.Future()
+        doubled = f.then(lambda v: v * 2)
+        failed = f.then(lambda v: v.nope)
+        f.set_result(3)
+        self.assertEqual(6, doubled.result())
+        self.assertRaises(AttributeError, failed.result)
+
+        g = inflight.Future()
+        derived = g.then(lambda v: v)
+        try:
+            raise ValueError
+        except ValueError:
+            g.set_exception()
+        self.assertRaises(ValueError, derived.result)
+
+    def testRunInBackground(self):
+        self.assertEqual(5, inflight.run_in_background(lambda a, b: a + b, 2, 3).result(5))
+        self.assertRaises(ZeroDivisionError, inflight.run_in_background(lambda: 1 / 0).result, 5)
+
+class TestInFlightLoads(unittest.TestCase):
+    def testConcurrentRequestsShareLoad(self):
+        loads = inflight.InFlightLoads()
+        blocker = Blocker({'a': [1]})
+        first = loads.submit('foo', blocker)
+        blocker.started.wait(5)
+        second = loads.submit('foo', blocker)
+        other = loads.submit('bar', lambda: 'bar')
+        self.assertEqual('bar', other.result(5))
+        blocker.release.set()
+        a, b = first.result(5), second.result(5)
+        self.assertEqual(1, blocker.calls)
+        self.assertEqual({'a': [1]}, a)
+        self.assertEqual(a, b)
+        self.assertFalse(a is b)
+        self.assertFalse(a['a'] is b['a'])
+
+    def testJoinersCopiedBeforeFirstResult(self):
+        loads = inflight.InFlightLoads()
+        blocker = Blocker({'a': [1]})
+        first = loads.submit('foo', blocker)
+        blocker.started.wait(5)
+        second = loads.submit('foo', blocker)
+        def mutate(future):
+            future.result()['a'].append(2)
+        first.add_done_callback(mutate)
+        blocker.release.set()
+        self.assertEqual({'a': [1, 2]}, first.result(5))
+        self.assertEqual({'a': [1]}, second.result(5))
+
+    def testLoadsRestartAfterCompletion(self):
+        loads = inflight.InFlightLoads()
+        blocker = Blocker('value')
+        blocker.release.set()
+        self.assertEqual('value', loads.submit('foo', blocker).result(5))
+        self.assertEqual('value', loads.submit('foo', blocker).result(5))
+        self.assertEqual(2, blocker.calls)
+        self.assertEqual(0, len(loads))
+
+    def testFailuresPropagateToAll(self):
+        loads = inflight.InFlightLoads()
+        blocker = Blocker(exception.UnknownConfigurationException('nope'))
+        first = loads.submit('foo', blocker)
+        blocker.started.wait(5)
+        second = loads.submit('foo', blocker)
+        blocker.release.set()
+        self.assertRaises(exception.UnknownConfigurationException, first.result, 5)
+        self.assertRaises(exception.UnknownConfigurationException, second.result, 5)
+        self.assertEqual(1, blocker.calls)
+
+class TestAsynchronousConfigurationAPI(unittest.TestCase):
+    @mock.patch('mandrel.config.core.get_configuration')
+    def testAgetConfiguration(self, get_configuration):
+        blocker = Blocker({'foo': 'bar'})
+        get_configuration.side_effect = blocker
+        first = mandrel.config.aget_configuration('thing')
+        blocker.started.wait(5)
+        second = mandrel.config.aget_configuration('thing')
+        blocker.release.set()
+        self.assertEqual({'foo': 'bar'}, first.result(5))
+        self.assertEqual({'foo': 'bar'}, second.result(5))
+        get_configuration.assert_called_once_with('thing')
+
+    @mock.patch('mandrel.config.core.get_configuration')
+    def testAgetConfigurationFailure(self, get_configuration):
+        get_configuration.side_effect = exception.UnknownConfigurationException
+        future = mandrel.config.aget_configuration('thing')
+        self.assertRaises(exception.UnknownConfigurationException, future.result, 5)
+
+    @mock.patch('mandrel.config.core.find_configuration_files')
+    def testAfindConfigurationFiles(self, find_configuration_files):
+        find_configuration_files.side_effect = lambda name: iter(['/a/%s.yaml' % name, '/b/%s.yaml' % name])
+        self.assertEqual(['/a/foo.yaml', '/b/foo.yaml'], mandrel.config.afind_configuration_files('foo').result(5))
+        find_configuration_files.assert_called_once_with('foo')
+
+    def testConfigurationAgetConfiguration(self):
+        blocker = Blocker({'foo': 'bar'})
+        chain = mock.Mock(name='ChainMember')
+
+        class Thing(mandrel.config.Configuration):
+            NAME = 'thing'
+            load_configuration = classmethod(lambda cls: blocker())
+
+        first = Thing.aget_configuration()
+        blocker.started.wait(5)
+        second = Thing.aget_configuration(chain)
+        blocker.release.set()
+        a, b = first.result(5), second.result(5)
+        self.assertEqual(1, blocker.calls)
+        self.assertTrue(isinstance(a, Thing))
+        self.assertEqual('bar', a.foo)
+        self.assertEqual('bar', b.foo)
+        self.assertEqual((), a.chain)
+        self.assertEqual((chain,), b.chain)
+        self.assertFalse(a.configuration is b.configuration)
+
+        class Forgiving(mandrel.config.ForgivingConfiguration):
+            NAME = 'thing'
+
+        with mock.patch('mandrel.config.core.get_configuration') as get_configuration:
+            get_configuration.side_effect = exception.UnknownConfigurationException
+            self.assertEqual({}, Forgiving.aget_configuration().result(5).configuration)
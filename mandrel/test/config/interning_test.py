@@ -0,0 +1,85 @@
+import mock
+import os
+import unittest
+import mandrel.config
+from mandrel import util
+from mandrel.config import cache
+from mandrel.config import interning
+from mandrel.test import utils
+
+def document():
+    # Builds equal but distinct objects on every call, as parsing would.
+    return {''.join(['na', 'me']): ''.join(['ser', 'vice']),
+            'logging': {'level': ''.join(['DE', 'BUG']), 'handlers': ['con' + 'sole', 'file']},
+            'ports': set([80, 443]),
+            'flags': [1, 1.0, True]}
+
+class TestCanonicalizer(unittest.TestCase):
+    def testCanonicalize(self):
+        c = interning.Canonicalizer()
+        first = c.canonicalize(document())
+        second = c.canonicalize(document())
+        self.assertEqual(util.freeze(document()), first)
+        self.assertEqual(first, second)
+        self.assertEqual(dict, type(first))
+        self.assertFalse(first is second)
+        self.assertTrue(isinstance(first['logging'], util.FrozenDict))
+        self.assertEqual(('console', 'file'), first['logging']['handlers'])
+        self.assertEqual(frozenset([80, 443]), first['ports'])
+        for key in first:
+            self.assertTrue(first[key] is second[key])
+            self.assertTrue([k for k in second if k is key])
+        # Equal but differently typed scalars stay distinct.
+        self.assertEqual([int, float, bool], [type(v) for v in second['flags']])
+
+    def testCounters(self):
+        c = interning.Canonicalizer()
+        c.canonicalize(document())
+        self.assertEqual(0, c.shared_subtrees)
+        self.assertEqual(0, c.bytes_saved)
+        c.canonicalize(document())
+        report = c.report()
+        self.assertEqual(c.strings, report['strings'])
+        self.assertTrue(report['shared_strings'] > 0)
+        self.assertEqual(4, report['shared_subtrees'])
+        self.assertTrue(report['bytes_saved'] > 0)
+        c.clear()
+        self.assertEqual(dict.fromkeys(report, 0), c.report())
+
+    def testSharedSubtreesAcrossKeys(self):
+        c = interning.Canonicalizer()
+        value = c.canonicalize({'a': {'x': [1, 2]}, 'b': {'x': [1, 2]}, 'c': {'x': [1, 2.0]}})
+        self.assertTrue(value['a'] is value['b'])
+        self.assertFalse(value['a'] is value['c'])
+
+    def testUnhashableLeaves(self):
+        class Leaf(object):
+            __hash__ = None
+        c = interning.Canonicalizer()
+        leaf = Leaf()
+        value = c.canonicalize({'a': [leaf], 'b': [leaf]})
+        self.assertEqual((leaf,), value['a'])
+        self.assertFalse(value['a'] is value['b'])
+
+    def testScalars(self):
+        c = interning.Canonicalizer()
+        self.assertEqual(1, c.canonicalize(1))
+        self.assertEqual(u'caf\xe9', c.canonicalize(u'caf\xe9'))
+        self.assertEqual(unicode, type(c.canonicalize(u'a')))
+        self.assertEqual(str, type(c.canonicalize('a')))
+
+class TestLoadConfigurationFile(utils.TestCase):
+    def testCanonicalizedBeforeCaching(self):
+        c = interning.Canonicalizer()
+        configuration_cache = cache.ConfigurationCache(read_only=True)
+        with utils.tempdir() as path:
+            for name in ('a', 'b'):
+                with open(os.path.join(path, '%s.yaml' % name), 'w') as f:
+                    f.write('{"logging": {"level": "DEBUG"}, "name": "%s"}' % name)
+            with mock.patch.multiple('mandrel.config.core', CANONICALIZER=c, CONFIGURATION_CACHE=configuration_cache):
+                a = mandrel.config.load_configuration_file(os.path.join(path, 'a.yaml'))
+                b = mandrel.config.load_configuration_file(os.path.join(path, 'b.yaml'))
+                self.assertTrue(a['logging'] is b['logging'])
+                self.assertEqual(1, c.shared_subtrees)
+                self.assertTrue(a is mandrel.config.load_configuration_file(os.path.join(path, 'a.yaml')))
+                self.assertEqual(1, c.shared_subtrees)
@@ -0,0 +1,106 @@
+import mock
+import os
+import unittest
+import mandrel.config
+from mandrel import exception
+from mandrel import util
+from mandrel.config import cache
+from mandrel.config import layered
+from mandrel.test import utils
+
+def write(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+def bump(path, offset=10):
+    st = os.stat(path)
+    os.utime(path, (st.st_atime, st.st_mtime + offset))
+
+class TestMerger(unittest.TestCase):
+    LOW = {'a': 1, 'b': {'c': 2, 'd': [1, 2]}, 'e': [1, 2], 'f': {'g': 3}}
+    HIGH = {'a': 10, 'b': {'d': [2, 3], 'h': 4}, 'f': 'flat'}
+
+    def testDefaults(self):
+        low = util.freeze(self.LOW)
+        merged = layered.Merger().merge_layers([self.HIGH, low])
+        self.assertEqual({'a': 10, 'b': {'c': 2, 'd': [2, 3], 'h': 4}, 'e': (1, 2), 'f': 'flat'}, merged)
+        self.assertEqual(util.freeze(self.LOW), low)
+        self.assertEqual({'a': 10, 'b': {'d': [2, 3], 'h': 4}, 'f': 'flat'}, self.HIGH)
+
+    def testListStrategies(self):
+        for strategy, expected in (('replace', [2, 3]),
+                                   ('append', [1, 2, 2, 3]),
+                                   ('prepend', [2, 3, 1, 2]),
+                                   ('unique', [1, 2, 3]),
+                                   (lambda low, high: 'custom', 'custom')):
+            merged = layered.Merger(list_strategy=strategy).merge_layers([self.HIGH, self.LOW])
+            self.assertEqual(expected, merged['b']['d'])
+
+    def testDictStrategies(self):
+        self.assertEqual(self.HIGH, layered.Merger(dict_strategy='replace').merge_layers([self.HIGH, self.LOW]))
+        merged = layered.Merger(dict_strategy=lambda low, high: sorted(high)).merge_layers([self.HIGH, self.LOW])
+        self.assertEqual(['a', 'b', 'f'], merged)
+
+    def testThreeLayers(self):
+        merged = layered.Merger('append').merge_layers([{'a': [3]}, {'a': [2], 'b': 2}, {'a': [1], 'b': 1, 'c': 1}])
+        self.assertEqual({'a': [1, 2, 3], 'b': 2, 'c': 1}, merged)
+
+    def testEdgeCases(self):
+        self.assertEqual(None, layered.Merger().merge_layers([]))
+        self.assertEqual({'a': 1}, layered.Merger().merge_layers([{'a': 1}]))
+        self.assertRaises(ValueError, lambda: layered.Merger(list_strategy='bogus'))
+        self.assertRaises(ValueError, lambda: layered.Merger(dict_strategy='bogus'))
+
+class TestGetMergedConfiguration(utils.TestCase):
+    def layers(self, path):
+        low, high = os.path.join(path, 'low'), os.path.join(path, 'high')
+        os.mkdir(low)
+        os.mkdir(high)
+        write(os.path.join(low, 'foo.yaml'), 'a: 1\nb: {c: 2, d: [1]}\n')
+        write(os.path.join(high, 'foo.yaml'), '{"b": {"d": [2]}}')
+        return mock.patch('mandrel.bootstrap.SEARCH_PATHS', [high, low])
+
+    def testMerge(self):
+        with utils.bootstrap_scenario() as (path, bootstrap_file):
+            with self.layers(path):
+                with mock.patch('mandrel.config.core.MERGED_CONFIGURATION_CACHE', None):
+                    self.assertEqual({'a': 1, 'b': {'c': 2, 'd': [2]}},
+                                     mandrel.config.get_merged_configuration('foo'))
+                    self.assertEqual({'a': 1, 'b': {'c': 2, 'd': [1, 2]}},
+                                     mandrel.config.get_merged_configuration('foo', list_strategy='append'))
+                    self.assertRaises(exception.UnknownConfigurationException,
+                                      lambda: mandrel.config.get_merged_configuration('bar'))
+                    self.assertRaises(ValueError,
+                                      lambda: mandrel.config.get_merged_configuration('foo', dict_strategy='bogus'))
+
+    def testCache(self):
+        merged_cache = cache.MergedConfigurationCache()
+        with utils.bootstrap_scenario() as (path, bootstrap_file):
+            with self.layers(path):
+                with mock.patch('mandrel.config.core.MERGED_CONFIGURATION_CACHE', merged_cache):
+                    with mock.patch('mandrel.config.core.load_configuration_file',
+                                    wraps=mandrel.config.core.load_configuration_file) as load:
+                        first = mandrel.config.get_merged_configuration('foo')
+                        first['b']['d'].append('poisoned')
+                        self.assertEqual({'a': 1, 'b': {'c': 2, 'd': [2]}},
+                                         mandrel.config.get_merged_configuration('foo'))
+                        self.assertEqual(2, load.call_count)
+                        self.assertEqual((1, 1), (merged_cache.hits, merged_cache.misses))
+
+                        # Strategies are part of the key.
+                        mandrel.config.get_merged_configuration('foo', list_strategy='append')
+                        self.assertEqual(4, load.call_count)
+
+                        # Modifying any layer invalidates the merge.
+                        low = os.path.join(path, 'low', 'foo.yaml')
+                        write(low, 'a: 3\n')
+                        bump(low)
+                        self.assertEqual({'a': 3, 'b': {'d': [2]}},
+                                         mandrel.config.get_merged_configuration('foo'))
+                        self.assertEqual(6, load.call_count)
+
+                        # So does adding one.
+                        write(os.path.join(path, 'high', 'foo.yaml'), 'a: 4\n')
+                        self.assertEqual({'a': 4},
+                                         mandrel.config.get_merged_configuration('foo'))
+                        self.assertEqual(8, load.call_count)
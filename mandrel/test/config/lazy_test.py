@@ -0,0 +1,166 @@
+import copy
+import datetime
+import mock
+import os
+import unittest
+import yaml
+import mandrel.config
+from mandrel import exception
+from mandrel import util
+from mandrel.config import cache
+from mandrel.config import interning
+from mandrel.config import lazy
+from mandrel.test import utils
+
+def document():
+    return {'small': {'a': 1},
+            'big': dict(('key%d' % i, {'host': 'host%d' % i, 'ports': [i, i + 1]}) for i in xrange(100)),
+            'scalar': 'value',
+            'list': range(200)}
+
+def write_yaml(path, value):
+    with open(path, 'w') as f:
+        yaml.safe_dump(value, f)
+
+def bump(path, offset=10):
+    st = os.stat(path)
+    os.utime(path, (st.st_atime, st.st_mtime + offset))
+
+class TestLazyDocuments(unittest.TestCase):
+    def scenario(self, path, value=None):
+        source = os.path.join(path, 'doc.yaml')
+        write_yaml(source, document() if value is None else value)
+        return source
+
+    def testLoadBuildsIndexedDocument(self):
+        with utils.tempdir() as path:
+            source = self.scenario(path)
+            loader = mock.Mock(side_effect=mandrel.config.core.read_yaml_path)
+            doc = lazy.load(source, loader)
+            self.assertTrue(isinstance(doc, lazy.LazyMapping))
+            self.assertTrue(os.path.isfile(lazy.lazy_path(source)))
+            self.assertEqual(document(), doc)
+            self.assertEqual(document(), doc.materialize())
+            again = lazy.load(source, loader)
+            loader.assert_called_once_with(source)
+            self.assertEqual(document(), again)
+
+    def testDecodesOnlyTouchedKeys(self):
+        with utils.tempdir() as path:
+            source = self.scenario(path)
+            doc = lazy.load(source, mandrel.config.core.read_yaml_path)
+            self.assertEqual(set(), doc.decoded_keys())
+            self.assertEqual('value', doc['scalar'])
+            self.assertEqual(set(['scalar']), doc.decoded_keys())
+            big = doc['big']
+            self.assertTrue(isinstance(big, lazy.LazyMapping))
+            self.assertEqual({'host': 'host7', 'ports': [7, 8]}, big['key7'])
+            self.assertEqual(set(['key7']), big.decoded_keys())
+            self.assertTrue(big is doc['big'])
+            self.assertEqual({'a': 1}, doc['small'])
+            self.assertEqual(dict, type(doc['small']))
+
+    def testMutationStaysLocal(self):
+        with utils.tempdir() as path:
+            source = self.scenario(path)
+            doc = lazy.load(source, mandrel.config.core.read_yaml_path)
+            doc['scalar'] = 'changed'
+            doc['added'] = 1
+            del doc['list']
+            self.assertEqual('changed', doc['scalar'])
+            self.assertEqual(1, doc['added'])
+            self.assertFalse('list' in doc)
+            self.assertRaises(KeyError, lambda: doc['list'])
+            self.assertRaises(KeyError, lambda: doc.__delitem__('list'))
+            self.assertEqual(set(['small', 'big', 'scalar', 'added']), set(doc))
+            self.assertEqual(4, len(doc))
+            doc['list'] = []
+            self.assertEqual([], doc['list'])
+            self.assertEqual(document(), lazy.load(source, mandrel.config.core.read_yaml_path))
+
+    def testCopies(self):
+        with utils.tempdir() as path:
+            source = self.scenario(path)
+            doc = lazy.load(source, mandrel.config.core.read_yaml_path)
+            deep = copy.deepcopy(doc)
+            self.assertEqual(dict, type(deep))
+            self.assertEqual(dict, type(deep['big']))
+            self.assertEqual(document(), deep)
+            self.assertEqual(dict, type(copy.copy(doc)))
+
+    def testRebuildsOnChange(self):
+        with utils.tempdir() as path:
+            source = self.scenario(path)
+            lazy.load(source, mandrel.config.core.read_yaml_path)
+            value = document()
+            value['scalar'] = 'updated'
+            write_yaml(source, value)
+            bump(source)
+            self.assertEqual('updated', lazy.load(source, mandrel.config.core.read_yaml_path)['scalar'])
+
+    def testSmallAndScalarDocuments(self):
+        with utils.tempdir() as path:
+            source = self.scenario(path, {'a': 1})
+            self.assertEqual({'a': 1}, lazy.load(source, mandrel.config.core.read_yaml_path))
+            source = self.scenario(path, [1, 2, 3])
+            bump(source, 20)
+            self.assertEqual([1, 2, 3], lazy.load(source, mandrel.config.core.read_yaml_path))
+
+    def testFallsBackToEagerLoading(self):
+        with utils.tempdir() as path:
+            source = self.scenario(path)
+            value = {'when': datetime.date(2012, 1, 1)}
+            self.assertTrue(value is lazy.load(source, mock.Mock(return_value=value)))
+            self.assertFalse(os.path.exists(lazy.lazy_path(source)))
+
+            with open(lazy.lazy_path(source), 'wb') as f:
+                f.write('garbage')
+            self.assertEqual(document(), lazy.load(source, mandrel.config.core.read_yaml_path))
+
+    def testRebuildsTruncatedSidecar(self):
+        for contents in ('', 'mla'):
+            with utils.tempdir() as path:
+                source = self.scenario(path)
+                with open(lazy.lazy_path(source), 'wb') as f:
+                    f.write(contents)
+                self.assertEqual(None, lazy.map_document(lazy.lazy_path(source)))
+                doc = lazy.load(source, mandrel.config.core.read_yaml_path)
+                self.assertTrue(isinstance(doc, lazy.LazyMapping))
+                self.assertEqual(document(), doc)
+                self.assertTrue(os.path.getsize(lazy.lazy_path(source)) > len(contents))
+
+    def testFrozenSources(self):
+        settings = ({'CANONICALIZER': interning.Canonicalizer()},
+                    {'CONFIGURATION_CACHE': cache.ConfigurationCache(read_only=True)})
+        for setting in settings:
+            with utils.tempdir() as path:
+                source = self.scenario(path)
+                with mock.patch.multiple('mandrel.config.core', **setting):
+                    doc = lazy.load_configuration_file(source)
+                    self.assertTrue(isinstance(doc, lazy.LazyMapping))
+                    self.assertEqual(util.freeze(document()), doc.materialize())
+                    self.assertEqual(dict, type(doc['small']))
+
+    def testLazyConfiguration(self):
+        with utils.bootstrap_scenario() as spec:
+            utils.refresh_bootstrapper()
+            write_yaml(os.path.join(spec[0], 'catalog.yaml'), document())
+
+            class Catalog(lazy.LazyConfiguration):
+                NAME = 'catalog'
+
+            c = Catalog.get_configuration()
+            self.assertTrue(isinstance(c.configuration, lazy.LazyMapping))
+            self.assertEqual('host3', c.big['key3']['host'])
+            self.assertEqual(set(['big']), c.configuration.decoded_keys())
+            c.scalar = 'local'
+            self.assertEqual('local', c.scalar)
+
+            class Missing(lazy.LazyConfiguration):
+                NAME = 'missing'
+
+            class ForgivingMissing(mandrel.config.ForgivingConfiguration, lazy.LazyConfiguration):
+                NAME = 'missing'
+
+            self.assertRaises(exception.UnknownConfigurationException, Missing.get_configuration)
+            self.assertEqual({}, ForgivingMissing.get_configuration().configuration)
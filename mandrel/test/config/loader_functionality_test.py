@@ -19,7 +19,8 @@ def scenario(func):
 class TestConfigLoaderFunctionality(unittest.TestCase):
     @scenario
     def testDefaultLoadersList(self):
-        self.assertEqual([('yaml', mandrel.config.core.read_yaml_path)], mandrel.config.core.LOADERS)
+        self.assertEqual([('yaml', mandrel.config.core.read_yaml_path)],
+                         mandrel.config.core.LOADERS)
 
     @scenario
     def testGetPossibleBasenames(self):
@@ -57,6 +58,19 @@ class TestConfigLoaderFunctionality(unittest.TestCase):
                 find_files.assert_called_once_with(get_possible_basenames.return_value, mandrel.bootstrap.SEARCH_PATHS)
                 self.assertEqual(find_files.return_value, result)
 
+    @scenario
+    def testFindConfigurationFilesWithIndex(self):
+        with mock.patch('mandrel.util.find_files') as find_files:
+            with mock.patch('mandrel.config.core.get_possible_basenames') as get_possible_basenames:
+                index = mock.Mock(name='DirectoryIndex')
+                mandrel.config.core.SEARCH_PATH_INDEX = index
+                mandrel.bootstrap.SEARCH_PATHS = mock.Mock()
+                name = mock.Mock(name='FileBase')
+                result = mandrel.config.core.find_configuration_files(name)
+                index.find_files.assert_called_once_with(get_possible_basenames.return_value, mandrel.bootstrap.SEARCH_PATHS)
+                self.assertEqual(0, len(find_files.call_args_list))
+                self.assertEqual(index.find_files.return_value, result)
+
     @scenario
     def testFindConfigurationFileWithMatch(self):
         with mock.patch('mandrel.config.core.find_configuration_files') as find_configuration_files:
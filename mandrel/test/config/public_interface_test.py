@@ -5,7 +5,13 @@ PUBLIC_NAMES = ['find_configuration_files',
                 'find_configuration_file',
                 'load_configuration_file',
                 'get_configuration',
+                'get_merged_configuration',
+                'get_configurations',
+                'afind_configuration_files',
+                'aget_configuration',
                 'Configuration',
+                'CompactConfiguration',
+                'ConcurrentConfiguration',
                 'ForgivingConfiguration']
 
 class TestPublicInterface(unittest.TestCase):
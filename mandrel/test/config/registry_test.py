@@ -0,0 +1,114 @@
+import mock
+import threading
+import mandrel.config
+from mandrel.config import registry
+from mandrel.test import utils
+
+def loaders(*extensions):
+    return [(extension, mock.Mock(name='Loader_%s' % extension)) for extension in extensions]
+
+class TestLoaderRegistry(utils.TestCase):
+    def testListBehavior(self):
+        pairs = loaders('yaml', 'json', 'ini')
+        r = registry.LoaderRegistry(pairs)
+        self.assertEqual(pairs, r)
+        self.assertEqual(r, pairs)
+        self.assertFalse(r != pairs)
+        self.assertNotEqual(pairs[:2], r)
+        self.assertEqual(registry.LoaderRegistry(pairs), r)
+        self.assertEqual(3, len(r))
+        self.assertEqual(pairs[1], r[1])
+        self.assertEqual(pairs, list(r))
+        self.assertTrue(pairs[2] in r)
+        self.assertEqual(2, r.index(pairs[2]))
+
+        r.reverse()
+        self.assertEqual(pairs[::-1], r)
+        r[:] = pairs
+        self.assertEqual(pairs, r)
+        self.assertEqual(pairs[2], r.pop())
+        r.append(pairs[2])
+        r.remove(pairs[0])
+        r.insert(0, pairs[0])
+        del r[1]
+        self.assertEqual([pairs[0], pairs[2]], r)
+        r.extend([pairs[1]])
+        r[1] = pairs[2]
+        self.assertEqual([pairs[0], pairs[2], pairs[1]], r)
+        del r[0:2]
+        self.assertEqual([pairs[1]], r)
+
+    def testConcurrentRegistration(self):
+        r = registry.LoaderRegistry(loaders('yaml'))
+        added = loaders('new')[0]
+        threads = []
+
+        class Loaders(list):
+            # Registers a loader from another thread while the table is built.
+            def __iter__(self):
+                if not threads:
+                    thread = threading.Thread(target=r.register, args=added)
+                    threads.append(thread)
+                    thread.start()
+                    thread.join(0.2)
+                return list.__iter__(self)
+
+        r._loaders = Loaders(r._loaders)
+        self.assertEqual(None, r.get_loader('foo.new'))
+        threads[0].join()
+        self.assertIs(added[1], r.get_loader('foo.new'))
+
+    def testGetLoader(self):
+        pairs = loaders('yaml', 'json', 'gz', 'json.gz')
+        r = registry.LoaderRegistry(pairs)
+        self.assertIs(pairs[0][1], r.get_loader('/etc/foo.yaml'))
+        self.assertIs(pairs[1][1], r.get_loader('foo.bar.json'))
+        self.assertIs(pairs[2][1], r.get_loader('foo.json.gz'))
+        self.assertEqual(None, r.get_loader('foo.txt'))
+        self.assertEqual(None, r.get_loader('yaml'))
+        self.assertEqual(None, r.get_loader('foo.yaml/bar'))
+
+        r.register('json.gz', mock.Mock(name='Priority'), priority=0)
+        self.assertIs(r[0][1], r.get_loader('foo.json.gz'))
+        self.assertIs(pairs[2][1], r.get_loader('foo.gz'))
+        r.unregister('json.gz')
+        self.assertEqual(pairs[:3], r)
+        self.assertIs(pairs[2][1], r.get_loader('foo.json.gz'))
+
+    def testGetPossibleBasenames(self):
+        pairs = loaders('yaml', 'json')
+        r = registry.LoaderRegistry(pairs)
+        self.assertEqual(['foo.yaml', 'foo.json'], r.get_possible_basenames('foo'))
+        self.assertEqual(['foo.json'], r.get_possible_basenames('foo.json'))
+        result = r.get_possible_basenames('foo')
+        result.append('mutated')
+        self.assertEqual(['foo.yaml', 'foo.json'], r.get_possible_basenames('foo'))
+
+        with mock.patch.object(r, '_match') as match:
+            self.assertEqual(['foo.yaml', 'foo.json'], r.get_possible_basenames('foo'))
+            self.assertFalse(match.called)
+
+        r.register('ini', mock.Mock(name='Ini'))
+        self.assertEqual(['foo.yaml', 'foo.json', 'foo.ini'], r.get_possible_basenames('foo'))
+        r.reverse()
+        self.assertEqual(['foo.ini', 'foo.json', 'foo.yaml'], r.get_possible_basenames('foo'))
+        r[0] = ('yml', r[0][1])
+        self.assertEqual(['foo.yml', 'foo.json', 'foo.yaml'], r.get_possible_basenames('foo'))
+
+    def testCachedNamesBounded(self):
+        r = registry.LoaderRegistry(loaders('yaml'))
+        with mock.patch('mandrel.config.registry.MAX_CACHED_NAMES', 3):
+            for name in 'abcde':
+                r.get_possible_basenames(name)
+                self.assertTrue(len(r._basenames) <= 3)
+
+    def testCoreUsesRegistry(self):
+        self.assertTrue(isinstance(mandrel.config.core.LOADERS, registry.LoaderRegistry))
+        registered = mock.Mock(name='Registered')
+        mandrel.config.core.LOADERS.register('registered', registered)
+        try:
+            self.assertIs(registered, mandrel.config.core.get_loader('foo.registered'))
+            self.assertEqual('foo.registered', mandrel.config.core.get_possible_basenames('foo')[-1])
+        finally:
+            mandrel.config.core.LOADERS.unregister('registered')
+        self.assertFalse('foo.registered' in mandrel.config.core.get_possible_basenames('foo'))
@@ -0,0 +1,147 @@
+import mock
+import multiprocessing
+import os
+import mandrel.config
+from mandrel import util
+from mandrel.config import cache
+from mandrel.config import interning
+from mandrel.config import lazy
+from mandrel.config import shared
+from mandrel.test import utils
+
+BIG = dict(('key%d' % i, {'host': 'host%d' % i, 'ports': range(i % 5)}) for i in xrange(200))
+
+class TestSharedConfigurationStore(utils.TestCase):
+    def setUp(self):
+        self.store = shared.SharedConfigurationStore()
+
+    def tearDown(self):
+        self.store.close()
+
+    def testDefaultDirectory(self):
+        if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+            self.assertEqual('/dev/shm', os.path.dirname(self.store.path))
+        with utils.tempdir() as path:
+            store = shared.SharedConfigurationStore(path)
+            self.assertEqual(path, os.path.dirname(store.path))
+            store.close()
+            self.assertFalse(os.path.exists(store.path))
+
+    def testPublishAndGet(self):
+        self.assertEqual(None, self.store.get('big'))
+        generation = self.store.generation
+        self.store.publish('big', BIG)
+        self.store.publish('small/name', {'a': 1})
+        self.assertEqual(generation + 2, self.store.generation)
+        view = self.store.get('big')
+        self.assertTrue(isinstance(view, lazy.LazyMapping))
+        self.assertEqual(BIG, view.materialize())
+        self.assertEqual({'a': 1}, self.store.get('small/name'))
+
+        # Each view is private to its caller.
+        view['key1'] = 'changed'
+        self.assertEqual(BIG['key1'], self.store.get('big')['key1'])
+
+        # Republishing swaps in the new document; old views stay readable.
+        self.store.publish('big', {'key1': 'new'})
+        self.assertEqual({'key1': 'new'}, self.store.get('big'))
+        self.assertEqual(BIG['key2'], view['key2'])
+
+        self.store.unpublish('big')
+        self.assertEqual(None, self.store.get('big'))
+        self.assertRaises(ValueError, lambda: self.store.publish('bad', {'a': object()}))
+
+    def testPublishConfigurationAndReload(self):
+        with utils.bootstrap_scenario() as (path, bootstrap_file):
+            with mock.patch('mandrel.bootstrap.SEARCH_PATHS', [path]):
+                with open(os.path.join(path, 'foo.yaml'), 'w') as f:
+                    f.write('{"a": 1}')
+                with mock.patch('mandrel.config.core.SHARED_STORE', self.store):
+                    self.assertEqual({'a': 1}, self.store.publish_configuration('foo'))
+                    with mock.patch('mandrel.config.core.load_configuration_file') as load:
+                        self.assertEqual({'a': 1}, mandrel.config.get_configuration('foo'))
+                        self.assertFalse(load.called)
+                    with open(os.path.join(path, 'foo.yaml'), 'w') as f:
+                        f.write('{"a": 2}')
+                    self.assertEqual(['foo'], self.store.reload())
+                    self.assertEqual({'a': 2}, mandrel.config.get_configuration('foo'))
+                    self.assertRaises(mandrel.exception.UnknownConfigurationException,
+                                      lambda: mandrel.config.get_configuration('bar'))
+
+    def testPublishFrozenConfiguration(self):
+        settings = ({'CANONICALIZER': interning.Canonicalizer()},
+                    {'CONFIGURATION_CACHE': cache.ConfigurationCache(read_only=True)})
+        with utils.bootstrap_scenario() as (path, bootstrap_file):
+            with mock.patch('mandrel.bootstrap.SEARCH_PATHS', [path]):
+                with open(os.path.join(path, 'big.yaml'), 'w') as f:
+                    f.write(repr(BIG))
+                for setting in settings:
+                    with mock.patch.multiple('mandrel.config.core', **setting):
+                        loaded = self.store.publish_configuration('big')
+                    self.assertTrue(isinstance(loaded['key1'], util.FrozenDict))
+                    view = self.store.get('big')
+                    self.assertTrue(isinstance(view, lazy.LazyMapping))
+                    self.assertEqual(loaded, view.materialize())
+
+    def testGetConfigurations(self):
+        with utils.bootstrap_scenario() as (path, bootstrap_file):
+            with mock.patch('mandrel.bootstrap.SEARCH_PATHS', [path]):
+                with open(os.path.join(path, 'bar.yaml'), 'w') as f:
+                    f.write('{"b": 1}')
+                self.store.publish('foo', {'a': 1})
+                with mock.patch('mandrel.config.core.SHARED_STORE', self.store):
+                    with mock.patch('mandrel.config.core.resolve_configuration_files',
+                                    wraps=mandrel.config.core.resolve_configuration_files) as resolve:
+                        batch = mandrel.config.get_configurations(['foo', 'bar', 'missing'])
+                    self.assertEqual({'foo': {'a': 1}, 'bar': {'b': 1}}, dict(batch))
+                    self.assertEqual(['missing'], batch.errors.keys())
+                    self.assertEqual(['bar', 'missing'], list(resolve.call_args[0][0]))
+
+    def testRemovedAtExit(self):
+        with mock.patch('atexit.register') as register:
+            store = shared.SharedConfigurationStore()
+        func, args = register.call_args[0][0], register.call_args[0][1:]
+        with mock.patch('os.getpid', return_value=store._owner + 1):
+            func(*args)
+        self.assertTrue(os.path.isdir(store.path))
+        func(*args)
+        self.assertFalse(os.path.exists(store.path))
+
+def worker(store, connection):
+    # Any attempt to load a file in the worker fails the test.
+    with mock.patch('mandrel.config.core.load_configuration_file', side_effect=AssertionError('loaded')):
+        with mock.patch('mandrel.config.core.SHARED_STORE', store):
+            while True:
+                request = connection.recv()
+                if request is None:
+                    break
+                try:
+                    connection.send(mandrel.config.get_configuration('big')[request])
+                except Exception, e:
+                    connection.send(repr(e))
+
+class TestForkedWorkers(utils.TestCase):
+    def testWorkersReadPublishedConfiguration(self):
+        store = shared.SharedConfigurationStore()
+        store.publish('big', BIG)
+        workers = []
+        try:
+            for i in xrange(3):
+                parent, child = multiprocessing.Pipe()
+                process = multiprocessing.Process(target=worker, args=(store, child))
+                process.start()
+                workers.append((process, parent))
+            for process, connection in workers:
+                connection.send('key3')
+                self.assertEqual(BIG['key3'], connection.recv())
+
+            store.publish('big', dict(BIG, key3='reloaded'))
+            for process, connection in workers:
+                connection.send('key3')
+                self.assertEqual('reloaded', connection.recv())
+        finally:
+            for process, connection in workers:
+                connection.send(None)
+                process.join(10)
+            store.close()
+        self.assertEqual([0, 0, 0], [process.exitcode for process, connection in workers])
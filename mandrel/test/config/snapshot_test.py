@@ -0,0 +1,116 @@
+import datetime
+import mock
+import os
+import yaml
+import mandrel.config
+from mandrel import exception
+from mandrel.config import snapshot
+from mandrel.test import utils
+
+CONTENT = {'foo': 'bar', 'nested': {'list': [1, 2.5, None, True], 'name': u'unicode'}}
+
+def write_yaml(path, value):
+    with open(path, 'w') as f:
+        yaml.safe_dump(value, f)
+
+def bump(path, offset=10):
+    st = os.stat(path)
+    os.utime(path, (st.st_atime, st.st_mtime + offset))
+
+class TestSnapshot(utils.TestCase):
+    def testSnapshotPath(self):
+        self.assertEqual('/foo/bar.yaml.mcache', snapshot.snapshot_path('/foo/bar.yaml'))
+
+    def testGeneratesThenServesSnapshot(self):
+        with utils.tempdir() as path:
+            source = os.path.join(path, 'a.yaml')
+            write_yaml(source, CONTENT)
+            loader = mock.Mock(side_effect=mandrel.config.core.read_yaml_path)
+            self.assertEqual(CONTENT, snapshot.load(source, loader))
+            self.assertTrue(os.path.isfile(snapshot.snapshot_path(source)))
+            self.assertEqual(CONTENT, snapshot.load(source, loader))
+            loader.assert_called_once_with(source)
+            self.assertEqual(CONTENT, snapshot.read_snapshot_path(snapshot.snapshot_path(source)))
+
+    def testRegeneratesStaleSnapshot(self):
+        with utils.tempdir() as path:
+            source = os.path.join(path, 'a.yaml')
+            write_yaml(source, CONTENT)
+            loader = mock.Mock(side_effect=mandrel.config.core.read_yaml_path)
+            snapshot.load(source, loader)
+            write_yaml(source, {'foo': 'updated'})
+            bump(source)
+            self.assertEqual({'foo': 'updated'}, snapshot.load(source, loader))
+            self.assertEqual({'foo': 'updated'}, snapshot.load(source, loader))
+            self.assertEqual(2, loader.call_count)
+
+    def testCorruptSnapshotIgnored(self):
+        with utils.tempdir() as path:
+            source = os.path.join(path, 'a.yaml')
+            write_yaml(source, CONTENT)
+            for garbage in ('', 'not a snapshot', snapshot.dumps(CONTENT)[:20]):
+                with open(snapshot.snapshot_path(source), 'wb') as f:
+                    f.write(garbage)
+                loader = mock.Mock(side_effect=mandrel.config.core.read_yaml_path)
+                self.assertEqual(CONTENT, snapshot.load(source, loader))
+                loader.assert_called_once_with(source)
+                self.assertEqual(CONTENT, snapshot.read_snapshot_path(snapshot.snapshot_path(source)))
+
+    def testInvalidSnapshotLoader(self):
+        with utils.tempdir() as path:
+            target = os.path.join(path, 'a.mcache')
+            with open(target, 'wb') as f:
+                f.write('junk')
+            self.assertRaises(exception.UnknownConfigurationException,
+                              lambda: snapshot.read_snapshot_path(target))
+
+    def testUnmarshallableValuesAreNotSnapshotted(self):
+        with utils.tempdir() as path:
+            source = os.path.join(path, 'a.yaml')
+            write_yaml(source, CONTENT)
+            value = {'when': datetime.date(2012, 1, 1)}
+            loader = mock.Mock(return_value=value)
+            self.assertEqual(value, snapshot.load(source, loader))
+            self.assertFalse(os.path.exists(snapshot.snapshot_path(source)))
+            self.assertEqual([], [n for n in os.listdir(path) if n.endswith('.tmp')])
+
+    def testUnwritableDirectory(self):
+        with utils.tempdir() as path:
+            source = os.path.join(path, 'a.yaml')
+            write_yaml(source, CONTENT)
+            with mock.patch('mandrel.util.write_atomically') as writer:
+                writer.side_effect = OSError
+                loader = mock.Mock(return_value=CONTENT)
+                self.assertEqual(CONTENT, snapshot.load(source, loader))
+                self.assertEqual(CONTENT, snapshot.load(source, loader))
+                self.assertEqual(2, loader.call_count)
+
+    def testForeignPythonVersion(self):
+        with utils.tempdir() as path:
+            source = os.path.join(path, 'a.yaml')
+            write_yaml(source, CONTENT)
+            snapshot.load(source, mandrel.config.core.read_yaml_path)
+            with mock.patch('sys.version_info', new=(1, 5, 2)):
+                loader = mock.Mock(return_value=CONTENT)
+                snapshot.load(source, loader)
+                loader.assert_called_once_with(source)
+
+    def testLoadConfigurationFileWithSnapshots(self):
+        with utils.tempdir() as path:
+            source = os.path.join(path, 'a.yaml')
+            write_yaml(source, CONTENT)
+            with mock.patch('mandrel.config.core.USE_SNAPSHOTS', new=True):
+                with mock.patch('mandrel.config.core.read_yaml_path') as reader:
+                    reader.side_effect = lambda p: yaml.safe_load(open(p))
+                    with mock.patch('mandrel.config.core.LOADERS', new=[('yaml', reader)]):
+                        self.assertEqual(CONTENT, mandrel.config.core.load_configuration_file(source))
+                        self.assertEqual(CONTENT, mandrel.config.core.load_configuration_file(source))
+                        reader.assert_called_once_with(source)
+                        # Snapshots can be loaded directly, and are not themselves snapshotted.
+                        self.assertEqual(CONTENT, mandrel.config.core.load_configuration_file(snapshot.snapshot_path(source)))
+                        self.assertFalse(os.path.exists(snapshot.snapshot_path(snapshot.snapshot_path(source))))
+
+    def testSnapshotsAreNotSearchCandidates(self):
+        self.assertIs(snapshot.read_snapshot_path, mandrel.config.core.get_loader('/foo/a.yaml.mcache'))
+        self.assertIs(snapshot.read_snapshot_path, mandrel.config.core.get_loader('/foo/a.mcache'))
+        self.assertFalse([name for name in mandrel.config.core.get_possible_basenames('a') if name.endswith('.mcache')])
@@ -0,0 +1,166 @@
+import json
+import mock
+import os
+import random
+import unittest
+import yaml
+import mandrel.config
+from mandrel.config import layered
+from mandrel.config import stack
+from mandrel.test import utils
+
+def write(path, tree, offset=0):
+    with open(path, 'w') as f:
+        json.dump(tree, f)
+    st = os.stat(path)
+    os.utime(path, (st.st_atime, st.st_mtime + offset))
+
+class TestDiff(unittest.TestCase):
+    def testDiff(self):
+        shared = {'x': [1]}
+        old = {'a': 1, 'b': {'c': 2, 'd': 3}, 'e': shared, 'f': [1]}
+        new = {'a': 1, 'b': {'c': 4, 'g': 5}, 'e': shared, 'f': 'flat'}
+        self.assertEqual(sorted([(('b', 'c'), 2, 4),
+                                 (('b', 'd'), 3, stack.MISSING),
+                                 (('b', 'g'), stack.MISSING, 5),
+                                 (('f',), [1], 'flat')]),
+                         sorted(stack.diff(old, new)))
+        self.assertEqual([], list(stack.diff(old, dict(old))))
+        self.assertEqual([((), stack.MISSING, old)], list(stack.diff(stack.MISSING, old)))
+
+class TestLayerStack(utils.TestCase):
+    LOW = {'a': 1, 'b': {'c': 2, 'd': [1]}, 'e': {'f': {'g': 3}}}
+    HIGH = {'b': {'d': [2]}, 'h': 4}
+
+    def scenario(self, test):
+        with utils.bootstrap_scenario() as (path, bootstrap_file):
+            low, high = os.path.join(path, 'low'), os.path.join(path, 'high')
+            os.mkdir(low)
+            os.mkdir(high)
+            write(os.path.join(low, 'foo.yaml'), self.LOW)
+            write(os.path.join(high, 'foo.yaml'), self.HIGH)
+            with mock.patch('mandrel.bootstrap.SEARCH_PATHS', [high, low]):
+                with mock.patch('mandrel.config.core.MERGED_CONFIGURATION_CACHE', None):
+                    test(os.path.join(low, 'foo.yaml'), os.path.join(high, 'foo.yaml'))
+
+    def testInitialMerge(self):
+        def test(low, high):
+            s = stack.LayerStack('foo', list_strategy='append')
+            self.assertEqual(mandrel.config.get_merged_configuration('foo', list_strategy='append'), s.configuration)
+            self.assertEqual([high, low], s.paths)
+            self.assertEqual([], s.refresh())
+        self.scenario(test)
+
+    def testNoFiles(self):
+        def test(low, high):
+            s = stack.LayerStack('bar')
+            self.assertEqual(None, s.configuration)
+            self.assertEqual([], s.refresh())
+            write(low.replace('foo', 'bar'), {'a': 1})
+            self.assertEqual([((), stack.MISSING, {'a': 1})], s.refresh())
+            os.remove(low.replace('foo', 'bar'))
+            self.assertEqual([((), {'a': 1}, stack.MISSING)], s.refresh())
+            self.assertEqual(None, s.configuration)
+        self.scenario(test)
+
+    def testIncrementalChange(self):
+        def test(low, high):
+            s = stack.LayerStack('foo', list_strategy='append')
+            callback = mock.Mock()
+            s.subscribe(callback)
+            before = s.configuration
+            tree = dict(self.LOW, a=10)
+            tree['b'] = {'c': 2, 'd': [1], 'new': {'x': 1}}
+            with mock.patch('mandrel.config.core.load_configuration_file',
+                            wraps=mandrel.config.core.load_configuration_file) as load:
+                write(low, tree, 10)
+                changes = s.refresh()
+                load.assert_called_once_with(low)
+            self.assertEqual(sorted([(('a',), 1, 10), (('b', 'new'), stack.MISSING, {'x': 1})]), sorted(changes))
+            callback.assert_called_once_with(s, changes)
+            self.assertEqual({'a': 10, 'b': {'c': 2, 'd': [1, 2], 'new': {'x': 1}}, 'e': {'f': {'g': 3}}, 'h': 4},
+                             s.configuration)
+            # The previous tree is untouched and unchanged subtrees are shared.
+            self.assertEqual({'a': 1, 'b': {'c': 2, 'd': [1, 2]}, 'e': {'f': {'g': 3}}, 'h': 4}, before)
+            self.assertTrue(before['e'] is s.configuration['e'])
+            self.assertTrue(before['b']['d'] is s.configuration['b']['d'])
+
+            s.unsubscribe(callback)
+            write(high, {'b': {'d': [3]}, 'h': 4}, 20)
+            self.assertEqual([(('b', 'd'), [1, 2], [1, 3])], s.refresh())
+            self.assertEqual(1, callback.call_count)
+        self.scenario(test)
+
+    def testBlockedByNonDictionary(self):
+        def test(low, high):
+            s = stack.LayerStack('foo')
+            write(high, {'b': 'flat', 'h': 4}, 10)
+            self.assertEqual([(('b',), {'c': 2, 'd': [2]}, 'flat')], s.refresh())
+            write(low, dict(self.LOW, b={'c': 5}), 10)
+            self.assertEqual([], s.refresh())
+            self.assertEqual('flat', s.configuration['b'])
+            write(high, {'b': {'z': 1}, 'h': 4}, 20)
+            s.refresh()
+            self.assertEqual({'c': 5, 'z': 1}, s.configuration['b'])
+        self.scenario(test)
+
+    def testLayersAddedAndRemoved(self):
+        def test(low, high):
+            s = stack.LayerStack('foo')
+            os.remove(high)
+            self.assertEqual(sorted([(('b', 'd'), [2], [1]), (('h',), 4, stack.MISSING)]), sorted(s.refresh()))
+            self.assertEqual(self.LOW, s.configuration)
+            write(high, {'a': 2}, 10)
+            self.assertEqual([(('a',), 1, 2)], s.refresh())
+            self.assertEqual([high, low], s.paths)
+        self.scenario(test)
+
+    def testFailedLoadLeavesStack(self):
+        def test(low, high):
+            s = stack.LayerStack('foo')
+            before = s.configuration
+            with open(low, 'w') as f:
+                f.write('{not: [yaml')
+            self.assertRaises(yaml.YAMLError, s.refresh)
+            self.assertTrue(before is s.configuration)
+        self.scenario(test)
+
+    def testDictReplaceStrategy(self):
+        def test(low, high):
+            s = stack.LayerStack('foo', dict_strategy='replace')
+            self.assertEqual(self.HIGH, s.configuration)
+            write(high, {'a': 1}, 10)
+            self.assertEqual(sorted([(('a',), stack.MISSING, 1), (('b',), {'d': [2]}, stack.MISSING),
+                                     (('h',), 4, stack.MISSING)]), sorted(s.refresh()))
+        self.scenario(test)
+
+    def testMatchesFullMerge(self):
+        rand = random.Random(42)
+
+        def mutate(tree, depth=0):
+            tree = dict(tree)
+            for i in xrange(rand.randint(0, 3)):
+                key = rand.choice('abcdef')
+                choice = rand.random()
+                if choice < 0.2:
+                    tree.pop(key, None)
+                elif choice < 0.4 or depth > 2:
+                    tree[key] = rand.choice([1, 'x', [rand.randint(0, 3)], None])
+                else:
+                    tree[key] = mutate(tree.get(key) if isinstance(tree.get(key), dict) else {}, depth + 1)
+            return tree
+
+        def test(low, high):
+            s = stack.LayerStack('foo', list_strategy='unique')
+            trees = {low: self.LOW, high: self.HIGH}
+            merger = layered.Merger(list_strategy='unique')
+            for i in xrange(60):
+                path = rand.choice([low, high])
+                trees[path] = mutate(trees[path])
+                write(path, trees[path], i + 1)
+                before = s.configuration
+                changes = s.refresh()
+                expected = merger.merge_layers([trees[high], trees[low]])
+                self.assertEqual(expected, s.configuration)
+                self.assertEqual(sorted(stack.diff(before, expected)), sorted(changes))
+        self.scenario(test)
@@ -0,0 +1,148 @@
+import gc
+import mock
+import os
+import threading
+import time
+import unittest
+import yaml
+import mandrel.config
+from mandrel.config import watcher
+from mandrel.test import utils
+
+def write_yaml(path, value):
+    with open(path, 'w') as f:
+        yaml.safe_dump(value, f)
+    # Ensure the change is visible regardless of mtime granularity.
+    st = os.stat(path)
+    os.utime(path, (st.st_atime, st.st_mtime + write_yaml.offset))
+    write_yaml.offset += 1
+write_yaml.offset = 1
+
+class Thing(mandrel.config.Configuration):
+    NAME = 'thing'
+
+class ForgivingThing(mandrel.config.ForgivingConfiguration):
+    NAME = 'thing'
+
+def scenario(func):
+    def wrapper(self):
+        with utils.bootstrap_scenario() as spec:
+            utils.refresh_bootstrapper()
+            levels = [os.path.join(spec[0], level) for level in ('high', 'low')]
+            for level in levels:
+                os.mkdir(level)
+            mandrel.bootstrap.SEARCH_PATHS[:] = levels
+            write_yaml(os.path.join(levels[1], 'thing.yaml'), {'level': 'low'})
+            return func(self, levels)
+    return wrapper
+
+class TestConfigurationWatcher(unittest.TestCase):
+    @scenario
+    def testModificationReloads(self, levels):
+        w = watcher.ConfigurationWatcher(use_inotify=False)
+        thing = Thing.get_configuration()
+        w.register(thing)
+        events = []
+        w.subscribe(lambda name, path: events.append((name, path)))
+        self.assertEqual([], w.check())
+        write_yaml(os.path.join(levels[1], 'thing.yaml'), {'level': 'low', 'extra': 1})
+        self.assertEqual(['thing'], w.check())
+        self.assertEqual(1, thing.extra)
+        self.assertEqual([('thing', os.path.join(levels[1], 'thing.yaml'))], events)
+        self.assertEqual([], w.check())
+
+    @scenario
+    def testHigherPriorityFileWins(self, levels):
+        w = watcher.ConfigurationWatcher(use_inotify=False)
+        thing = Thing.get_configuration()
+        w.register(thing)
+        events = []
+        w.subscribe(lambda name, path: events.append(path), name='thing')
+        write_yaml(os.path.join(levels[0], 'thing.yaml'), {'level': 'high'})
+        w.check()
+        self.assertEqual('high', thing.level)
+        os.remove(os.path.join(levels[0], 'thing.yaml'))
+        w.check()
+        self.assertEqual('low', thing.level)
+        self.assertEqual([os.path.join(levels[0], 'thing.yaml'), os.path.join(levels[1], 'thing.yaml')], events)
+
+    @scenario
+    def testRemoval(self, levels):
+        w = watcher.ConfigurationWatcher(use_inotify=False)
+        thing = Thing.get_configuration()
+        forgiving = ForgivingThing.get_configuration()
+        other = Thing.get_configuration()
+        for instance in (thing, forgiving, other):
+            w.register(instance)
+        events = []
+        w.subscribe(lambda name, path: events.append(path))
+        os.remove(os.path.join(levels[1], 'thing.yaml'))
+        self.assertEqual(['thing'], w.check())
+        self.assertEqual([None], events)
+        self.assertEqual('low', thing.level)
+        self.assertEqual({}, forgiving.configuration)
+
+        write_yaml(os.path.join(levels[1], 'thing.yaml'), {'level': 'back'})
+        w.check()
+        for instance in (thing, forgiving, other):
+            self.assertEqual('back', instance.level)
+        self.assertFalse(thing.configuration is other.configuration)
+
+    @scenario
+    def testBrokenFileKeepsConfiguration(self, levels):
+        w = watcher.ConfigurationWatcher(use_inotify=False)
+        thing = Thing.get_configuration()
+        w.register(thing)
+        with mock.patch('mandrel.bootstrap.get_logger') as get_logger:
+            with open(os.path.join(levels[1], 'thing.yaml'), 'a') as f:
+                f.write('foo: [unclosed\n')
+            w.check()
+            self.assertEqual(1, get_logger.return_value.exception.call_count)
+        self.assertEqual('low', thing.level)
+
+    @scenario
+    def testUnregisterAndWeakReferences(self, levels):
+        w = watcher.ConfigurationWatcher(use_inotify=False)
+        thing = Thing.get_configuration()
+        gone = Thing.get_configuration()
+        w.register(thing)
+        w.register(gone)
+        del gone
+        gc.collect()
+        w.unregister(thing)
+        write_yaml(os.path.join(levels[1], 'thing.yaml'), {'level': 'changed'})
+        self.assertEqual(['thing'], w.check())
+        self.assertEqual('low', thing.level)
+
+        callback = mock.Mock()
+        w.subscribe(callback)
+        w.unsubscribe(callback)
+        write_yaml(os.path.join(levels[1], 'thing.yaml'), {'level': 'again'})
+        w.check()
+        self.assertEqual(0, callback.call_count)
+
+    def runBackgroundWatcher(self, levels, use_inotify):
+        w = watcher.ConfigurationWatcher(interval=0.05, use_inotify=use_inotify)
+        thing = Thing.get_configuration()
+        w.register(thing)
+        changed = threading.Event()
+        w.subscribe(lambda name, path: changed.set())
+        w.start()
+        try:
+            self.assertTrue(w.running)
+            time.sleep(0.1)
+            write_yaml(os.path.join(levels[0], 'thing.yaml'), {'level': 'high'})
+            self.assertTrue(changed.wait(5))
+            self.assertEqual('high', thing.level)
+        finally:
+            w.stop(5)
+        self.assertFalse(w.running)
+
+    @scenario
+    def testPollingThread(self, levels):
+        self.runBackgroundWatcher(levels, False)
+
+    @unittest.skipIf(not watcher._Inotify.available(), 'inotify is unavailable')
+    @scenario
+    def testInotifyThread(self, levels):
+        self.runBackgroundWatcher(levels, True)
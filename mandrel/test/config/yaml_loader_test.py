@@ -1,10 +1,10 @@
-import unittest
 import mock
 import os
+import yaml
 from mandrel.test import utils
 from mandrel import config
 
-class TestConfigYamlLoader(unittest.TestCase):
+class TestConfigYamlLoader(utils.TestCase):
     def testLoadOperation(self):
         with utils.tempdir() as dirpath:
             filepath = os.path.join(dirpath, 'some_config')
@@ -12,16 +12,43 @@ class TestConfigYamlLoader(unittest.TestCase):
             with open(filepath, 'w') as outfile:
                 outfile.write(contents)
             
-            with mock.patch('yaml.safe_load') as safe_load:
-                def loader(f):
-                    safe_load.file_contents = f.read()
-                    return safe_load.return_value
-                safe_load.side_effect = loader
+            with mock.patch('yaml.load') as load:
+                def loader(f, Loader):
+                    load.file_contents = f.read()
+                    return load.return_value
+                load.side_effect = loader
                 result = config.core.read_yaml_path(filepath)
-                # yaml.safe_load called once
-                self.assertEqual(1, len(safe_load.call_args_list))
+                # yaml.load called once
+                self.assertEqual(1, len(load.call_args_list))
+                # with our safe loader
+                self.assertIs(config.core.get_yaml_loader(), load.call_args[1]['Loader'])
                 # it's first arg appears to be a reader of our file
-                self.assertEqual(contents, safe_load.file_contents)
+                self.assertEqual(contents, load.file_contents)
                 # and we got the result back.
-                self.assertEqual(result, safe_load.return_value)
+                self.assertEqual(result, load.return_value)
 
+    def testLoaderSelection(self):
+        self.assertEqual(None, config.core.YAML_LOADER)
+        if hasattr(yaml, 'CSafeLoader'):
+            self.assertIs(yaml.CSafeLoader, config.core.get_yaml_loader())
+        else:
+            self.assertIs(yaml.SafeLoader, config.core.get_yaml_loader())
+        with mock.patch('mandrel.config.core.YAML_LOADER') as loader:
+            self.assertIs(loader, config.core.get_yaml_loader())
+
+    def testLoaderIsSafe(self):
+        with utils.tempdir() as dirpath:
+            filepath = os.path.join(dirpath, 'some_config')
+            with open(filepath, 'w') as outfile:
+                outfile.write("---\nfoo: !!python/object/apply:os.getcwd []\n")
+            self.assertRaises(yaml.YAMLError, lambda: config.core.read_yaml_path(filepath))
+
+    def testPureLoaderFallback(self):
+        with utils.tempdir() as dirpath:
+            filepath = os.path.join(dirpath, 'some_config')
+            with open(filepath, 'w') as outfile:
+                outfile.write("---\nfoo: blargh\nblee:\n - 1\n - 2.5\n")
+            expected = {'foo': 'blargh', 'blee': [1, 2.5]}
+            self.assertEqual(expected, config.core.read_yaml_path(filepath))
+            with mock.patch('mandrel.config.core.YAML_LOADER', new=yaml.SafeLoader):
+                self.assertEqual(expected, config.core.read_yaml_path(filepath))
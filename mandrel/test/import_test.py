@@ -0,0 +1,80 @@
+import os
+import re
+import subprocess
+import sys
+import mandrel
+from mandrel.test import utils
+
+PYTHONPATH = os.path.dirname(os.path.dirname(os.path.abspath(mandrel.__file__)))
+
+# Modules that mandrel should only import when they are actually needed.
+HEAVY_MODULES = ('yaml', 'logging.config', 'multiprocessing')
+
+IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)\s*$')
+
+def imported_modules(statement, cwd=None):
+    """Runs statement in a fresh interpreter and returns a dict of the modules it imported.
+
+    Where supported (Python 3.7 and later), the modules and their cumulative
+    import times (in microseconds) are parsed from "-X importtime" output.
+    Otherwise, the modules come from sys.modules and the times are None.
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = PYTHONPATH
+    env.pop('MANDREL_LAZY_BOOTSTRAP', None)
+    env.pop('MANDREL_BOOTSTRAP_CACHE', None)
+    if sys.version_info >= (3, 7):
+        process = subprocess.Popen([sys.executable, '-X', 'importtime', '-c', statement],
+                                   cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   universal_newlines=True)
+        out, err = process.communicate()
+        if process.returncode:
+            raise AssertionError(err)
+        modules = {}
+        for line in err.splitlines():
+            match = IMPORT_TIME.match(line)
+            if match:
+                modules[match.group(4)] = int(match.group(2))
+        return modules
+
+    statement += '\nimport sys\nprint("\\n".join(sys.modules))'
+    out = subprocess.check_output([sys.executable, '-c', statement], cwd=cwd, env=env)
+    return dict((name, None) for name in out.split() if name)
+
+class TestImports(utils.TestCase):
+    def assertNotImported(self, modules, names=HEAVY_MODULES):
+        for name in names:
+            self.assertFalse(name in modules, '%s was imported' % name)
+
+    def testConfig(self):
+        modules = imported_modules('import mandrel.config')
+        self.assertTrue('mandrel.config.core' in modules)
+        self.assertNotImported(modules)
+
+    def testBootstrap(self):
+        with utils.bootstrap_scenario() as spec:
+            modules = imported_modules('import mandrel.bootstrap', cwd=spec[0])
+        self.assertTrue('mandrel.bootstrap' in modules)
+        self.assertNotImported(modules)
+
+    def testLoggerWithoutLoggingConfiguration(self):
+        with utils.bootstrap_scenario() as spec:
+            modules = imported_modules('import mandrel.bootstrap\nmandrel.bootstrap.get_logger("foo")', cwd=spec[0])
+        self.assertNotImported(modules)
+
+    def testLoggerWithLoggingConfiguration(self):
+        with utils.bootstrap_scenario() as spec:
+            with open(os.path.join(spec[0], 'logging.cfg'), 'w') as f:
+                f.write('[loggers]\nkeys=root\n\n[handlers]\nkeys=\n\n[formatters]\nkeys=\n\n'
+                        '[logger_root]\nlevel=INFO\nhandlers=\n')
+            modules = imported_modules('import mandrel.bootstrap\nmandrel.bootstrap.get_logger("foo")', cwd=spec[0])
+        self.assertTrue('logging.config' in modules)
+        self.assertNotImported(modules, ('yaml', 'multiprocessing'))
+
+    def testYamlOnlyWhenLoaded(self):
+        with utils.bootstrap_scenario() as spec:
+            with open(os.path.join(spec[0], 'foo.yaml'), 'w') as f:
+                f.write('foo: bar\n')
+            modules = imported_modules('import mandrel.config\nmandrel.config.get_configuration("foo")', cwd=spec[0])
+        self.assertTrue('yaml' in modules)
+        self.assertNotImported(modules, ('logging.config', 'multiprocessing'))
@@ -0,0 +1,126 @@
+import mock
+import os
+import time
+import unittest
+from mandrel.test import utils
+from mandrel.test.util.file_finder_test import scenario, get_level
+from mandrel import util
+
+def touch_dir(path, offset):
+    st = os.stat(path)
+    os.utime(path, (st.st_atime, st.st_mtime + offset))
+
+class TestDirectoryIndex(unittest.TestCase):
+    def testMatchesFindFiles(self):
+        mapping = {'0.x': (0,), 'a.txt': (0, 1), 'b.blah': (0, 1, 2), 'c.pork': (1, 2), 'd.plonk': (1,)}
+        with scenario(**mapping) as dirs:
+            index = util.DirectoryIndex()
+            for names in (('0.x',), ('a.txt', 'b.blah'), ('c.pork', 'a.txt'), ('e.none', 'd.plonk', 'b.blah')):
+                for matches in (None, 1, 2):
+                    self.assertEqual(list(util.find_files(names, dirs, matches=matches)),
+                                     list(index.find_files(names, dirs, matches=matches)))
+            self.assertEqual([0, 1], [get_level(p) for p in index.find_files('a.txt', dirs)])
+
+    def testNamesWithDirectories(self):
+        with utils.tempdir() as path:
+            os.makedirs(os.path.join(path, 'sub', 'deeper'))
+            target = os.path.join(path, 'sub', 'foo.yaml')
+            with open(target, 'w') as f:
+                f.write('a')
+            index = util.DirectoryIndex()
+            for name in (os.path.join('sub', 'foo.yaml'), os.path.join('sub', 'deeper', '..', 'foo.yaml'),
+                         target, os.path.join('sub', 'bar.yaml'), 'sub' + os.sep, os.path.join('nope', 'foo.yaml')):
+                self.assertEqual(list(util.find_files(name, [path])), list(index.find_files(name, [path])))
+                self.assertEqual(os.path.isfile(os.path.join(path, name)), index.isfile(path, name))
+            self.assertEqual([os.path.join(path, 'sub', 'foo.yaml')],
+                             list(index.find_files(os.path.join('sub', 'foo.yaml'), [path])))
+
+    def testDirectoriesAreNotFiles(self):
+        with utils.tempdir() as path:
+            os.mkdir(os.path.join(path, 'foo.yaml'))
+            index = util.DirectoryIndex()
+            self.assertEqual([], list(index.find_files('foo.yaml', [path])))
+            self.assertEqual(False, index.isfile(path, 'foo.yaml'))
+
+    def testMissingDirectory(self):
+        with utils.tempdir() as path:
+            missing = os.path.join(path, 'nope')
+            index = util.DirectoryIndex()
+            self.assertEqual({}, index.listing(missing))
+            self.assertEqual([], list(index.find_files('foo', [missing])))
+
+    def testListingReused(self):
+        with scenario(**{'a.txt': (0, 1, 2)}) as dirs:
+            for d in dirs:
+                touch_dir(d, -10)
+            index = util.DirectoryIndex()
+            list(index.find_files(('b.txt', 'a.txt'), dirs))
+            with mock.patch('os.listdir') as listdir:
+                with mock.patch('mandrel.util._scandir') as scandir:
+                    with mock.patch('os.path.isfile') as isfile:
+                        result = list(index.find_files(('b.txt', 'a.txt'), dirs))
+                        self.assertEqual(0, listdir.call_count)
+                        self.assertEqual(0, scandir.call_count)
+                        self.assertEqual(0, isfile.call_count)
+            self.assertEqual([os.path.join(d, 'a.txt') for d in dirs], result)
+
+    def testInvalidationByDirectoryChange(self):
+        with scenario(**{'a.txt': (1,)}) as dirs:
+            index = util.DirectoryIndex()
+            self.assertEqual([1], [get_level(p) for p in index.find_files('a.txt', dirs)])
+            with open(os.path.join(dirs[0], 'a.txt'), 'w') as f:
+                f.write('0')
+            touch_dir(dirs[0], 10)
+            self.assertEqual([0, 1], [get_level(p) for p in index.find_files('a.txt', dirs)])
+            os.remove(os.path.join(dirs[1], 'a.txt'))
+            touch_dir(dirs[1], 10)
+            self.assertEqual([0], [get_level(p) for p in index.find_files('a.txt', dirs)])
+
+    def testExplicitInvalidation(self):
+        with scenario(**{'a.txt': (0,)}) as dirs:
+            touch_dir(dirs[0], -10)
+            index = util.DirectoryIndex()
+            index.listing(dirs[0])
+            with mock.patch.object(index, '_scan') as scan:
+                scan.return_value = {}
+                index.listing(dirs[0])
+                self.assertEqual(0, scan.call_count)
+                index.invalidate(dirs[0])
+                index.listing(dirs[0])
+                scan.assert_called_once_with(dirs[0])
+                index.invalidate()
+                index.listing(dirs[0])
+                self.assertEqual(2, scan.call_count)
+
+    def testRecentlyModifiedDirectoryNotCached(self):
+        with utils.tempdir() as path:
+            # As on a file system recording whole seconds, where a file added
+            # within the same second leaves the directory's signature unchanged.
+            now = int(time.time())
+            os.utime(path, (now, now))
+            index = util.DirectoryIndex()
+            self.assertFalse(index.isfile(path, 'a.txt'))
+            signature = util.stat_signature(path)
+            with open(os.path.join(path, 'a.txt'), 'w') as f:
+                f.write('a')
+            os.utime(path, (now, now))
+            self.assertEqual(signature, util.stat_signature(path))
+            self.assertTrue(index.isfile(path, 'a.txt'))
+
+            touch_dir(path, -10)
+            self.assertTrue(index.isfile(path, 'a.txt'))
+            with mock.patch.object(index, '_scan') as scan:
+                self.assertTrue(index.isfile(path, 'a.txt'))
+                self.assertFalse(scan.called)
+
+    def testStatSignature(self):
+        with utils.tempdir() as path:
+            target = os.path.join(path, 'foo')
+            with open(target, 'w') as f:
+                f.write('a')
+            sig = util.stat_signature(target)
+            self.assertEqual(sig, util.stat_signature(target))
+            with open(target, 'w') as f:
+                f.write('ab')
+            self.assertNotEqual(sig, util.stat_signature(target))
+            self.assertRaises(OSError, lambda: util.stat_signature(os.path.join(path, 'bar')))
@@ -66,3 +66,30 @@ class TestFileFinder(unittest.TestCase):
                     [('d', 0), ('c', 1), ('d', 2)],
                     [normalize(r) for r in util.find_files(('e', 'd', 'c', 'a', 'b'), dirs)])
 
+
+
+class TestWriteAtomically(unittest.TestCase):
+    def testWrite(self):
+        with utils.tempdir() as path:
+            target = os.path.join(path, 'foo')
+            util.write_atomically(target, 'first')
+            self.assertEqual('first', open(target).read())
+            util.write_atomically(target, 'second')
+            self.assertEqual('second', open(target).read())
+            self.assertEqual(['foo'], os.listdir(path))
+
+    def testFailureLeavesNoTemporaryFile(self):
+        with utils.tempdir() as path:
+            target = os.path.join(path, 'foo')
+            util.write_atomically(target, 'first')
+            with mock.patch('os.rename') as rename:
+                with mock.patch('os.chmod'):
+                    rename.side_effect = OSError
+                    self.assertRaises(OSError, lambda: util.write_atomically(target, 'second'))
+            self.assertEqual('first', open(target).read())
+            self.assertEqual(['foo'], os.listdir(path))
+
+    def testUnwritableDirectory(self):
+        with utils.tempdir() as path:
+            missing = os.path.join(path, 'missing', 'foo')
+            self.assertRaises(OSError, lambda: util.write_atomically(missing, 'data'))
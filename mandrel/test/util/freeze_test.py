@@ -0,0 +1,71 @@
+import copy
+import pickle
+import unittest
+from mandrel import util
+
+class TestFreeze(unittest.TestCase):
+    def testFrozenDictReads(self):
+        d = util.FrozenDict({'a': 1, 'b': 2})
+        self.assertEqual({'a': 1, 'b': 2}, d)
+        self.assertEqual(1, d['a'])
+        self.assertEqual(2, d.get('b'))
+        self.assertEqual(['a', 'b'], sorted(d))
+
+    def testFrozenDictRejectsMutation(self):
+        d = util.FrozenDict({'a': 1})
+        mutators = (lambda: d.__setitem__('a', 2),
+                    lambda: d.__delitem__('a'),
+                    lambda: d.clear(),
+                    lambda: d.pop('a'),
+                    lambda: d.popitem(),
+                    lambda: d.setdefault('b', 3),
+                    lambda: d.update(b=3))
+        for mutator in mutators:
+            self.assertRaises(TypeError, mutator)
+        self.assertEqual({'a': 1}, d)
+
+    def testFrozenDictCopies(self):
+        d = util.FrozenDict({'a': util.FrozenDict({'b': [1]})})
+        for duplicate in (copy.copy(d), copy.deepcopy(d), pickle.loads(pickle.dumps(d))):
+            self.assertTrue(isinstance(duplicate, util.FrozenDict))
+            self.assertEqual(d, duplicate)
+
+    def testFreeze(self):
+        value = {'a': [1, {'b': set([2])}], 'c': (3, [4]), 'd': 'e'}
+        frozen = util.freeze(value)
+        self.assertTrue(isinstance(frozen, util.FrozenDict))
+        self.assertEqual((1, {'b': frozenset([2])}), frozen['a'])
+        self.assertTrue(isinstance(frozen['a'][1], util.FrozenDict))
+        self.assertEqual((3, (4,)), frozen['c'])
+        self.assertEqual('e', frozen['d'])
+        self.assertTrue(frozen is util.freeze(frozen))
+        self.assertEqual(5, util.freeze(5))
+
+class TestCopyOnWriteDict(unittest.TestCase):
+    def testMapping(self):
+        source = {'a': 1}
+        d = util.CopyOnWriteDict(source)
+        d['b'] = 2
+        self.assertEqual({'a': 1}, source)
+        self.assertEqual({'a': 1, 'b': 2}, d)
+        self.assertEqual(2, len(d))
+        self.assertTrue('b' in d)
+        del d['a']
+        self.assertRaises(KeyError, lambda: d.__delitem__('a'))
+        self.assertEqual(['b'], list(d))
+
+    def testCopiesShareUntilWritten(self):
+        a = util.CopyOnWriteDict({'x': 1})
+        b = a.copy()
+        c = copy.copy(b)
+        self.assertTrue(a._data is b._data is c._data)
+        b['x'] = 2
+        self.assertEqual((1, 2, 1), (a['x'], b['x'], c['x']))
+        self.assertTrue(a._data is c._data)
+        a['y'] = 3
+        c['z'] = 4
+        self.assertEqual({'x': 1, 'y': 3}, a)
+        self.assertEqual({'x': 2}, b)
+        self.assertEqual({'x': 1, 'z': 4}, c)
+        del a['x']
+        self.assertEqual({'y': 3}, a)
@@ -0,0 +1,55 @@
+import copy
+import pickle
+import unittest
+from mandrel import util
+
+class TestSharedKeyDict(unittest.TestCase):
+    def testMapping(self):
+        d = util.SharedKeyDict({'a': 1, 'b': 2})
+        self.assertEqual({'a': 1, 'b': 2}, d)
+        self.assertEqual(2, len(d))
+        self.assertTrue('a' in d)
+        self.assertFalse('c' in d)
+        self.assertEqual(1, d['a'])
+        self.assertRaises(KeyError, lambda: d['c'])
+        self.assertEqual(None, d.get('c'))
+
+        d['a'] = 'x'
+        d['c'] = 3
+        self.assertEqual({'a': 'x', 'b': 2, 'c': 3}, d)
+        del d['b']
+        self.assertEqual({'a': 'x', 'c': 3}, d)
+        self.assertRaises(KeyError, lambda: d.__delitem__('b'))
+        self.assertEqual(set(['a', 'c']), set(d))
+
+    def testTablesShared(self):
+        a = util.SharedKeyDict({'x': 1, 'y': 2})
+        b = util.SharedKeyDict({'y': 'b', 'x': 'a'})
+        self.assertTrue(a._table is b._table)
+        self.assertEqual({'x': 'a', 'y': 'b'}, b)
+
+        a['z'] = 3
+        b['z'] = 'c'
+        self.assertTrue(a._table is b._table)
+        self.assertTrue(a._table is util.SharedKeyDict({'x': 0, 'y': 0, 'z': 0})._table)
+
+        c = util.SharedKeyDict({'z': 0})
+        c['y'] = 'y'
+        c['x'] = 'x'
+        self.assertTrue(a._table is c._table)
+        self.assertEqual({'x': 'x', 'y': 'y', 'z': 0}, c)
+
+        del c['z']
+        self.assertTrue(c._table is util.SharedKeyDict({'x': 0, 'y': 0})._table)
+        self.assertEqual({'x': 'x', 'y': 'y'}, c)
+
+    def testCopies(self):
+        a = util.SharedKeyDict({'x': [1], 'y': 2})
+        for duplicate in (a.copy(), copy.copy(a), copy.deepcopy(a), pickle.loads(pickle.dumps(a, 2))):
+            self.assertTrue(type(duplicate) is util.SharedKeyDict)
+            self.assertTrue(duplicate._table is a._table)
+            self.assertEqual(a, duplicate)
+            duplicate['y'] = 'changed'
+            self.assertEqual(2, a['y'])
+        self.assertFalse(copy.deepcopy(a)['x'] is a['x'])
+        self.assertTrue(copy.copy(a)['x'] is a['x'])
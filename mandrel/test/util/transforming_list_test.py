@@ -90,3 +90,107 @@ class TestTransformingList(unittest.TestCase):
         self.assertEqual(1, l.count(vals[1]))
         self.assertEqual(2, l.count(vals[2]))
 
+
+    def testBatchTransformer(self):
+        t = mock_transform()
+        batch = mock.Mock(name='MockBatchTransform')
+        batch.side_effect = lambda values: [v.transformed for v in values]
+        vals = [mock_value() for i in xrange(5)]
+        l = util.TransformingList(t, batch)
+        l.extend(iter(vals[0:2]))
+        batch.assert_called_once_with(vals[0:2])
+        l[0:1] = vals[2:4]
+        self.assertEqual(mock.call(vals[2:4]), batch.call_args)
+        l.append(vals[4])
+        self.assertEqual(2, batch.call_count)
+        self.assertEqual(tuple(v.transformed for v in (vals[2], vals[3], vals[1], vals[4])), tuple(l))
+        self.assertEqual(1, t.call_count)
+
+    def testSliceObjects(self):
+        # Python 3 passes slice objects to __setitem__/__delitem__ for all slices.
+        t = mock_transform()
+        vals = [mock_value() for i in xrange(6)]
+        l = util.TransformingList(t)
+        l.__setitem__(slice(0, 0), vals[0:4])
+        self.assertEqual(tuple(v.transformed for v in vals[0:4]), tuple(l))
+        l[::2] = vals[4:6]
+        self.assertEqual(tuple(v.transformed for v in (vals[4], vals[1], vals[5], vals[3])), tuple(l))
+        self.assertRaises(ValueError, lambda: l.__setitem__(slice(None, None, 2), vals[0:1]))
+        l.__delitem__(slice(1, 3))
+        self.assertEqual((vals[4].transformed, vals[3].transformed), tuple(l))
+        del l[::-2]
+        self.assertEqual((vals[4].transformed,), tuple(l))
+
+        batch = mock.Mock(name='MockBatchTransform')
+        batch.side_effect = lambda values: [v.transformed for v in values]
+        l = util.TransformingList(t, batch)
+        l.__setitem__(slice(None), vals)
+        batch.assert_called_once_with(vals)
+        self.assertEqual(tuple(v.transformed for v in vals), tuple(l))
+
+    def testListMethods(self):
+        t = mock_transform()
+        a, b, c = (mock_value() for i in xrange(3))
+        l = util.TransformingList(t)
+        l.extend([a, b, c, a])
+        self.assertEqual([a.transformed, b.transformed, c.transformed, a.transformed], list(iter(l)))
+        self.assertEqual(1, l.index(b))
+        self.assertEqual(3, l.index(a, 1))
+        self.assertRaises(ValueError, lambda: l.index(a, 1, 3))
+        l.remove(a)
+        self.assertEqual((b.transformed, c.transformed, a.transformed), tuple(l))
+        self.assertRaises(ValueError, lambda: l.remove(mock_value()))
+        l.reverse()
+        self.assertEqual((a.transformed, c.transformed, b.transformed), tuple(l))
+        self.assertEqual(b.transformed, l.pop())
+        self.assertEqual('TransformingList(%r)' % [a.transformed, c.transformed], repr(l))
+
+    def testVersions(self):
+        t = mock_transform()
+        vals = [mock_value() for i in xrange(4)]
+        l = util.TransformingList(t)
+        other = util.TransformingList(t)
+        self.assertNotEqual(l.version, other.version)
+        versions = [l.version]
+        def check(changed):
+            self.assertTrue(changed.version > versions[-1])
+            versions.append(changed.version)
+        for operation in (lambda: l.append(vals[0]),
+                          lambda: l.extend(vals[1:3]),
+                          lambda: l.insert(0, vals[3]),
+                          lambda: l.__setitem__(0, vals[0]),
+                          lambda: l.__setitem__(slice(0, 1), vals[0:2]),
+                          lambda: l.__setslice__(0, 1, vals[0:1]),
+                          lambda: l.reverse(),
+                          lambda: l.remove(vals[1]),
+                          lambda: l.pop(),
+                          lambda: l.__delitem__(0),
+                          lambda: l.__delslice__(0, 1)):
+            before = l.version
+            operation()
+            self.assertTrue(l.version > before)
+            self.assertTrue(l.version > other.version)
+
+        l.extend(vals)
+        version = l.version
+        l.count(vals[0])
+        l.index(vals[0])
+        vals[0] in l
+        list(l)
+        l[0:2]
+        self.assertEqual(version, l.version)
+
+    def testListeners(self):
+        l = util.TransformingList(mock_transform())
+        listener = mock.Mock(name='Listener')
+        versions = []
+        listener.side_effect = lambda changed: versions.append(changed.version)
+        l.add_listener(listener)
+        l.append(mock_value())
+        l.pop()
+        self.assertEqual([mock.call(l), mock.call(l)], listener.call_args_list)
+        self.assertEqual(l.version, versions[-1])
+        l.remove_listener(listener)
+        l.append(mock_value())
+        self.assertEqual(2, listener.call_count)
+        self.assertRaises(ValueError, lambda: l.remove_listener(listener))
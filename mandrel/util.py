@@ -1,49 +1,337 @@
+import collections
+import copy
+import itertools
 import os
 import re
+import tempfile
+import time
+
+try:
+    from os import scandir as _scandir
+except ImportError:
+    try:
+        from scandir import scandir as _scandir
+    except ImportError:
+        _scandir = None
+
+# Source of TransformingList versions, unique across all instances.
+_list_versions = itertools.count(1)
 
 class TransformingList(object):
-    __slots__ = ('_list', '_transformer')
+    __slots__ = ('_list', '_transformer', '_batch_transformer', '_version', '_listeners')
+
+    def __init__(self, transformer, batch_transformer=None):
+        """Creates an empty list applying transformer to each value put in it.
 
-    def __init__(self, transformer):
+        If given, batch_transformer is called with a list of values to
+        transform several at once (in extend and slice assignment), and
+        must return a list of their transformations.
+        """
         self._list = []
         self._transformer = transformer
+        self._batch_transformer = batch_transformer
+        self._version = next(_list_versions)
+        self._listeners = []
+
+    @property
+    def version(self):
+        """A number that increases whenever the list is modified.
+
+        Versions are unique across all TransformingLists, so a (list, version)
+        pair identifies a particular state of a particular list, and a cache
+        keyed on version alone is invalidated if the list is replaced.
+        """
+        return self._version
+
+    def add_listener(self, listener):
+        """Arranges for listener(list) to be called after each modification of the list."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Stops calling listener on modifications.  Raises ValueError if it isn't registered."""
+        self._listeners.remove(listener)
+
+    def _changed(self):
+        self._version = next(_list_versions)
+        for listener in list(self._listeners):
+            listener(self)
+
+    def _transform_all(self, values):
+        if self._batch_transformer is None:
+            return [self._transformer(v) for v in values]
+        return self._batch_transformer(list(values))
 
     def __setitem__(self, i, y):
-        self._list[i] = self._transformer(y)
+        if isinstance(i, slice):
+            self._list[i] = self._transform_all(y)
+        else:
+            self._list[i] = self._transformer(y)
+        self._changed()
 
     def __setslice__(self, i, j, y):
-        self._list[i:j] = (self._transformer(v) for v in y)
+        # Only called by python 2, for simple slices.
+        self.__setitem__(slice(i, j), y)
 
     def __getitem__(self, i):
         return self._list[i]
 
     def __delslice__(self, i, j):
         del self._list[i:j]
+        self._changed()
 
     def __delitem__(self, i):
         del self._list[i]
+        self._changed()
 
     def __len__(self):
         return len(self._list)
 
+    def __iter__(self):
+        return iter(self._list)
+
     def __contains__(self, v):
         return self._transformer(v) in self._list
 
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self._list)
+
     def append(self, x):
         self._list.append(self._transformer(x))
+        self._changed()
 
     def extend(self, i):
-        self._list.extend(self._transformer(x) for x in i)
+        self._list.extend(self._transform_all(i))
+        self._changed()
 
     def insert(self, i, v):
         self._list.insert(i, self._transformer(v))
+        self._changed()
 
-    def pop(self, i):
-        return self._list.pop(i)
+    def pop(self, i=-1):
+        value = self._list.pop(i)
+        self._changed()
+        return value
 
     def count(self, v):
         return self._list.count(self._transformer(v))
 
+    def index(self, v, *bounds):
+        return self._list.index(self._transformer(v), *bounds)
+
+    def remove(self, v):
+        self._list.remove(self._transformer(v))
+        self._changed()
+
+    def reverse(self):
+        self._list.reverse()
+        self._changed()
+
+class FrozenDict(dict):
+    """A dict that refuses modification.
+
+    Behaves as a regular dictionary for reading, but any attempt to
+    alter it raises a TypeError.  Use freeze() to build nested
+    read-only structures.
+    """
+    __slots__ = ()
+
+    def _immutable(self, *args, **kw):
+        raise TypeError, "'%s' object does not support modification" % type(self).__name__
+
+    __setitem__ = __delitem__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+    def __reduce__(self):
+        return (type(self), (dict(self),))
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__, dict.__repr__(self))
+
+def freeze(value):
+    """Returns a read-only equivalent of value.
+
+    Dictionaries become FrozenDicts, lists and tuples become tuples, and
+    sets become frozensets, recursively.  Other values are returned as-is.
+    """
+    if isinstance(value, dict):
+        if isinstance(value, FrozenDict):
+            return value
+        return FrozenDict((k, freeze(v)) for k, v in value.iteritems())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    return value
+
+class CopyOnWriteDict(collections.MutableMapping):
+    """A mapping whose copies share storage until one of them is modified.
+
+    copy() is O(1): the original and the copy share one underlying dict.
+    The first modification of either side then copies that dict once, so
+    the cost of a write never depends on how many copies have been made.
+
+    Constructing a CopyOnWriteDict from another mapping copies it.
+    """
+    __slots__ = ('_data', '_shared')
+
+    def __init__(self, data=()):
+        self._data = dict(data)
+        self._shared = False
+
+    def copy(self):
+        """Returns a copy sharing this mapping's storage."""
+        duplicate = CopyOnWriteDict.__new__(type(self))
+        duplicate._data = self._data
+        duplicate._shared = self._shared = True
+        return duplicate
+
+    __copy__ = copy
+
+    def _own(self):
+        if self._shared:
+            self._data = dict(self._data)
+            self._shared = False
+        return self._data
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __setitem__(self, key, value):
+        self._own()[key] = value
+
+    def __delitem__(self, key):
+        if key not in self._data:
+            raise KeyError(key)
+        del self._own()[key]
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self._data)
+
+class KeyTable(object):
+    """An interned, immutable mapping of keys to positions, shared by SharedKeyDicts.
+
+    Use KeyTable.intern() rather than the constructor: there is one table
+    per distinct set of keys, and each table remembers the table reached by
+    adding any given key to it.  Tables are never discarded, so this is
+    suited to data whose schemas are few relative to its instances.
+    """
+    __slots__ = ('keys', 'index', '_transitions')
+
+    _tables = {}
+
+    def __init__(self, keys):
+        self.keys = tuple(keys)
+        self.index = dict((key, i) for i, key in enumerate(self.keys))
+        self._transitions = {}
+
+    @classmethod
+    def intern(cls, keys):
+        """Returns the table for the set of keys, creating it if necessary."""
+        keys = tuple(keys)
+        schema = frozenset(keys)
+        try:
+            return cls._tables[schema]
+        except KeyError:
+            return cls._tables.setdefault(schema, cls(keys))
+
+    def with_key(self, key):
+        """Returns the table for this table's keys plus key."""
+        try:
+            return self._transitions[key]
+        except KeyError:
+            return self._transitions.setdefault(key, self.intern(self.keys + (key,)))
+
+    def without_key(self, key):
+        """Returns the table for this table's keys minus key."""
+        return self.intern(k for k in self.keys if k != key)
+
+class SharedKeyDict(collections.MutableMapping):
+    """A mapping that stores only its values, sharing its keys with others of the same schema.
+
+    Every SharedKeyDict with the same set of keys refers to one interned
+    KeyTable (in the manner of "hidden classes") and holds its values in
+    a list, which is considerably smaller than a dict of its own when
+    there are many mappings with identical keys.  Adding or removing a key
+    moves the mapping to the table for its new set of keys.
+    """
+    __slots__ = ('_table', '_values')
+
+    def __init__(self, data=()):
+        data = dict(data)
+        self._table = KeyTable.intern(data)
+        self._values = [data[key] for key in self._table.keys]
+
+    def _retable(self, table, data):
+        self._values = [data[key] for key in table.keys]
+        self._table = table
+
+    def __getitem__(self, key):
+        return self._values[self._table.index[key]]
+
+    def __setitem__(self, key, value):
+        try:
+            self._values[self._table.index[key]] = value
+            return
+        except KeyError:
+            pass
+        table = self._table.with_key(key)
+        if table.keys[-1] == key and len(table.keys) == len(self._values) + 1:
+            self._values.append(value)
+            self._table = table
+        else:
+            data = dict(self.iteritems())
+            data[key] = value
+            self._retable(table, data)
+
+    def __delitem__(self, key):
+        if key not in self._table.index:
+            raise KeyError(key)
+        data = dict(self.iteritems())
+        del data[key]
+        self._retable(self._table.without_key(key), data)
+
+    def __contains__(self, key):
+        return key in self._table.index
+
+    def __iter__(self):
+        return iter(self._table.keys)
+
+    def __len__(self):
+        return len(self._values)
+
+    def iteritems(self):
+        return iter(zip(self._table.keys, self._values))
+
+    def copy(self):
+        duplicate = SharedKeyDict.__new__(type(self))
+        duplicate._table = self._table
+        duplicate._values = list(self._values)
+        return duplicate
+
+    __copy__ = copy
+
+    def __deepcopy__(self, memo):
+        duplicate = SharedKeyDict.__new__(type(self))
+        memo[id(self)] = duplicate
+        duplicate._table = self._table
+        duplicate._values = copy.deepcopy(self._values, memo)
+        return duplicate
+
+    def __reduce__(self):
+        return (type(self), (dict(self.iteritems()),))
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, dict(self.iteritems()))
+
 def find_files(name_or_names, paths, matches=None):
     """Flexible file locator.
 
@@ -89,6 +377,152 @@ def find_files(name_or_names, paths, matches=None):
                 matches -= 1
                 break
 
+def stat_signature(path):
+    """Returns an (mtime, size, inode) tuple describing the current state of path.
+
+    Two signatures for the same path compare equal only if the path was not
+    modified (as far as the file system can tell) between the two calls.
+
+    Raises an OSError if path cannot be stat'ed.
+    """
+    return _signature(os.stat(path))
+
+def _signature(st):
+    return (getattr(st, 'st_mtime_ns', st.st_mtime), st.st_size, st.st_ino)
+
+def write_atomically(path, data):
+    """Writes data to path such that readers see either the old or the new file, never a mix.
+
+    The data is written to a temporary file in the same directory, which is
+    then renamed over path.  Concurrent writers each rename their own
+    complete file into place, so the last one wins.
+
+    Raises an OSError or IOError if the directory is not writable.
+    """
+    directory, basename = os.path.split(path)
+    fd, temp = tempfile.mkstemp(prefix='.%s.' % basename, suffix='.tmp', dir=directory or '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(temp, 0644)
+        getattr(os, 'replace', os.rename)(temp, path)
+    except:
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+        raise
+
+class DirectoryIndex(object):
+    """Caches directory listings so file lookups don't stat every candidate.
+
+    Each directory is listed once (with `os.scandir` where available) into
+    a basename map, which then answers lookups for any number of candidate
+    basenames.  A listing is revalidated on use against the directory's
+    stat_signature, so adding, removing, or renaming files within the
+    directory is picked up on the next lookup, at the cost of one stat
+    per directory rather than one per (directory, basename) pair.
+
+    A change made within MTIME_GRANULARITY seconds of a listing may leave
+    the directory's mtime as it was, so a listing is not kept while the
+    directory's mtime is that recent (as git does for "racily clean" index
+    entries); the directory is listed again on each lookup meanwhile.
+
+    Provides a find_files() method with the same semantics as the
+    module-level find_files() function.
+    """
+    # The coarsest mtime resolution expected of the file systems searched,
+    # in seconds (NFS and ext3 record whole seconds).
+    MTIME_GRANULARITY = 1.0
+
+    def __init__(self):
+        self._listings = {}
+
+    def invalidate(self, path=None):
+        """Drops the cached listing for path, or all listings if path is None."""
+        if path is None:
+            self._listings.clear()
+        else:
+            self._listings.pop(path, None)
+
+    def listing(self, path):
+        """Returns the (possibly cached) basename map for directory path.
+
+        Keys are basenames found within the directory.  Values are True
+        for regular files, False for anything else, and None for entries
+        whose type has not yet been determined.
+
+        Returns an empty dict if path cannot be listed.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            self._listings.pop(path, None)
+            return {}
+        signature = _signature(st)
+
+        cached = self._listings.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        scanned = time.time()
+        try:
+            entries = self._scan(path)
+        except OSError:
+            return {}
+        if st.st_mtime + self.MTIME_GRANULARITY < scanned:
+            self._listings[path] = (signature, entries)
+        else:
+            self._listings.pop(path, None)
+        return entries
+
+    def _scan(self, path):
+        entries = {}
+        if _scandir is None:
+            for name in os.listdir(path):
+                entries[name] = None
+            return entries
+
+        for entry in _scandir(path):
+            try:
+                entries[entry.name] = entry.is_file()
+            except OSError:
+                entries[entry.name] = None
+        return entries
+
+    def isfile(self, path, name):
+        """Returns True if name is a regular file within directory path.
+
+        As with os.path.join, name may be a relative path below path, or an
+        absolute path; it is then looked up in the listing of the directory
+        that contains it.
+        """
+        if os.sep in name or (os.altsep and os.altsep in name):
+            path, name = os.path.split(os.path.join(path, name))
+        entries = self.listing(path)
+        state = entries.get(name, False)
+        if state is None:
+            state = entries[name] = os.path.isfile(os.path.join(path, name))
+        return state
+
+    def find_files(self, name_or_names, paths, matches=None):
+        """Index-backed equivalent of the module-level find_files()."""
+        if isinstance(name_or_names, basestring):
+            name_or_names = [name_or_names]
+
+        if matches is None:
+            matches = -1
+
+        for path in paths:
+            if matches == 0:
+                break
+
+            for name in name_or_names:
+                if self.isfile(path, name):
+                    yield os.path.join(path, name)
+                    matches -= 1
+                    break
+
 def class_to_fqn(cls):
     """Returns the fully qualified name for cls"""
     return '%s.%s' % (cls.__module__, cls.__name__)
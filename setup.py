@@ -13,6 +13,7 @@ setup(
     packages=['mandrel',
               'mandrel.config',
               'mandrel.test',
+              'mandrel.test.benchmark',
               'mandrel.test.bootstrap',
               'mandrel.test.config',
               'mandrel.test.util',